@@ -1,31 +1,180 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, send_file, send_from_directory
+from flask import Flask, Request, render_template, request, jsonify, session, redirect, send_file, send_from_directory, Response, stream_with_context, current_app, url_for, abort, g
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
+from io import BytesIO
 import os
 import json
+import hashlib
+import base64
 import time
-from apscheduler.schedulers.background import BackgroundScheduler
+import click
+import threading
+import atexit
 
-from models import db, IDCard, CardTemplate, Watermark, AuditLog, AdminUser
-from utils.card_generator import CardGenerator
+from sqlalchemy.orm import load_only, defer
+from models import db, IDCard, CardTemplate, Watermark, AuditLog, AdminUser, GenerationJob, ManagedFile
+from utils.card_generator import CardGenerator, PHOTO_RENDER_EDGE
 from utils.qr_utils import QRCodeGenerator
 from utils.pdf_export import PDFExporter
+from utils.vector_card import VectorCard
 from utils.mrz_utils import MRZGenerator
+from utils.watermark import apply_watermark, watermark_renderer, WATERMARK_PATTERNS
+from utils.background_removal import background_remover
+from utils.template_cache import template_layer_cache, layer_key
+from utils.template_registry import TemplateRegistry, validate_config
+from utils.default_templates import DEFAULT_TEMPLATES
+from utils.resources import resources
+from utils.photo_ingest import ingest_photo, default_max_edge
+from utils.bulk_issue import BulkIssuer, parse_batch, extract_photos, validate_row
+from utils.artifacts import ArtifactCache
+from utils.job_queue import JobQueue, check_callback_url
+from utils.verify_cache import VerificationCache, VerifiedCard
+from utils.blob_store import BlobStore
+from utils.audit import AuditSink
+from utils.file_expiry import FileExpiryManager
+from utils.database import engine_options, install_sqlite_pragmas, install_query_timing, sqlite_settings
+from utils.metrics import metrics, server_timing
+from utils.print_sheet import SheetLayout, PrintSheetWriter, split_layers
+from PIL import Image
+
+class IDCardRequest(Request):
+    @property
+    def max_content_length(self):
+        # Bulk uploads carry a whole cohort of photos, so they get their own limit
+        if self.path == '/api/bulk-generate':
+            return current_app.config['BULK_MAX_CONTENT_LENGTH']
+        return super().max_content_length
 
 app = Flask(__name__)
+app.request_class = IDCardRequest
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///idcards.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///idcards.db')
+# Connection pool for server databases (PostgreSQL needs a driver such as psycopg2 installed)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# SQLite connection pragmas
+app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_MB'] = int(os.environ.get('SQLITE_MMAP_MB', 64))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
+app.config['BULK_MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # batch + photo zip
+# Which artifacts /generate writes to static/; everything else stays in memory
+# Artifacts are otherwise rendered on demand by /card/<id>/<artifact>, and the card_png/card_pdf
+# fields of the /generate response are null for them (use png_url/pdf_url); set
+# PERSIST_ARTIFACTS=png,pdf,qr to keep writing the files and returning their names
+app.config['PERSIST_ARTIFACTS'] = set(filter(None, os.environ.get('PERSIST_ARTIFACTS', '').split(',')))
+# 'vector' draws PDF cards with reportlab operators; 'raster' embeds the rendered PNG
+app.config['PDF_BACKEND'] = os.environ.get('PDF_BACKEND', 'vector')
+app.config['ARTIFACT_CACHE_DIR'] = os.environ.get('ARTIFACT_CACHE_DIR', 'cache/artifacts')
+app.config['ARTIFACT_CACHE_MB'] = int(os.environ.get('ARTIFACT_CACHE_MB', 256))
+app.config['BULK_WORKERS'] = int(os.environ.get('BULK_WORKERS', os.cpu_count() or 1))
+# Worker threads per process for async /generate; 0 keeps generation synchronous only
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+# Comma-separated hosts job callbacks may be sent to; empty allows any host that resolves to public addresses
+app.config['JOB_CALLBACK_HOSTS'] = [h.strip() for h in os.environ.get('JOB_CALLBACK_HOSTS', '').split(',') if h.strip()]
+# Verification results are cached per process; a revoke or enable on another worker is seen within
+# VERIFY_CACHE_CHECK_INTERVAL seconds (one version query per interval), VERIFY_CACHE_TTL bounds everything else
+app.config['VERIFY_CACHE_TTL'] = int(os.environ.get('VERIFY_CACHE_TTL', 60))
+app.config['VERIFY_CACHE_CHECK_INTERVAL'] = float(os.environ.get('VERIFY_CACHE_CHECK_INTERVAL', 1.0))
+app.config['VERIFY_CACHE_SIZE'] = int(os.environ.get('VERIFY_CACHE_SIZE', 10000))
+# 'inline' keeps signatures in id_cards.signature; 'blob' writes them to content-addressed files
+app.config['SIGNATURE_STORAGE'] = os.environ.get('SIGNATURE_STORAGE', 'inline')
+app.config['SIGNATURE_BLOB_DIR'] = os.environ.get('SIGNATURE_BLOB_DIR', 'instance/signatures')
+# Uploaded and persisted files are deleted FILE_TTL seconds after they are written (uploads a
+# card references are kept); FILE_QUOTAS_MB caps the expiring files per folder, e.g. "static/cards=256"
+app.config['FILE_TTL'] = int(os.environ.get('FILE_TTL', 120))
+app.config['FILE_SWEEP_INTERVAL'] = int(os.environ.get('FILE_SWEEP_INTERVAL', 60))
+app.config['FILE_QUOTAS_MB'] = os.environ.get('FILE_QUOTAS_MB', 'static/cards=256,static/pdfs=256,static/qrcodes=64')
+app.config['CONFIG_CHECK_INTERVAL'] = float(os.environ.get('CONFIG_CHECK_INTERVAL', 2.0))
+app.config['AUDIT_BATCH_SIZE'] = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+app.config['AUDIT_FLUSH_INTERVAL'] = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+app.config['REMBG_PRELOAD'] = os.environ.get('REMBG_PRELOAD', '1') == '1'
+app.config['REMBG_WARMUP'] = os.environ.get('REMBG_WARMUP', '1') == '1'
+# Concurrent rembg sessions per process, onnxruntime threads per session (0 = one per core, or the
+# cores divided between WEB_CONCURRENCY server processes) and photos per batched model run
+app.config['REMBG_SESSIONS'] = int(os.environ.get('REMBG_SESSIONS', 1))
+app.config['REMBG_THREADS'] = int(os.environ.get('REMBG_THREADS', 0)) or \
+    (max(1, (os.cpu_count() or 1) // int(os.environ['WEB_CONCURRENCY'])) if os.environ.get('WEB_CONCURRENCY') else 0)
+app.config['REMBG_BATCH_SIZE'] = int(os.environ.get('REMBG_BATCH_SIZE', 8))
+# onnxruntime threads per bulk render process; 0 divides the cores between BULK_WORKERS
+app.config['BULK_REMBG_THREADS'] = int(os.environ.get('BULK_REMBG_THREADS', 0))
+# Uploaded photos are stored upright and no larger than this (defaults to the larger of the rembg model's input
+# size and the vector/print photo size, so print output never upsamples the stored photo)
+app.config['PHOTO_MAX_EDGE'] = default_max_edge(background_remover.model_name, PHOTO_RENDER_EDGE)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+THEME_COLORS = {
+    'default': '#1a3a52',
+    'green': '#006633',
+    'red': '#cc0000',
+    'corporate': '#1a1a1a',
+    'purple': '#4b0082',
+    'orange': '#ff8c00',
+    'gold': '#8b6914'
+}
+
+install_sqlite_pragmas(app.config)
+install_query_timing(metrics)
 db.init_app(app)
 
 # Initialize QR and PDF utilities
 qr_gen = QRCodeGenerator('static/qrcodes')
 pdf_exporter = PDFExporter('static/pdfs')
+verification_cache = VerificationCache(app.config['VERIFY_CACHE_SIZE'], app.config['VERIFY_CACHE_TTL'],
+                                       app.config['VERIFY_CACHE_CHECK_INTERVAL'])
+artifact_cache = ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], app.config['ARTIFACT_CACHE_MB'] * 1024 * 1024)
+signature_blobs = BlobStore(app.config['SIGNATURE_BLOB_DIR'])
+template_registry = TemplateRegistry(app.config['CONFIG_CHECK_INTERVAL'])
+background_remover.configure(threads=app.config['REMBG_THREADS'], sessions=app.config['REMBG_SESSIONS'],
+                             batch_size=app.config['REMBG_BATCH_SIZE'])
+audit_sink = AuditSink(app, app.config['AUDIT_BATCH_SIZE'], app.config['AUDIT_FLUSH_INTERVAL'])
+atexit.register(audit_sink.stop)
+
+MANAGED_FOLDERS = [app.config['UPLOAD_FOLDER'], 'static/qrcodes', 'static/cards', 'static/pdfs']
+
+def parse_quotas(value):
+    quotas = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        folder, _, megabytes = item.partition('=')
+        quotas[folder.strip()] = int(megabytes) * 1024 * 1024
+    return quotas
+
+def uploads_in_use(folder, filenames):
+    """Uploads still needed as render sources: referenced by a card or by a pending job"""
+    if folder != app.config['UPLOAD_FOLDER']:
+        return set()
+    names = set(filenames)
+    used = set()
+    for column in (IDCard.photo_filename, IDCard.logo_filename):
+        used.update(n for (n,) in db.session.query(column).filter(column.in_(names)))
+    for job in GenerationJob.query.filter(GenerationJob.status.in_(['QUEUED', 'RUNNING'])):
+        payload = job.get_payload()
+        used.update(n for n in (payload.get('photo_filename'), payload.get('logo_filename')) if n in names)
+    return used
+
+file_expiry = FileExpiryManager(app, app.config['FILE_TTL'], app.config['FILE_SWEEP_INTERVAL'],
+                                parse_quotas(app.config['FILE_QUOTAS_MB']), uploads_in_use)
+
+ARTIFACT_TYPES = {
+    'png': ('image/png', 'png'),
+    'thumbnail': ('image/png', 'png'),
+    'print': ('image/png', 'png'),
+    'pdf': ('application/pdf', 'pdf'),
+    'qr': ('image/png', 'png')
+}
+# Raster artifacts and the render profile each is drawn at
+ARTIFACT_PROFILES = {'png': 'screen', 'thumbnail': 'thumbnail', 'print': 'print'}
+PROFILE_ARTIFACTS = {profile: artifact for artifact, profile in ARTIFACT_PROFILES.items()}
+# Browsers may keep a URL carrying the card version (?v=) for this long without revalidating
+VERSIONED_MAX_AGE = 365 * 24 * 3600
 
 # Create necessary directories
 for folder in ['static/uploads', 'static/qrcodes', 'static/cards', 'static/pdfs', 'static/flags']:
@@ -34,45 +183,189 @@ for folder in ['static/uploads', 'static/qrcodes', 'static/cards', 'static/pdfs'
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def add_audit_log(action, card_id=None, details=''):
+def add_audit_log(action, card_id=None, details='', in_transaction=False):
+    """Queue an audit entry for the batched writer, or add it to the current
+    session (in_transaction=True) to be committed with the caller's change"""
     user = 'anonymous'
-    log = AuditLog(admin_user=user, action=action, card_id=card_id, details=details)
-    db.session.add(log)
-    db.session.commit()
+    if in_transaction:
+        return audit_sink.attach(action, card_id, details, user)
+    audit_sink.record(action, card_id, details, user)
 
-def apply_watermark(card_image, watermark_text, color, opacity, position):
-    """Apply watermark to card image"""
-    from PIL import ImageDraw, ImageFont
-    draw = ImageDraw.Draw(card_image)
-    
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-    except:
-        font = ImageFont.load_default()
-    
-    color_str = color.lstrip('#')
-    color_rgb = (int(color_str[0:2], 16), int(color_str[2:4], 16), int(color_str[4:6], 16))
-    
-    width, height = card_image.size
-    
-    if position == 'top':
-        y = 50
-    elif position == 'bottom':
-        y = height - 120
-    else:  # center
-        y = height // 2 - 40
-    
-    # Draw with transparency effect
-    x = width // 2 - len(watermark_text) * 20
-    draw.text((x, y), watermark_text, fill=color_rgb, font=font)
-    
-    return card_image
+def watermark_settings():
+    """Current watermark parameters as a plain dict, or None when disabled"""
+    return template_registry.watermark()
+
+def make_watermark_func(watermark, scale=1):
+    if not watermark:
+        return None
+    def watermark_func(card):
+        return apply_watermark(card, watermark['text'], watermark['color'], watermark['opacity'], watermark['position'],
+                               watermark.get('pattern', 'single'), scale)
+    return watermark_func
+
+def render_config(template, theme):
+    """Template config with the theme's header colour applied"""
+    config = template.get_config()
+    config['header_color'] = THEME_COLORS.get(theme, config.get('header_color', '#1a3a52'))
+    return config
+
+def store_signature(signature):
+    """Return (inline value, hash) for a signature according to SIGNATURE_STORAGE"""
+    if not signature:
+        return '', None
+    if app.config['SIGNATURE_STORAGE'] == 'blob':
+        return None, signature_blobs.put(signature)
+    return signature, BlobStore.digest(signature)
+
+def card_signature(card):
+    """Signature data URL, loaded from the row or the blob store only when asked for"""
+    if card.signature:
+        return card.signature
+    if card.signature_hash:
+        return signature_blobs.get_text(card.signature_hash) or ''
+    return ''
+
+def card_render_data(card, include_signature=True):
+    """Rebuild the form data a stored card was generated from"""
+    return {
+        'id_number': card.id_number,
+        'full_name': card.full_name,
+        'date_of_birth': card.date_of_birth.strftime('%Y-%m-%d'),
+        'organization': card.organization,
+        'address': card.address,
+        'nationality': card.nationality or '',
+        'issue_date': card.issue_date.strftime('%Y-%m-%d'),
+        'expiry_date': card.expiry_date.strftime('%Y-%m-%d'),
+        'signature': card_signature(card) if include_signature else card.signature_hash,
+        'theme': card.theme or 'default',
+        'font_family': card.font_family or 'DejaVuSans',
+        'font_size': card.font_size or 10,
+        'font_color': card.font_color or '#000000',
+        'font_bold': 'on' if card.font_bold else '',
+        'font_italic': 'on' if card.font_italic else '',
+        'background_mode': card.background_mode or ''
+    }
+
+def card_version(card, template, watermark):
+    """Hash of everything that affects a card's rendered output"""
+    payload = json.dumps({
+        'data': card_render_data(card, include_signature=False),
+        'photo': card.photo_filename,
+        'logo': card.logo_filename,
+        'background': card.background_filename,
+        'template': template.get_config() if template else None,
+        'watermark': watermark
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+def artifact_key(id_number, artifact):
+    # Hashed: id numbers are free text, and no escaping of them can be both filename-safe and unambiguous
+    return f"{hashlib.sha1(id_number.encode('utf-8')).hexdigest()}-{artifact}"
+
+def artifact_name(id_number, artifact, version):
+    return f"{artifact_key(id_number, artifact)}_{version}.{ARTIFACT_TYPES[artifact][1]}"
+
+def encode_png(image):
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def card_asset_paths(card):
+    """(logo path, background path) of a stored card"""
+    logo_path = os.path.join(app.config['UPLOAD_FOLDER'], card.logo_filename) if card.logo_filename else None
+    background_path = os.path.join('static/backgrounds', card.background_filename) if card.background_filename else None
+    return logo_path, background_path
+
+def card_template(card):
+    return (template_registry.get(card.template_id) if card.template_id else None) or template_registry.first()
+
+def render_card_image(card, template, watermark, profile='screen'):
+    """Render a stored card at a profile. The AI cutout comes from the photo cache, so a thumbnail
+    or print render of an issued card never runs background removal again."""
+    data = card_render_data(card)
+    config = render_config(template, data['theme'])
+    photo_path = os.path.join(app.config['UPLOAD_FOLDER'], card.photo_filename) if card.photo_filename else None
+    logo_path, background_path = card_asset_paths(card)
+    qr_image = qr_gen.make_image(f"/verify/{card.id_number}")
+    card_gen = CardGenerator(config, profile=profile)
+    return card_gen.generate(data, photo_path, qr_image, make_watermark_func(watermark, card_gen.scale), logo_path,
+                             background_path, layer_key(template.id, data['theme'], config, background_path, logo_path, profile))
+
+def card_vector(card, template, watermark):
+    """VectorCard for a stored card, for PDFExporter"""
+    data = card_render_data(card)
+    config = render_config(template, data['theme'])
+    photo_path = os.path.join(app.config['UPLOAD_FOLDER'], card.photo_filename) if card.photo_filename else None
+    logo_path, background_path = card_asset_paths(card)
+    return VectorCard(config, data, photo_path, f"/verify/{card.id_number}", watermark, logo_path, background_path)
+
+def card_base_layer(card, template, profile='screen'):
+    """(layer key, image) of the holder-independent layer the card is drawn on, decorations included"""
+    theme = card.theme or 'default'
+    config = render_config(template, theme)
+    logo_path, background_path = card_asset_paths(card)
+    key = layer_key(template.id, theme, config, background_path, logo_path, profile)
+    image, meta = template_layer_cache.get(
+        key, lambda: CardGenerator(config, profile=profile).build_base_layer(logo_path, background_path))
+    return key, CardGenerator.add_decorations(image, meta)
+
+def card_png_path(card, template, watermark, version=None, profile='screen'):
+    """Path of the card's cached PNG at a profile for its current version, rendering it on a miss"""
+    version = version or card_version(card, template, watermark)
+    artifact = PROFILE_ARTIFACTS[profile]
+    return artifact_cache.get_or_create(artifact_name(card.id_number, artifact, version),
+                                        lambda: encode_png(render_card_image(card, template, watermark, profile)),
+                                        replace=True)
+
+def card_thumbnail_url(card):
+    """Thumbnail URL pinned to the card's version, so browsers cache it until the card changes"""
+    version = card_version(card, card_template(card), watermark_settings())
+    return url_for('card_artifact', card_id=card.id, artifact='thumbnail', v=version)
+
+def card_urls(card):
+    return {
+        'png_url': url_for('card_artifact', card_id=card.id, artifact='png'),
+        'thumbnail_url': card_thumbnail_url(card),
+        'print_url': url_for('card_artifact', card_id=card.id, artifact='print'),
+        'pdf_url': url_for('card_artifact', card_id=card.id, artifact='pdf'),
+        'qr_url': url_for('card_artifact', card_id=card.id, artifact='qr')
+    }
+
+def build_id_card(data, template_id, photo_filename=None, logo_filename=None, background_filename=None,
+                  card_png=None, card_pdf=None, qr_code=None):
+    signature, signature_hash = store_signature(data.get('signature', ''))
+    return IDCard(
+        id_number=data.get('id_number'),
+        full_name=data.get('full_name'),
+        date_of_birth=datetime.strptime(data.get('date_of_birth'), '%Y-%m-%d').date(),
+        organization=data.get('organization'),
+        address=data.get('address'),
+        nationality=data.get('nationality'),
+        background_mode=data.get('background_mode') or None,
+        issue_date=datetime.strptime(data.get('issue_date'), '%Y-%m-%d').date(),
+        expiry_date=datetime.strptime(data.get('expiry_date'), '%Y-%m-%d').date(),
+        signature=signature,
+        signature_hash=signature_hash,
+        theme=data.get('theme', 'default'),
+        photo_filename=photo_filename,
+        logo_filename=logo_filename,
+        background_filename=background_filename,
+        font_family=data.get('font_family', 'DejaVuSans'),
+        font_size=int(data.get('font_size') or 10),
+        font_color=data.get('font_color', '#000000'),
+        font_bold=data.get('font_bold') == 'on',
+        font_italic=data.get('font_italic') == 'on',
+        card_png=card_png,
+        card_pdf=card_pdf,
+        qr_code=qr_code,
+        template_id=template_id,
+        status='VALID'
+    )
 
 
 @app.route('/')
 def index():
-    templates = CardTemplate.query.filter_by(is_active=True).all()
-    return render_template('index.html', templates=templates)
+    return render_template('index.html', templates=template_registry.active())
 
 @app.route('/manifest.json')
 def manifest():
@@ -94,187 +387,611 @@ def generate_card():
         template_id = request.form.get('template_id', 1)
         
         # Get template
-        template = CardTemplate.query.filter_by(id=template_id).first()
+        template = template_registry.get(template_id)
         if not template:
             return jsonify({'error': 'Template not found'}), 400
         
-        theme = request.form.get('theme', 'default')
-        theme_colors = {
-            'default': '#1a3a52',
-            'green': '#006633',
-            'red': '#cc0000',
-            'corporate': '#1a1a1a',
-            'purple': '#4b0082',
-            'orange': '#ff8c00',
-            'gold': '#8b6914'
-        }
-        
-        config = template.get_config()
-        config['header_color'] = theme_colors.get(theme, config.get('header_color', '#1a3a52'))
-        
         # Handle photo and logo uploads
-        photo_filename = None
-        logo_filename = None
-        
-        if 'photo' in request.files:
-            file = request.files['photo']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().timestamp()}_photo_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                photo_filename = filename
-
-        if 'logo' in request.files:
-            file = request.files['logo']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().timestamp()}_logo_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                logo_filename = filename
+        photo_filename = save_upload('photo')
+        logo_filename = save_upload('logo')
         
         # Check if card already exists
         existing = IDCard.query.filter_by(id_number=data.get('id_number')).first()
         if existing:
             return jsonify({'error': 'ID number already exists'}), 400
         
-        # Generate QR code
-        qr_path = qr_gen.generate(f"/verify/{data.get('id_number')}", 
-                                   f"qr_{data.get('id_number')}.png")
-        
-        # Generate card image
-        card_gen = CardGenerator(config)
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], photo_filename) if photo_filename else None
-        logo_path = os.path.join(app.config['UPLOAD_FOLDER'], logo_filename) if logo_filename else None
-        
-        background_filename = data.get('background_image')
-        background_path = os.path.join('static/backgrounds', background_filename) if background_filename else None
-        
-        # Prepare watermark function
-        watermark_obj = Watermark.query.first()
-        if watermark_obj and watermark_obj.enabled:
-            # Pre-cache watermark params to avoid object access in loop
-            w_text = watermark_obj.text
-            w_color = watermark_obj.color
-            w_opacity = watermark_obj.opacity
-            w_pos = watermark_obj.position
-            def watermark_func(card):  # type: ignore
-                return apply_watermark(card, w_text, w_color, w_opacity, w_pos)
-        else:
-            watermark_func = None  # type: ignore
-        
-        card_image = card_gen.generate(data, photo_path, qr_path, watermark_func, logo_path, background_path)
-        
-        # Save card image
-        card_filename = f"card_{data.get('id_number')}.png"
-        card_path = os.path.join('static/cards', card_filename)
-        card_image.save(card_path)
-        
-        # Export to PDF
-        pdf_filename = f"card_{data.get('id_number')}.pdf"
-        pdf_path = pdf_exporter.export(card_path, data, pdf_filename)
-        
-        # Save to database
-        id_card = IDCard(
-            id_number=data.get('id_number'),
-            full_name=data.get('full_name'),
-            date_of_birth=datetime.strptime(data.get('date_of_birth'), '%Y-%m-%d').date(),
-            organization=data.get('organization'),
-            address=data.get('address'),
-            nationality=data.get('nationality'),
-            issue_date=datetime.strptime(data.get('issue_date'), '%Y-%m-%d').date(),
-            expiry_date=datetime.strptime(data.get('expiry_date'), '%Y-%m-%d').date(),
-            signature=data.get('signature', ''),
-            theme=data.get('theme', 'default'),
-            photo_filename=photo_filename,
-            logo_filename=logo_filename,
-            background_filename=background_filename,
-            font_family=data.get('font_family', 'DejaVuSans'),
-            font_size=int(data.get('font_size', 10)),
-            font_color=data.get('font_color', '#000000'),
-            font_bold=data.get('font_bold') == 'on',
-            font_italic=data.get('font_italic') == 'on',
-            card_png=card_filename,
-            card_pdf=pdf_filename,
-            qr_code=os.path.basename(qr_path),
-            template_id=template_id,
-            status='VALID'
-        )
-        db.session.add(id_card)
-        db.session.commit()
-        
-        add_audit_log('Card Generated', id_card.id, f"ID: {data.get('id_number')}")
+        if (request.form.get('async') or request.args.get('async')) in ('1', 'true', 'on'):
+            if app.config['JOB_WORKERS'] <= 0:
+                return jsonify({'error': 'Asynchronous generation is disabled'}), 400
+            callback_url = request.form.get('callback_url') or None
+            if callback_url:
+                try:
+                    check_callback_url(callback_url, job_queue.callback_hosts)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            data.pop('async', None)
+            data.pop('callback_url', None)
+            job = job_queue.enqueue({
+                'data': data,
+                'template_id': template_id,
+                'photo_filename': photo_filename,
+                'logo_filename': logo_filename
+            }, callback_url)
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': url_for('job_status', job_id=job.id)
+            }), 202
         
+        id_card = issue_card(data, template_id, photo_filename, logo_filename)
         return jsonify({
             'success': True,
             'card_id': id_card.id,
-            'card_png': card_filename,
-            'card_pdf': pdf_filename
+            'id_number': id_card.id_number,
+            'card_png': id_card.card_png,
+            'card_pdf': id_card.card_pdf,
+            **card_urls(id_card)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def save_upload(field):
+    """Save an uploaded image from request.files[field], returning its filename"""
+    file = request.files.get(field)
+    if not file or not allowed_file(file.filename):
+        return None
+    filename = secure_filename(file.filename)
+    filename = f"{datetime.now().timestamp()}_{field}_{filename}"
+    if field == 'photo':
+        filename = ingest_photo(file.stream, app.config['UPLOAD_FOLDER'], filename, app.config['PHOTO_MAX_EDGE'])
+    else:
+        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+    file_expiry.track(app.config['UPLOAD_FOLDER'], filename)
+    return filename
+
+def issue_card(data, template_id, photo_filename=None, logo_filename=None):
+    """Render and store one card. Raises ValueError for input that can never succeed."""
+    template = template_registry.get(template_id)
+    if not template:
+        raise ValueError('Template not found')
+    if IDCard.query.filter_by(id_number=data.get('id_number')).first():
+        raise ValueError('ID number already exists')
+    
+    theme = data.get('theme', 'default')
+    config = render_config(template, theme)
+    persist = app.config['PERSIST_ARTIFACTS']
+    
+    # Generate QR code in memory; it is only written out when persisted
+    qr_url = f"/verify/{data.get('id_number')}"
+    qr_filename = f"qr_{data.get('id_number')}.png"
+    qr_image = qr_gen.make_image(qr_url)
+    if 'qr' in persist:
+        qr_gen.save(qr_image, qr_url, qr_filename)
+    
+    # Generate card image
+    card_gen = CardGenerator(config)
+    photo_path = os.path.join(app.config['UPLOAD_FOLDER'], photo_filename) if photo_filename else None
+    logo_path = os.path.join(app.config['UPLOAD_FOLDER'], logo_filename) if logo_filename else None
+    
+    background_filename = data.get('background_image')
+    background_path = os.path.join('static/backgrounds', background_filename) if background_filename else None
+    
+    watermark = watermark_settings()
+    card_image = card_gen.generate(data, photo_path, qr_image, make_watermark_func(watermark), logo_path, background_path,
+                                   layer_key(template.id, theme, config, background_path, logo_path))
+    
+    # Save card image
+    card_filename = None
+    if 'png' in persist:
+        card_filename = f"card_{data.get('id_number')}.png"
+        card_image.save(os.path.join('static/cards', card_filename))
+    
+    # Export to PDF as vectors, or straight from the rendered image
+    pdf_filename = None
+    if 'pdf' in persist:
+        pdf_filename = f"card_{data.get('id_number')}.pdf"
+        if app.config['PDF_BACKEND'] == 'vector':
+            pdf_exporter.export(VectorCard(config, data, photo_path, qr_url, watermark, logo_path, background_path),
+                                data, pdf_filename)
+        else:
+            pdf_exporter.export(card_image, data, pdf_filename)
+    
+    file_expiry.track('static/qrcodes', qr_filename if 'qr' in persist else None)
+    file_expiry.track('static/cards', card_filename)
+    file_expiry.track('static/pdfs', pdf_filename)
+    
+    # Save to database
+    id_card = build_id_card(data, template.id, photo_filename, logo_filename, background_filename,
+                            card_filename, pdf_filename, qr_filename)
+    db.session.add(id_card)
+    db.session.flush()
+    add_audit_log('Card Generated', id_card.id, f"ID: {data.get('id_number')}", in_transaction=True)
+    file_expiry.retain(app.config['UPLOAD_FOLDER'], [photo_filename, logo_filename])
+    db.session.commit()
+    
+    # Seed the artifact cache with the PNG we just rendered; the PDF is built on first download
+    version = card_version(id_card, template, watermark)
+    artifact_cache.put(artifact_name(id_card.id_number, 'png', version), encode_png(card_image), replace=True)
+    return id_card
+
+def process_generation_job(payload):
+    id_card = issue_card(payload['data'], payload['template_id'], payload.get('photo_filename'), payload.get('logo_filename'))
+    return {'card_id': id_card.id, 'id_number': id_card.id_number}
+
+job_queue = JobQueue(app, process_generation_job, workers=app.config['JOB_WORKERS'],
+                     max_attempts=app.config['JOB_MAX_ATTEMPTS'], callback_hosts=app.config['JOB_CALLBACK_HOSTS'])
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = db.session.get(GenerationJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    response = {
+        'job_id': job.id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    result = job.get_result()
+    if result:
+        response['result'] = result
+        card = db.session.get(IDCard, result['card_id'])
+        if card:
+            response['result'].update(card_urls(card))
+    return jsonify(response)
+
+@app.route('/api/jobs/metrics')
+def job_metrics():
+    return jsonify(job_queue.metrics())
+
+def run_bulk_issue(rows, photos, template_id, theme='default', background_filename=None, max_workers=None):
+    """Render a batch across the worker pool, yielding progress events.
+
+    Card rows are written in a single transaction once every render has finished.
+    """
+    template = template_registry.get(template_id)
+    if not template:
+        yield {'event': 'error', 'error': 'Template not found'}
+        return
+
+    watermark = watermark_settings()
+    # Rows may pick their own theme and background; rows sharing both share a config and base layer
+    looks = {}
+
+    ids = [row.get('id_number') for row in rows if row.get('id_number')]
+    existing = set()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        existing.update(n for (n,) in db.session.query(IDCard.id_number).filter(IDCard.id_number.in_(chunk)))
+
+    jobs, job_rows = [], []
+    seen = set()
+    for index, row in enumerate(rows):
+        error = validate_row(row)
+        if not error and row['id_number'] in existing:
+            error = 'ID number already exists'
+        if not error and row['id_number'] in seen:
+            error = 'Duplicate ID number in batch'
+        photo_name = row.get('photo')
+        if not error and photo_name and photo_name not in photos:
+            error = f"Photo not found in archive: {photo_name}"
+        if error:
+            yield {'event': 'row', 'row': index, 'id_number': row.get('id_number'), 'status': 'error', 'error': error}
+            continue
+        seen.add(row['id_number'])
+
+        data = dict(row)
+        data['theme'] = data.get('theme') or theme
+        row_background = os.path.basename(data.get('background_image') or '') or background_filename
+        if (data['theme'], row_background) not in looks:
+            config = render_config(template, data['theme'])
+            background_path = os.path.join('static/backgrounds', row_background) if row_background else None
+            looks[data['theme'], row_background] = (config, background_path,
+                                                    layer_key(template.id, data['theme'], config, background_path))
+        config, background_path, base_layer_key = looks[data['theme'], row_background]
+        photo_filename = photos.get(photo_name) if photo_name else None
+        jobs.append({
+            'data': data,
+            'config': config,
+            'watermark': watermark,
+            'photo_path': os.path.join(app.config['UPLOAD_FOLDER'], photo_filename) if photo_filename else None,
+            'background_path': background_path,
+            'background_filename': row_background,
+            'layer_key': base_layer_key,
+            'persist': app.config['PERSIST_ARTIFACTS'],
+            'return_png': True,
+            'pdf_backend': app.config['PDF_BACKEND'],
+            'qr_dir': 'static/qrcodes',
+            'card_dir': 'static/cards',
+            'pdf_dir': 'static/pdfs'
+        })
+        job_rows.append((index, photo_filename))
+
+    yield {'event': 'start', 'total': len(rows), 'queued': len(jobs)}
+
+    issuer = BulkIssuer(max_workers or app.config['BULK_WORKERS'], app.config['REMBG_BATCH_SIZE'],
+                        app.config['BULK_REMBG_THREADS'])
+    cards = []
+    failed = len(rows) - len(jobs)
+    for job_index, result, error in issuer.run(jobs):
+        row_index, photo_filename = job_rows[job_index]
+        id_number = jobs[job_index]['data']['id_number']
+        if error:
+            failed += 1
+            yield {'event': 'row', 'row': row_index, 'id_number': id_number, 'status': 'error', 'error': error}
+            continue
+        png_bytes = result.pop('png_bytes', None)
+        persist = app.config['PERSIST_ARTIFACTS']
+        file_expiry.track('static/qrcodes', result['qr_code'] if 'qr' in persist else None)
+        file_expiry.track('static/cards', result['card_png'])
+        file_expiry.track('static/pdfs', result['card_pdf'])
+        try:
+            card = build_id_card(jobs[job_index]['data'], template.id, photo_filename, None,
+                                 jobs[job_index]['background_filename'], result['card_png'], result['card_pdf'],
+                                 result['qr_code'])
+        except Exception as e:
+            failed += 1
+            yield {'event': 'row', 'row': row_index, 'id_number': id_number, 'status': 'error', 'error': str(e)}
+            continue
+        if png_bytes:
+            artifact_cache.put(artifact_name(id_number, 'png', card_version(card, template, watermark)), png_bytes,
+                               replace=True)
+        cards.append(card)
+        yield {'event': 'row', 'row': row_index, 'id_number': id_number, 'status': 'rendered'}
+
+    try:
+        db.session.add_all(cards)
+        db.session.flush()
+        for card in cards:
+            add_audit_log('Card Generated', card.id, f"ID: {card.id_number} (bulk)", in_transaction=True)
+        file_expiry.retain(app.config['UPLOAD_FOLDER'], [card.photo_filename for card in cards])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        yield {'event': 'error', 'error': f"Database write failed: {e}"}
+        return
+
+    yield {'event': 'complete', 'created': len(cards), 'failed': failed,
+           'cards': [{'card_id': c.id, 'id_number': c.id_number, 'card_png': c.card_png, 'card_pdf': c.card_pdf} for c in cards]}
+
+@app.route('/api/bulk-generate', methods=['POST'])
+def bulk_generate_cards():
+    """Issue a batch of cards from a CSV/JSON file and an optional photo zip.
+
+    Progress is streamed back as newline-delimited JSON events.
+    """
+    batch = request.files.get('batch')
+    if not batch or not batch.filename:
+        return jsonify({'error': 'A CSV or JSON batch file is required'}), 400
+    try:
+        rows = parse_batch(batch.stream, batch.filename)
+    except Exception as e:
+        return jsonify({'error': f"Could not parse batch: {e}"}), 400
+
+    photos = {}
+    archive = request.files.get('photos')
+    if archive and archive.filename:
+        try:
+            photos = extract_photos(archive.stream, app.config['UPLOAD_FOLDER'], app.config['PHOTO_MAX_EDGE'])
+            file_expiry.track_many(app.config['UPLOAD_FOLDER'], list(photos.values()))
+        except Exception as e:
+            return jsonify({'error': f"Could not read photo archive: {e}"}), 400
+
+    template_id = request.form.get('template_id', 1)
+    theme = request.form.get('theme', 'default')
+    background_filename = request.form.get('background_image') or None
+
+    def stream():
+        for event in run_bulk_issue(rows, photos, template_id, theme, background_filename):
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+@app.cli.command('bulk-issue')
+@click.argument('batch_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--photos', 'photos_zip', type=click.Path(exists=True, dir_okay=False), help='Zip archive of photos referenced by the "photo" column.')
+@click.option('--template-id', default=1, show_default=True)
+@click.option('--theme', default='default', show_default=True)
+@click.option('--background', default=None, help='Background image filename from static/backgrounds.')
+@click.option('--workers', type=int, default=None, help='Render processes (defaults to BULK_WORKERS).')
+def bulk_issue_command(batch_file, photos_zip, template_id, theme, background, workers):
+    """Issue every card in BATCH_FILE (CSV or JSON)."""
+    with open(batch_file, 'rb') as f:
+        rows = parse_batch(f, batch_file)
+    photos = {}
+    if photos_zip:
+        with open(photos_zip, 'rb') as f:
+            photos = extract_photos(f, app.config['UPLOAD_FOLDER'], app.config['PHOTO_MAX_EDGE'])
+        file_expiry.track_many(app.config['UPLOAD_FOLDER'], list(photos.values()))
+
+    for event in run_bulk_issue(rows, photos, template_id, theme, background, workers):
+        if event['event'] == 'row':
+            line = f"[{event['row']}] {event['id_number']}: {event['status']}"
+            if event.get('error'):
+                line += f" - {event['error']}"
+            click.echo(line)
+        elif event['event'] == 'start':
+            click.echo(f"Rendering {event['queued']} of {event['total']} rows")
+        elif event['event'] == 'complete':
+            click.echo(f"Created {event['created']} cards, {event['failed']} failed")
+        else:
+            click.echo(f"Error: {event['error']}", err=True)
+
+@app.cli.command('move-signatures')
+@click.option('--batch-size', default=500, show_default=True)
+def move_signatures_command(batch_size):
+    """Move inline signatures out of id_cards into the signature blob store."""
+    moved = 0
+    while True:
+        cards = IDCard.query.options(load_only(IDCard.id, IDCard.signature, IDCard.signature_hash)).filter(
+            IDCard.signature.isnot(None), IDCard.signature != '').limit(batch_size).all()
+        if not cards:
+            break
+        for card in cards:
+            card.signature_hash = signature_blobs.put(card.signature)
+            card.signature = None
+        db.session.commit()
+        moved += len(cards)
+    click.echo(f"Moved {moved} signatures to {app.config['SIGNATURE_BLOB_DIR']}")
+
+@app.route('/card/<int:card_id>/<artifact>')
+def card_artifact(card_id, artifact):
+    """Serve a card's PNG (png, thumbnail or print profile), PDF or QR code, rendering it on first request.
+
+    Artifacts are cached on disk per card version and revalidated with ETag /
+    Last-Modified (the cached file's mtime), so unchanged cards are never re-rendered. A URL whose ?v=
+    is the current version may be cached by the browser without revalidation.
+    """
+    if artifact not in ARTIFACT_TYPES:
+        abort(404)
+    card = db.session.get(IDCard, card_id)
+    if not card:
+        abort(404)
+    template = card_template(card)
+    watermark = watermark_settings()
+    version = card_version(card, template, watermark)
+    png_version = version
+    max_age = VERSIONED_MAX_AGE if request.args.get('v') == version else 0
+    if artifact == 'pdf' and app.config['PDF_BACKEND'] == 'vector':
+        # The other backend's PDF is a different file
+        version += '-vector'
+
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+        response.set_etag(version)
+        return response
+
+    if artifact in ARTIFACT_PROFILES:
+        def builder():
+            return encode_png(render_card_image(card, template, watermark, ARTIFACT_PROFILES[artifact]))
+    elif artifact == 'pdf' and app.config['PDF_BACKEND'] == 'vector':
+        def builder():
+            return pdf_exporter.export_bytes(card_vector(card, template, watermark),
+                                             card_render_data(card, include_signature=False))
+    elif artifact == 'pdf':
+        def builder():
+            with Image.open(card_png_path(card, template, watermark, png_version)) as card_image:
+                card_image.load()
+                return pdf_exporter.export_bytes(card_image, card_render_data(card, include_signature=False))
+    else:
+        def builder():
+            return encode_png(qr_gen.make_image(f"/verify/{card.id_number}"))
+
+    path = artifact_cache.get_or_create(artifact_name(card.id_number, artifact, version), builder, replace=True)
+    mimetype, ext = ARTIFACT_TYPES[artifact]
+    if artifact == 'qr':
+        download_name = f"qr_{card.id_number}.png"
+    elif artifact in ('thumbnail', 'print'):
+        download_name = f"card_{card.id_number}_{artifact}.{ext}"
+    else:
+        download_name = f"card_{card.id_number}.{ext}"
+    # Last-Modified is the file's mtime: a template or watermark change writes a new file without touching the card
+    response = send_file(os.path.abspath(path), mimetype=mimetype, etag=version, max_age=max_age,
+                         conditional=True, as_attachment=request.args.get('download') == '1', download_name=download_name)
+    if max_age:
+        response.cache_control.immutable = True
+    return response
+
 @app.route('/verify/')
 def verify_card_form():
     """Display verification form without pre-filled ID"""
     return render_template('verify.html', status='form')
 
+VERIFY_COLUMNS = [getattr(IDCard, name) for name in VerifiedCard.FIELDS] + [IDCard.status]
+
+def load_verified_card(id_number):
+    return verification_cache.get(id_number, lambda: IDCard.query.options(load_only(*VERIFY_COLUMNS))
+                                  .filter_by(id_number=id_number).first())
+
 @app.route('/verify/<id_number>')
 def verify_card(id_number):
-    card = IDCard.query.filter_by(id_number=id_number).first()
+    card = load_verified_card(id_number)
     if not card:
         return render_template('verify.html', status='NOT_FOUND', id_number=id_number)
     
-    # Check expiry
-    if card.expiry_date < datetime.now().date():
-        card.status = 'EXPIRED'
-        db.session.commit()
-    
     return render_template('verify.html', card=card, status='found')
 
 @app.route('/api/verify/<id_number>')
 def api_verify_card(id_number):
     """API endpoint for card verification"""
-    card = IDCard.query.filter_by(id_number=id_number).first()
+    card = load_verified_card(id_number)
     
     if not card:
         return jsonify({'verified': False, 'message': 'Card not found'}), 404
     
-    # Check expiry
-    is_expired = card.expiry_date < datetime.now().date()
-    if is_expired:
-        card.status = 'EXPIRED'
-        db.session.commit()
-    
+    # Expiry is evaluated at read time; nothing is written back
+    status = card.status
     return jsonify({
         'verified': True,
         'id_number': card.id_number,
         'full_name': card.full_name,
         'organization': card.organization,
         'nationality': card.nationality,
-        'status': card.status,
+        'status': status,
         'issue_date': card.issue_date.strftime('%Y-%m-%d'),
         'expiry_date': card.expiry_date.strftime('%Y-%m-%d'),
-        'is_valid': card.status == 'VALID',
-        'is_expired': is_expired,
-        'is_revoked': card.status == 'REVOKED',
+        'is_valid': status == 'VALID',
+        'is_expired': card.is_expired,
+        'is_revoked': status == 'REVOKED',
         'card_png': card.card_png,
+        'card_png_url': url_for('card_artifact', card_id=card.id, artifact='png'),
         'has_qr': bool(card.qr_code)
     })
 
+def encode_cursor(timestamp, row_id):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_date_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+
+def keyset_page(query, ts_column, id_column, cursor=None, limit=50):
+    """One page of query in (timestamp, id) descending order, plus the cursor for the next page.
+
+    Seeks past the cursor instead of using OFFSET, so every page costs the
+    same regardless of how deep it is.
+    """
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(ts_column < ts, db.and_(ts_column == ts, id_column < row_id)))
+    rows = query.order_by(ts_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, ts_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+def page_limit(args, default=50, maximum=500):
+    try:
+        return max(1, min(maximum, int(args.get('limit', default))))
+    except ValueError:
+        return default
+
+def filtered_cards_query(args):
+    query = IDCard.query
+    today = datetime.now().date()
+    status = (args.get('status') or '').upper()
+    if status == 'EXPIRED':
+        query = query.filter(db.or_(IDCard.status == 'EXPIRED', IDCard.expiry_date < today))
+    elif status in ('VALID', 'REVOKED'):
+        query = query.filter(IDCard.status == status, IDCard.expiry_date >= today)
+    if args.get('organization'):
+        query = query.filter(IDCard.organization == args['organization'])
+    if args.get('template_id'):
+        try:
+            template_id = int(args['template_id'])
+        except (TypeError, ValueError):
+            raise ValueError('template_id must be an integer')
+        query = query.filter(IDCard.template_id == template_id)
+    created_from = parse_date_arg(args, 'created_from')
+    if created_from:
+        query = query.filter(IDCard.created_at >= created_from)
+    created_to = parse_date_arg(args, 'created_to')
+    if created_to:
+        query = query.filter(IDCard.created_at < created_to + timedelta(days=1))
+    return query
+
+def filtered_logs_query(args):
+    query = AuditLog.query
+    if args.get('action'):
+        query = query.filter(AuditLog.action == args['action'])
+    if args.get('card_id'):
+        query = query.filter(AuditLog.card_id == int(args['card_id']))
+    log_from = parse_date_arg(args, 'from')
+    if log_from:
+        query = query.filter(AuditLog.timestamp >= log_from)
+    log_to = parse_date_arg(args, 'to')
+    if log_to:
+        query = query.filter(AuditLog.timestamp < log_to + timedelta(days=1))
+    return query
+
+def card_summary(card):
+    return {
+        'id': card.id,
+        'id_number': card.id_number,
+        'full_name': card.full_name,
+        'organization': card.organization,
+        'status': card.effective_status,
+        'template_id': card.template_id,
+        'expiry_date': card.expiry_date.strftime('%Y-%m-%d'),
+        'created_at': card.created_at.isoformat() if card.created_at else None,
+        'thumbnail_url': card_thumbnail_url(card)
+    }
+
 @app.route('/settings')
 def settings():
-    cards = IDCard.query.order_by(IDCard.created_at.desc()).all()
+    try:
+        cards, next_cards_cursor = keyset_page(filtered_cards_query(request.args), IDCard.created_at, IDCard.id,
+                                               request.args.get('cursor'), page_limit(request.args))
+        logs, next_logs_cursor = keyset_page(AuditLog.query, AuditLog.timestamp, AuditLog.id,
+                                             request.args.get('logs_cursor'), 50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     templates = CardTemplate.query.all()
     watermark = Watermark.query.first()
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(50).all()
-    return render_template('settings.html', cards=cards, templates=templates, watermark=watermark, logs=logs)
+    filters = {k: request.args.get(k, '') for k in ('status', 'organization', 'template_id', 'created_from', 'created_to')}
+    thumbnails = {card.id: card_thumbnail_url(card) for card in cards}
+    return render_template('settings.html', cards=cards, templates=templates, watermark=watermark, logs=logs,
+                           thumbnails=thumbnails,
+                           next_cards_cursor=next_cards_cursor, next_logs_cursor=next_logs_cursor,
+                           filters=filters, active_tab=request.args.get('tab', 'cards'))
+
+@app.route('/api/cards')
+def list_cards():
+    """Keyset-paginated card listing. Pass next_cursor back as ?cursor= for the following page."""
+    try:
+        cards, next_cursor = keyset_page(filtered_cards_query(request.args), IDCard.created_at, IDCard.id,
+                                         request.args.get('cursor'), page_limit(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'cards': [card_summary(c) for c in cards], 'next_cursor': next_cursor})
+
+@app.route('/api/audit-log')
+def list_audit_log():
+    try:
+        logs, next_cursor = keyset_page(filtered_logs_query(request.args), AuditLog.timestamp, AuditLog.id,
+                                        request.args.get('cursor'), page_limit(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'logs': [{
+            'id': log.id,
+            'timestamp': log.timestamp.isoformat() if log.timestamp else None,
+            'admin_user': log.admin_user,
+            'action': log.action,
+            'card_id': log.card_id,
+            'details': log.details
+        } for log in logs],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/api/card/<int:card_id>/revoke', methods=['POST'])
 def revoke_card(card_id):
     card = IDCard.query.get_or_404(card_id)
     card.status = 'REVOKED'
+    verification_cache.bump()
     db.session.commit()
+    verification_cache.invalidate(card.id_number)
     add_audit_log('Card Revoked', card.id, f"ID: {card.id_number}")
     return jsonify({'success': True})
 
@@ -282,20 +999,186 @@ def revoke_card(card_id):
 def enable_card(card_id):
     card = IDCard.query.get_or_404(card_id)
     card.status = 'VALID'
+    verification_cache.bump()
     db.session.commit()
+    verification_cache.invalidate(card.id_number)
     add_audit_log('Card Enabled', card.id, f"ID: {card.id_number}")
     return jsonify({'success': True})
 
+CARD_FILTER_KEYS = ('status', 'organization', 'template_id', 'created_from', 'created_to')
+BATCH_STATUS_MAX = 50000
+
+def selection_list(selection, name):
+    """selection[name] as a list of ints and strings, or ValueError"""
+    values = selection.get(name) or []
+    if not isinstance(values, list) or not all(isinstance(v, (int, str)) and not isinstance(v, bool) for v in values):
+        raise ValueError(f"{name} must be a list of integers or strings")
+    return values
+
+def card_selection_criteria(selection):
+    """WHERE criteria for a batch request: ids and/or id_numbers, optionally narrowed by a listing filter"""
+    if not isinstance(selection, dict):
+        raise ValueError('Request body must be a JSON object')
+    ids = selection_list(selection, 'ids')
+    id_numbers = selection_list(selection, 'id_numbers')
+    raw_filter = selection.get('filter') or {}
+    if not isinstance(raw_filter, dict):
+        raise ValueError('filter must be an object')
+    card_filter = {}
+    for key, value in raw_filter.items():
+        if key not in CARD_FILTER_KEYS or value in (None, ''):
+            continue
+        if not isinstance(value, (int, str)) or isinstance(value, bool):
+            raise ValueError(f"filter.{key} must be a string")
+        card_filter[key] = str(value)
+    if card_filter.get('status') and card_filter['status'].upper() not in ('VALID', 'REVOKED', 'EXPIRED'):
+        raise ValueError('filter.status must be VALID, REVOKED or EXPIRED')
+    if card_filter.get('template_id'):
+        try:
+            card_filter['template_id'] = int(card_filter['template_id'])
+        except ValueError:
+            raise ValueError('filter.template_id must be an integer')
+    if not ids and not id_numbers and not card_filter:
+        raise ValueError('Provide ids, id_numbers or a non-empty filter')
+    if len(ids) + len(id_numbers) > BATCH_STATUS_MAX:
+        raise ValueError(f"At most {BATCH_STATUS_MAX} cards per request")
+    criteria = []
+    if ids or id_numbers:
+        try:
+            ids = [int(i) for i in ids]
+        except ValueError:
+            raise ValueError('ids must be integers')
+        criteria.append(db.or_(IDCard.id.in_(ids), IDCard.id_number.in_([str(n) for n in id_numbers])))
+    if card_filter:
+        criteria.append(filtered_cards_query(card_filter).whereclause)
+    return criteria
+
+def set_cards_status(selection, status, action):
+    """Change status for every selected card in one UPDATE, returning [(id, id_number)] of changed cards"""
+    criteria = card_selection_criteria(selection) + [IDCard.status != status]
+    stmt = db.update(IDCard).where(*criteria).values(status=status, updated_at=datetime.utcnow()) \
+        .execution_options(synchronize_session=False)
+    if db.engine.dialect.update_returning:
+        changed = db.session.execute(stmt.returning(IDCard.id, IDCard.id_number)).all()
+    else:
+        changed = db.session.query(IDCard.id, IDCard.id_number).filter(*criteria).all()
+        if changed:
+            db.session.execute(stmt.where(IDCard.id.in_([row_id for row_id, _ in changed])))
+    if changed:
+        verification_cache.bump()
+    db.session.commit()
+
+    verification_cache.invalidate(*[id_number for _, id_number in changed])
+    audit_sink.record_many([audit_sink.entry(action, row_id, f"ID: {id_number} (batch)") for row_id, id_number in changed])
+    return changed
+
+def batch_status_response(status, action):
+    try:
+        changed = set_cards_status(request.get_json(silent=True) or {}, status, action)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'status': status, 'updated': len(changed),
+                    'id_numbers': [id_number for _, id_number in changed]})
+
+@app.route('/api/cards/revoke', methods=['POST'])
+def revoke_cards():
+    """Revoke many cards: JSON {"ids": [...]}, {"id_numbers": [...]} and/or {"filter": {...}}"""
+    return batch_status_response('REVOKED', 'Card Revoked')
+
+@app.route('/api/cards/enable', methods=['POST'])
+def enable_cards():
+    return batch_status_response('VALID', 'Card Enabled')
+
+PRINT_SHEET_MAX = 5000
+
+def print_sheet_cards(criteria):
+    """(base key, base image, overlay box, overlay) for each selected card, loaded in id order a batch at a time"""
+    watermark = watermark_settings()
+    last_id = 0
+    while True:
+        cards = IDCard.query.filter(*criteria, IDCard.id > last_id).order_by(IDCard.id).limit(100).all()
+        if not cards:
+            return
+        for card in cards:
+            template = card_template(card)
+            # Both layers at 300 DPI; cutouts come from the photo cache rather than the model
+            base_key, base_image = card_base_layer(card, template, 'print')
+            with Image.open(card_png_path(card, template, watermark, profile='print')) as card_image:
+                box, overlay = split_layers(card_image, base_image)
+            yield base_key, base_image, box, overlay
+        last_id = cards[-1].id
+        # Release the batch so memory stays flat however many cards are printed
+        db.session.expunge_all()
+
+def print_sheet_layout(options):
+    try:
+        gutter = float(options.get('gutter_mm') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('gutter_mm must be a number')
+    if not 0 <= gutter <= 20:
+        raise ValueError('gutter_mm is out of range')
+    return SheetLayout(str(options.get('page') or 'a4').lower(), gutter_mm=gutter)
+
+@app.route('/api/cards/print-sheet', methods=['POST'])
+def print_sheet():
+    """Stream a PDF of the selected cards imposed CR80-size onto A4 or Letter with crop marks.
+
+    Same selection as /api/cards/revoke, plus optional "page" ("a4" or "letter") and "gutter_mm".
+    """
+    options = request.get_json(silent=True) or {}
+    try:
+        criteria = card_selection_criteria(options)
+        layout = print_sheet_layout(options)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    count = db.session.query(db.func.count(IDCard.id)).filter(*criteria).scalar()
+    if not count:
+        return jsonify({'success': False, 'error': 'No cards selected'}), 400
+    if count > PRINT_SHEET_MAX:
+        return jsonify({'success': False, 'error': f"At most {PRINT_SHEET_MAX} cards per sheet export"}), 400
+    add_audit_log('Print Sheet Exported', None, f"{count} cards, {layout.per_page} per page")
+
+    writer = PrintSheetWriter(layout)
+    response = Response(stream_with_context(writer.stream(print_sheet_cards(criteria))), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename="cards_{datetime.now().strftime("%Y%m%d%H%M%S")}.pdf"'
+    return response
+
+@app.cli.command('print-sheet')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--id-number', 'id_numbers', multiple=True, help='Card ID number; repeat for several.')
+@click.option('--status', default=None, help='Filter: VALID, REVOKED or EXPIRED.')
+@click.option('--organization', default=None)
+@click.option('--template-id', default=None)
+@click.option('--page', default='a4', show_default=True, type=click.Choice(['a4', 'letter']))
+@click.option('--gutter-mm', default=0.0, show_default=True)
+def print_sheet_command(output, id_numbers, status, organization, template_id, page, gutter_mm):
+    """Write the selected cards to OUTPUT as CR80 print sheets with crop marks."""
+    selection = {'id_numbers': list(id_numbers),
+                 'filter': {'status': status, 'organization': organization, 'template_id': template_id}}
+    try:
+        criteria = card_selection_criteria(selection)
+        layout = print_sheet_layout({'page': page, 'gutter_mm': gutter_mm})
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    writer = PrintSheetWriter(layout)
+    with open(output, 'wb') as f:
+        for chunk in writer.stream(print_sheet_cards(criteria)):
+            f.write(chunk)
+    click.echo(f"Wrote {writer.cards} cards on {writer.pages} pages ({layout.per_page} per page) to {output}")
+
 @app.route('/admin/card/<int:card_id>/view')
 def view_card_admin(card_id):
-    card = IDCard.query.get_or_404(card_id)
+    # Everything card_version reads, short of the inline signature
+    card = IDCard.query.options(defer(IDCard.signature)).get_or_404(card_id)
     return jsonify({
         'id_number': card.id_number,
         'full_name': card.full_name,
         'organization': card.organization,
         'date_of_birth': card.date_of_birth.strftime('%Y-%m-%d'),
         'status': card.status,
-        'card_png': card.card_png
+        'card_png': card.card_png,
+        **card_urls(card)
     })
 
 @app.route('/api/watermark', methods=['POST'])
@@ -305,14 +1188,22 @@ def update_watermark():
     if not watermark:
         watermark = Watermark()
     
+    pattern = data.get('pattern', 'single')
+    if pattern not in WATERMARK_PATTERNS:
+        return jsonify({'success': False, 'error': f"pattern must be one of {', '.join(WATERMARK_PATTERNS)}"}), 400
+    
     watermark.text = data.get('text', 'STAFF')
     watermark.color = data.get('color', '#888888')
-    watermark.opacity = int(data.get('opacity', 128))
+    watermark.opacity = max(0, min(255, int(data.get('opacity', 128))))
     watermark.position = data.get('position', 'center')
+    watermark.pattern = pattern
     watermark.enabled = data.get('enabled', True)
     
     db.session.add(watermark)
+    template_registry.bump()
     db.session.commit()
+    template_registry.invalidate()
+    watermark_renderer.clear()
     
     return jsonify({'success': True})
 
@@ -335,12 +1226,20 @@ def save_template():
     if not template:
         template = CardTemplate(name=data.get('name'))
     
+    try:
+        config = validate_config(data.get('config', {}))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
     template.name = data.get('name')
-    template.set_config(data.get('config', {}))
+    template.set_config(config)
     template.is_active = data.get('is_active', True)
     
     db.session.add(template)
+    template_registry.bump()
     db.session.commit()
+    template_registry.invalidate()
+    template_layer_cache.invalidate(template.id)
     
     return jsonify({'success': True, 'template_id': template.id})
 
@@ -369,137 +1268,35 @@ def init_db():
             db.session.execute(db.text('ALTER TABLE id_cards ADD COLUMN font_italic BOOLEAN DEFAULT 0'))
         if 'nationality' not in columns:
             db.session.execute(db.text('ALTER TABLE id_cards ADD COLUMN nationality VARCHAR(100)'))
+        if 'background_mode' not in columns:
+            db.session.execute(db.text('ALTER TABLE id_cards ADD COLUMN background_mode VARCHAR(20)'))
+        if 'updated_at' not in columns:
+            db.session.execute(db.text('ALTER TABLE id_cards ADD COLUMN updated_at DATETIME'))
+        if 'signature_hash' not in columns:
+            db.session.execute(db.text('ALTER TABLE id_cards ADD COLUMN signature_hash VARCHAR(64)'))
+            rows = db.session.execute(db.text(
+                "SELECT id, signature FROM id_cards WHERE signature IS NOT NULL AND signature != ''")).all()
+            for row_id, signature in rows:
+                db.session.execute(db.text('UPDATE id_cards SET signature_hash = :h WHERE id = :id'),
+                                   {'h': BlobStore.digest(signature), 'id': row_id})
+        
+        watermark_columns = [c['name'] for c in inspector.get_columns('watermark')]
+        if 'pattern' not in watermark_columns:
+            db.session.execute(db.text("ALTER TABLE watermark ADD COLUMN pattern VARCHAR(20) DEFAULT 'single'"))
+        
+        # Indexes for keyset pagination and filtered listings on existing databases
+        db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_id_cards_created_at ON id_cards (created_at, id)'))
+        db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_id_cards_status ON id_cards (status)'))
+        db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_id_cards_expiry_date ON id_cards (expiry_date)'))
+        db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_id_cards_organization ON id_cards (organization)'))
+        db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_audit_log_timestamp ON audit_log (timestamp, id)'))
         db.session.commit()
         
         # Delete old templates and create modern ones
         CardTemplate.query.delete()
         
         # Modern, professional ID card templates
-        modern_templates = [
-            {
-                'name': 'Executive Elite',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#ffffff',
-                    'header_height': 80,
-                    'header_color': '#1a1f3a',
-                    'photo_bg_color': '#f5f5f5',
-                    'accent_color': '#0066cc',
-                    'photo_x': 25,
-                    'photo_y': 85,
-                    'text_x': 200,
-                    'text_y': 85,
-                    'qr_x': 550,
-                    'qr_y': 310,
-                    'qr_size': 70,
-                    'corner_radius': 8
-                }
-            },
-            {
-                'name': 'Minimalist Clean',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#f8f9fa',
-                    'header_height': 60,
-                    'header_color': '#ffffff',
-                    'photo_bg_color': '#e9ecef',
-                    'accent_color': '#495057',
-                    'photo_x': 25,
-                    'photo_y': 70,
-                    'text_x': 200,
-                    'text_y': 70,
-                    'qr_x': 550,
-                    'qr_y': 315,
-                    'qr_size': 65,
-                    'border_color': '#dee2e6',
-                    'border_width': 2
-                }
-            },
-            {
-                'name': 'Corporate Blue',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#ffffff',
-                    'header_height': 70,
-                    'header_color': '#003d7a',
-                    'photo_bg_color': '#e3f2fd',
-                    'accent_color': '#0066cc',
-                    'photo_x': 25,
-                    'photo_y': 80,
-                    'text_x': 200,
-                    'text_y': 80,
-                    'qr_x': 550,
-                    'qr_y': 310,
-                    'qr_size': 70,
-                    'shadow': True
-                }
-            },
-            {
-                'name': 'Modern Gradient',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#ffffff',
-                    'header_height': 75,
-                    'header_color': '#667eea',
-                    'photo_bg_color': '#f0f4ff',
-                    'accent_color': '#667eea',
-                    'secondary_accent': '#764ba2',
-                    'photo_x': 25,
-                    'photo_y': 85,
-                    'text_x': 200,
-                    'text_y': 85,
-                    'qr_x': 550,
-                    'qr_y': 310,
-                    'qr_size': 70,
-                    'gradient': True
-                }
-            },
-            {
-                'name': 'Professional Dark',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#ffffff',
-                    'header_height': 70,
-                    'header_color': '#2c3e50',
-                    'photo_bg_color': '#ecf0f1',
-                    'accent_color': '#34495e',
-                    'photo_x': 25,
-                    'photo_y': 80,
-                    'text_x': 200,
-                    'text_y': 80,
-                    'qr_x': 550,
-                    'qr_y': 310,
-                    'qr_size': 70
-                }
-            },
-            {
-                'name': 'Tech Modern',
-                'config': {
-                    'width': 640,
-                    'height': 400,
-                    'background_color': '#0f1419',
-                    'header_height': 70,
-                    'header_color': '#1a1f3a',
-                    'photo_bg_color': '#1e2536',
-                    'accent_color': '#00d9ff',
-                    'text_color': '#ffffff',
-                    'photo_x': 25,
-                    'photo_y': 80,
-                    'text_x': 200,
-                    'text_y': 80,
-                    'qr_x': 550,
-                    'qr_y': 310,
-                    'qr_size': 70
-                }
-            }
-        ]
-        
-        for tmpl in modern_templates:
+        for tmpl in DEFAULT_TEMPLATES:
             template = CardTemplate(name=tmpl['name'], is_active=True)
             template.set_config(tmpl['config'])
             db.session.add(template)
@@ -508,7 +1305,100 @@ def init_db():
         watermark = Watermark()
         db.session.add(watermark)
         
+        template_registry.bump()
         db.session.commit()
+        template_registry.invalidate()
+
+@app.route('/api/stats')
+def service_stats():
+    return jsonify({
+        'background_removal': background_remover.stats(),
+        'template_layers': template_layer_cache.stats(),
+        'artifacts': artifact_cache.stats(),
+        'jobs': job_queue.metrics(),
+        'verification': verification_cache.stats(),
+        'resources': resources.stats(),
+        'audit': audit_sink.stats(),
+        'templates': template_registry.stats(),
+        'watermark': watermark_renderer.stats(),
+        'files': file_expiry.stats(),
+        'database': {
+            'backend': db.engine.dialect.name,
+            'pool': db.engine.pool.status(),
+            'sqlite': sqlite_settings(db.engine)
+        }
+    })
+
+def warm_up_services():
+    """Load shared models and render resources before the first request instead of during it"""
+    with app.app_context():
+        sizes = set()
+        for template in template_registry.active():
+            sizes.add((template.config.get('width', 600), template.config.get('height', 380)))
+    resources.preload(sorted(sizes) or [(640, 400)])
+    print(f"Render resources preloaded: {resources.stats()}")
+
+    if app.config['REMBG_PRELOAD']:
+        try:
+            background_remover.load(warm_up=app.config['REMBG_WARMUP'])
+            print(f"Background removal model '{background_remover.model_name}' loaded in {background_remover.load_time:.2f}s")
+        except Exception as e:
+            print(f"Background removal model not preloaded: {e}")
+
+warm_up_lock = threading.Lock()
+warm_up_thread = None
+
+def start_warm_up(wait=False):
+    """Run warm_up_services once per process, in the background unless wait is set.
+    Requests that need the model meanwhile wait for the same load instead of starting another."""
+    global warm_up_thread
+    if warm_up_thread is None:
+        with warm_up_lock:
+            if warm_up_thread is None:
+                warm_up_thread = threading.Thread(target=warm_up_services, name='warm-up', daemon=True)
+                warm_up_thread.start()
+    if wait:
+        warm_up_thread.join()
+
+@app.before_request
+def start_background_workers():
+    # Under a WSGI server __main__ never runs; every worker starts its timer and job threads here,
+    # so jobs queued or leased before a restart are picked up without waiting for a new submission,
+    # and begins preloading models (not at import: bulk workers and CLI commands import this module too)
+    file_expiry.start()
+    job_queue.start()
+    start_warm_up()
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.begin_trace()
+
+@app.after_request
+def add_server_timing(response):
+    started = g.pop('request_started', None)
+    trace = metrics.end_trace()
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        metrics.observe('http_request_duration_seconds', elapsed, endpoint=request.endpoint or 'unknown')
+        response.headers['Server-Timing'] = server_timing(trace, elapsed)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage and request latency histograms plus cache hit rates, in Prometheus text format"""
+    photo_cache = background_remover.cache.stats() if background_remover.cache is not None else None
+    if photo_cache:
+        photo_cache = dict(photo_cache, hits=photo_cache['memory_hits'] + photo_cache['disk_hits'])
+    body = metrics.render({
+        'photo': photo_cache,
+        'template_layers': template_layer_cache.stats(),
+        'resources': resources.stats(),
+        'artifacts': artifact_cache.stats(),
+        'verification': verification_cache.stats(),
+        'watermark': watermark_renderer.stats()
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
 @app.errorhandler(404)
 def not_found(error):
@@ -518,41 +1408,25 @@ def not_found(error):
 def server_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
-def cleanup_old_images():
-    """Delete images older than 2 minutes from static folders"""
-    with app.app_context():
-        now = time.time()
-        max_age = 120  # 2 minutes in seconds
-        
-        folders = [
-            app.config['UPLOAD_FOLDER'],
-            'static/qrcodes',
-            'static/cards',
-            'static/pdfs'
-        ]
-        
-        for folder in folders:
-            if not os.path.exists(folder):
+@app.cli.command('expire-files')
+@click.option('--adopt', is_flag=True, help='First index files already on disk that are not tracked yet.')
+def expire_files_command(adopt):
+    """Delete due and over-quota files now (for cron-driven deployments)."""
+    if adopt:
+        for folder in MANAGED_FOLDERS:
+            if not os.path.isdir(folder):
                 continue
-                
-            for filename in os.listdir(folder):
-                file_path = os.path.join(folder, filename)
-                # Skip .keep files or other important files if any
-                if os.path.isfile(file_path):
-                    file_age = now - os.path.getmtime(file_path)
-                    if file_age > max_age:
-                        try:
-                            os.remove(file_path)
-                            print(f"Deleted old file: {file_path}")
-                        except Exception as e:
-                            print(f"Error deleting {file_path}: {e}")
+            tracked = {n for (n,) in db.session.query(ManagedFile.filename).filter_by(folder=folder)}
+            untracked = [n for n in os.listdir(folder) if n not in tracked and os.path.isfile(os.path.join(folder, n))]
+            file_expiry.track_many(folder, untracked)
+            click.echo(f"Indexed {len(untracked)} files in {folder}")
+    result = file_expiry.run_once(force=True)
+    click.echo(f"Deleted {result['expired']} expired and {result['over_quota']} over-quota files ({result['bytes_freed']} bytes)")
 
 if __name__ == '__main__':
     init_db()
-    
-    # Initialize and start scheduler
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(func=cleanup_old_images, trigger="interval", seconds=60)
-    scheduler.start()
+    start_warm_up(wait=True)
+    job_queue.start()
+    file_expiry.start()
     
     app.run(host='0.0.0.0', port=5000, debug=False)
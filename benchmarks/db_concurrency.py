@@ -0,0 +1,135 @@
+"""Verification read latency while writers commit cards, per SQLite journal mode.
+
+    python benchmarks/db_concurrency.py --seconds 5 --readers 4 --writers 2
+
+Each mode runs in a fresh process against a throwaway database; pass
+--database-url to benchmark another backend (e.g. a local PostgreSQL).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_mode(seconds, readers, writers, seed_cards):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import app as idcards
+    from models import db, IDCard
+
+    app = idcards.app
+    with app.app_context():
+        db.create_all()
+        db.session.query(IDCard).delete()
+        base = {'full_name': 'Bench Mark', 'date_of_birth': '1990-01-01', 'organization': 'Bench',
+                'address': 'Addr', 'issue_date': '2024-01-01', 'expiry_date': '2099-01-01'}
+        for i in range(seed_cards):
+            db.session.add(idcards.build_id_card(dict(base, id_number=f"SEED{i}"), None))
+        db.session.commit()
+
+    stop = threading.Event()
+    latencies, writes, errors = [], [0], [0]
+    lock = threading.Lock()
+
+    def reader(n):
+        client = app.test_client()
+        i = n
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get(f"/api/verify/SEED{i % seed_cards}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+            i += readers
+
+    def writer(n):
+        i = 0
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    db.session.add(idcards.build_id_card(dict(base, id_number=f"W{n}-{i}"), None))
+                    db.session.commit()
+                    with lock:
+                        writes[0] += 1
+                except Exception:
+                    db.session.rollback()
+                    with lock:
+                        errors[0] += 1
+                i += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        settings = idcards.sqlite_settings(db.engine)
+    return {
+        'backend': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'sqlite': settings,
+        'reads': len(latencies),
+        'writes': writes[0],
+        'errors': errors[0],
+        'read_p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'read_p95_ms': round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        'read_p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'read_max_ms': round(max(latencies) * 1000, 3) if latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seed-cards', type=int, default=1000)
+    parser.add_argument('--database-url', help='Benchmark this database instead of temporary SQLite files')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.seconds, args.readers, args.writers, args.seed_cards)))
+        return
+
+    child_args = [sys.executable, os.path.abspath(__file__), '--child', '--seconds', str(args.seconds),
+                  '--readers', str(args.readers), '--writers', str(args.writers), '--seed-cards', str(args.seed_cards)]
+    env = dict(os.environ, VERIFY_CACHE_TTL='0', JOB_WORKERS='0', REMBG_PRELOAD='0')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database_url:
+            modes = {'configured': {'DATABASE_URL': args.database_url}}
+        else:
+            modes = {
+                'rollback_journal': {'SQLITE_WAL': '0', 'SQLITE_SYNCHRONOUS': 'FULL'},
+                'wal': {'SQLITE_WAL': '1', 'SQLITE_SYNCHRONOUS': 'NORMAL'}
+            }
+            for name, mode_env in modes.items():
+                mode_env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, name + '.db')}"
+        for name, mode_env in modes.items():
+            output = subprocess.run(child_args, env=dict(env, **mode_env), capture_output=True, text=True, check=True)
+            results[name] = json.loads(output.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
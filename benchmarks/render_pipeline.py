@@ -0,0 +1,329 @@
+"""Latency, throughput, memory and output size of the card rendering pipeline.
+
+    python benchmarks/render_pipeline.py --cards 10 --workers 1,2,4 --output bench.json
+    python benchmarks/render_pipeline.py --compare bench.json
+
+Every run renders the six seeded templates with the same generated photos
+and signature, so results are comparable between commits. --rembg stub
+(the default) replaces model inference with the chroma key so the suite
+runs offline; use --rembg real to include the model, none to skip it.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import PIL
+from PIL import Image, ImageDraw
+
+from utils.background_removal import background_remover, chroma_key
+from utils.card_generator import CardGenerator, RENDER_PROFILES
+from utils.default_templates import DEFAULT_TEMPLATES
+from utils.metrics import metrics
+from utils.pdf_export import PDFExporter
+from utils.qr_utils import QRCodeGenerator
+from utils.template_cache import layer_key
+from utils.vector_card import VectorCard
+from utils.watermark import apply_watermark
+
+SEED = 1234
+PHOTO_SIZES = ((600, 800), (1200, 1600), (3000, 4000))
+WATERMARK = {'text': 'STAFF', 'color': '#888888', 'opacity': 128, 'position': 'center', 'pattern': 'single'}
+SAMPLE_DATA = {
+    'id_number': 'BENCH0000001',
+    'full_name': 'Alexandra Benchmark',
+    'date_of_birth': '1990-01-01',
+    'organization': 'Benchmark Industries',
+    'address': '1 Performance Way',
+    'nationality': 'Testland',
+    'issue_date': '2024-01-01',
+    'expiry_date': '2034-01-01',
+    'theme': 'default'
+}
+
+
+def make_photos(directory):
+    """Write deterministic portrait-style JPEGs (subject on a near-white backdrop)"""
+    rng = random.Random(SEED)
+    paths = []
+    for width, height in PHOTO_SIZES:
+        image = Image.new('RGB', (width, height), (246, 246, 244))
+        draw = ImageDraw.Draw(image)
+        skin = (rng.randint(150, 230), rng.randint(110, 180), rng.randint(90, 150))
+        draw.ellipse((width * 0.3, height * 0.15, width * 0.7, height * 0.55), fill=skin)
+        draw.rectangle((width * 0.2, height * 0.55, width * 0.8, height), fill=(40, 60, 110))
+        for _ in range(200):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.point((x, y), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        path = os.path.join(directory, f"photo_{width}x{height}.jpg")
+        image.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def make_signature():
+    """Deterministic signature as the data URL the signature pad posts"""
+    rng = random.Random(SEED)
+    image = Image.new('RGBA', (300, 100), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    points = [(10 + i * 14, 50 + rng.randint(-30, 30)) for i in range(21)]
+    draw.line(points, fill=(0, 0, 0, 255), width=3)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def stub_inference(image_bytes):
+    with Image.open(BytesIO(image_bytes)) as photo:
+        keyed = chroma_key(photo.convert('RGB'))
+    buffer = BytesIO()
+    keyed.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def configure(rembg_mode):
+    """Set up background removal for this process; also the pool initializer"""
+    background_remover.cache = None  # measure the work, not the photo cache
+    if rembg_mode == 'stub':
+        background_remover._infer = stub_inference
+
+
+def encode(image, fmt='PNG'):
+    buffer = BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def render_one(job):
+    """Render QR, card, PNG and PDF for one job, returning stage timings and output sizes"""
+    metrics.begin_trace()
+    start = time.perf_counter()
+    data = job['data']
+    qr_image = QRCodeGenerator(job['tmp_dir']).make_image(f"/verify/{data['id_number']}")
+    config = dict(job['config'])
+    card = CardGenerator(config).generate(
+        data, job['photo_path'], qr_image,
+        lambda c: apply_watermark(c, WATERMARK['text'], WATERMARK['color'], WATERMARK['opacity'],
+                                  WATERMARK['position'], WATERMARK['pattern']),
+        None, None, job['layer_key'])
+    with metrics.timed('png_encode'):
+        png = encode(card)
+    pdf = PDFExporter(job['tmp_dir']).export_bytes(card, data)
+    total = time.perf_counter() - start
+    # Vector backend, measured separately from the raster pipeline's end-to-end time
+    vector_pdf = PDFExporter(job['tmp_dir']).export_bytes(
+        VectorCard(config, data, job['photo_path'], f"/verify/{data['id_number']}", WATERMARK), data)
+    return {
+        'stages': metrics.end_trace(),
+        'total': total,
+        'png_bytes': len(png),
+        'pdf_bytes': len(pdf),
+        'pdf_vector_bytes': len(vector_pdf),
+        'qr_bytes': len(encode(qr_image))
+    }
+
+
+def render_profile(job, profile):
+    """Render one job at a render profile, returning (seconds, PNG bytes)"""
+    data = job['data']
+    qr_image = QRCodeGenerator(job['tmp_dir']).make_image(f"/verify/{data['id_number']}")
+    start = time.perf_counter()
+    card_gen = CardGenerator(dict(job['config']), profile=profile)
+    card = card_gen.generate(
+        data, job['photo_path'], qr_image,
+        lambda c: apply_watermark(c, WATERMARK['text'], WATERMARK['color'], WATERMARK['opacity'],
+                                  WATERMARK['position'], WATERMARK['pattern'], card_gen.scale),
+        None, None, layer_key(job['template_id'], 'default', job['config'], profile=profile) if job['layer_key'] else None)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(encode(card))
+
+
+def run_profiles(jobs, iterations):
+    """Render time and PNG size of every job at each render profile"""
+    results = {}
+    for profile in RENDER_PROFILES:
+        for job in jobs:
+            render_profile(job, profile)
+        timings, sizes = [], []
+        for _ in range(iterations):
+            for job in jobs:
+                elapsed, size = render_profile(job, profile)
+                timings.append(elapsed)
+                sizes.append(size)
+        results[profile] = {'render_ms': summarize(timings), 'png_bytes': round(statistics.fmean(sizes))}
+    return results
+
+
+def summarize(values):
+    values = sorted(v * 1000 for v in values)
+    return {
+        'n': len(values),
+        'mean': round(statistics.fmean(values), 3),
+        'p50': round(values[len(values) // 2], 3),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        'max': round(values[-1], 3)
+    }
+
+
+def build_jobs(photos, signature, tmp_dir, background_mode, use_layer_cache):
+    jobs = []
+    for template_id, template in enumerate(DEFAULT_TEMPLATES, start=1):
+        config = dict(template['config'])
+        for photo_path in photos:
+            data = dict(SAMPLE_DATA, signature=signature, background_mode=background_mode)
+            jobs.append({
+                'template': template['name'],
+                'template_id': template_id,
+                'photo': os.path.basename(photo_path),
+                'data': data,
+                'config': config,
+                'photo_path': photo_path,
+                'tmp_dir': tmp_dir,
+                'layer_key': layer_key(template_id, 'default', config) if use_layer_cache else None
+            })
+    return jobs
+
+
+def run_latency(jobs, iterations):
+    for job in jobs:  # warm fonts, backgrounds, base layers and overlays
+        render_one(job)
+    totals, stages, per_template = [], {}, {}
+    for _ in range(iterations):
+        for job in jobs:
+            result = render_one(job)
+            totals.append(result['total'])
+            for stage, seconds in result['stages'].items():
+                stages.setdefault(stage, []).append(seconds)
+            entry = per_template.setdefault(job['template'], {'totals': [], 'png_bytes': [], 'pdf_bytes': [],
+                                                              'pdf_vector_bytes': [], 'qr_bytes': []})
+            entry['totals'].append(result['total'])
+            for key in ('png_bytes', 'pdf_bytes', 'pdf_vector_bytes', 'qr_bytes'):
+                entry[key].append(result[key])
+    return {
+        'end_to_end_ms': summarize(totals),
+        'stages_ms': {stage: summarize(values) for stage, values in sorted(stages.items())},
+        'per_template': {
+            name: {
+                'end_to_end_ms': summarize(entry['totals']),
+                'png_bytes': round(statistics.fmean(entry['png_bytes'])),
+                'pdf_bytes': round(statistics.fmean(entry['pdf_bytes'])),
+                'pdf_vector_bytes': round(statistics.fmean(entry['pdf_vector_bytes'])),
+                'qr_bytes': round(statistics.fmean(entry['qr_bytes']))
+            } for name, entry in per_template.items()
+        }
+    }
+
+
+def run_throughput(jobs, worker_counts, cards, rembg_mode):
+    results = []
+    batch = [jobs[i % len(jobs)] for i in range(cards)]
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure, initargs=(rembg_mode,)) as executor:
+            list(executor.map(render_one, jobs[:workers]))  # start and warm every worker
+            start = time.perf_counter()
+            list(executor.map(render_one, batch))
+            elapsed = time.perf_counter() - start
+        results.append({
+            'workers': workers,
+            'cards': cards,
+            'seconds': round(elapsed, 3),
+            'cards_per_second': round(cards / elapsed, 2)
+        })
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(baseline_path, current):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    rows = [('end_to_end', baseline['latency']['end_to_end_ms'], current['latency']['end_to_end_ms'])]
+    for stage, stats in current['latency']['stages_ms'].items():
+        rows.append((stage, baseline['latency']['stages_ms'].get(stage), stats))
+    print(f"{'stage':<24}{'base p50':>12}{'now p50':>12}{'change':>10}")
+    for name, old, new in rows:
+        if not old:
+            print(f"{name:<24}{'-':>12}{new['p50']:>12.3f}{'new':>10}")
+            continue
+        change = (new['p50'] - old['p50']) / old['p50'] * 100 if old['p50'] else 0.0
+        print(f"{name:<24}{old['p50']:>12.3f}{new['p50']:>12.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5, help='Latency iterations over every template/photo pair')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts for the throughput run')
+    parser.add_argument('--throughput-cards', type=int, default=60)
+    parser.add_argument('--rembg', choices=('stub', 'real', 'none'), default='stub')
+    parser.add_argument('--no-layer-cache', action='store_true', help='Rebuild the template base layer for every card')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='Baseline JSON to print p50 changes against')
+    args = parser.parse_args()
+
+    configure(args.rembg)
+    worker_counts = [int(n) for n in args.workers.split(',') if n.strip()]
+    background_mode = 'none' if args.rembg == 'none' else 'ai'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        photos = make_photos(tmp_dir)
+        jobs = build_jobs(photos, make_signature(), tmp_dir, background_mode, not args.no_layer_cache)
+        latency = run_latency(jobs, args.cards)
+        profiles = run_profiles(jobs, args.cards)
+        main_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        throughput = run_throughput(jobs, worker_counts, args.throughput_cards, args.rembg)
+        worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'rembg': args.rembg,
+            'layer_cache': not args.no_layer_cache,
+            'templates': len(DEFAULT_TEMPLATES),
+            'photos': [f"{w}x{h}" for w, h in PHOTO_SIZES]
+        },
+        'latency': latency,
+        'profiles': profiles,
+        'throughput': throughput,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        'peak_rss_mb': {
+            'main': round(main_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+            'largest_worker': round(worker_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+        }
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
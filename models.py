@@ -1,11 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, date
 import json
 
 db = SQLAlchemy()
 
 class IDCard(db.Model):
     __tablename__ = 'id_cards'
+    __table_args__ = (
+        db.Index('ix_id_cards_created_at', 'created_at', 'id'),
+        db.Index('ix_id_cards_status', 'status'),
+        db.Index('ix_id_cards_expiry_date', 'expiry_date'),
+        db.Index('ix_id_cards_organization', 'organization'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     id_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -15,7 +21,10 @@ class IDCard(db.Model):
     address = db.Column(db.String(500), nullable=False)
     issue_date = db.Column(db.Date, nullable=False)
     expiry_date = db.Column(db.Date, nullable=False)
-    signature = db.Column(db.Text) # Base64 signature
+    # Base64 signature; deferred so listings and verification never load it.
+    # Empty when the signature lives in the blob store under signature_hash.
+    signature = db.deferred(db.Column(db.Text))
+    signature_hash = db.Column(db.String(64))  # sha256 of the signature data URL
     nationality = db.Column(db.String(100), nullable=True)
     logo_filename = db.Column(db.String(255))
     font_family = db.Column(db.String(100), default='DejaVuSans')
@@ -25,14 +34,23 @@ class IDCard(db.Model):
     font_italic = db.Column(db.Boolean, default=False)
     background_filename = db.Column(db.String(255), nullable=True)
     theme = db.Column(db.String(50), default='default')
+    background_mode = db.Column(db.String(20), nullable=True)  # ai, chroma, none
     photo_filename = db.Column(db.String(255))
     card_png = db.Column(db.String(255))
     card_pdf = db.Column(db.String(255))
     status = db.Column(db.String(20), default='VALID')  # VALID, REVOKED, EXPIRED
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     qr_code = db.Column(db.String(255))
     template_id = db.Column(db.Integer, db.ForeignKey('card_template.id'))
     template = db.relationship('CardTemplate', backref='cards')
+    
+    @property
+    def effective_status(self):
+        """Stored status, reported as EXPIRED once the expiry date has passed"""
+        if self.expiry_date and self.expiry_date < date.today():
+            return 'EXPIRED'
+        return self.status
 
 class CardTemplate(db.Model):
     __tablename__ = 'card_template'
@@ -57,11 +75,22 @@ class Watermark(db.Model):
     color = db.Column(db.String(7), default='#888888')  # Hex color
     opacity = db.Column(db.Integer, default=128)  # 0-255
     position = db.Column(db.String(20), default='center')  # top, center, bottom
+    pattern = db.Column(db.String(20), default='single')  # single, diagonal, tiled
     enabled = db.Column(db.Boolean, default=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class ConfigVersion(db.Model):
+    """Counter bumped whenever templates or the watermark change, so worker processes know to reload"""
+    __tablename__ = 'config_version'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_timestamp', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     admin_user = db.Column(db.String(100), default='user')
@@ -77,3 +106,51 @@ class AdminUser(db.Model):
     username = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_job'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), default='QUEUED', index=True)  # QUEUED, RUNNING, DONE, FAILED
+    payload = db.Column(db.Text, nullable=False)  # JSON string
+    result = db.Column(db.Text)  # JSON string
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    callback_url = db.Column(db.String(500))
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    lease_expires = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def get_payload(self):
+        return json.loads(self.payload)
+    
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+class ManagedFile(db.Model):
+    """A generated or uploaded file and when it may be deleted (NULL: kept until released)"""
+    __tablename__ = 'managed_file'
+    __table_args__ = (
+        db.UniqueConstraint('folder', 'filename', name='uq_managed_file_path'),
+        db.Index('ix_managed_file_expires_at', 'expires_at'),
+        db.Index('ix_managed_file_folder_created', 'folder', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    folder = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+
+class ScheduledTask(db.Model):
+    """Lease row so a periodic task runs in one process per interval across the deployment"""
+    __tablename__ = 'scheduled_task'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    lease_until = db.Column(db.DateTime)
+    last_run = db.Column(db.DateTime)
+    last_result = db.Column(db.Text)  # JSON string
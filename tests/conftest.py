@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+CARD = {
+    'full_name': 'Jane Doe',
+    'date_of_birth': '1990-01-01',
+    'organization': 'Org',
+    'address': 'Addr',
+    'issue_date': '2020-01-01',
+    'expiry_date': '2030-01-01',
+    'background_mode': 'none'
+}
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    # app.py resolves its folders against the working directory at import time, so the app runs in
+    # a scratch directory that only borrows the read-only assets from the checkout
+    workdir = tempfile.mkdtemp(prefix='idcard-tests-')
+    os.makedirs(os.path.join(workdir, 'static'))
+    os.symlink(os.path.join(ROOT, 'static', 'backgrounds'), os.path.join(workdir, 'static', 'backgrounds'))
+    os.chdir(workdir)
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'idcards.db')}",
+        'PHOTO_CACHE_DIR': os.path.join(workdir, 'cache', 'photos'),
+        'REMBG_PRELOAD': '0',
+        'REMBG_WARMUP': '0',
+        'JOB_WORKERS': '0',
+        'PERSIST_ARTIFACTS': ''
+    })
+    import app as app_module
+    app_module.init_db()
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def template_id(app_module):
+    with app_module.app.app_context():
+        return app_module.template_registry.active()[0].id
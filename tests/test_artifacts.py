@@ -0,0 +1,95 @@
+import os
+
+from conftest import CARD
+from utils.artifacts import ArtifactCache
+
+
+def test_replace_drops_only_other_versions_of_the_same_key(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    cache.put('aaa-png_v1.png', b'1', replace=True)
+    cache.put('aaa-png-png_v1.png', b'other card', replace=True)
+    cache.put('aaa-pdf_v1.pdf', b'pdf', replace=True)
+    cache.put('aaa-png_v2.png', b'2', replace=True)
+    assert sorted(os.listdir(tmp_path)) == ['aaa-pdf_v1.pdf', 'aaa-png-png_v1.png', 'aaa-png_v2.png']
+
+
+def test_put_without_replace_keeps_old_versions(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    cache.put('k_v1.png', b'1')
+    cache.put('k_v2.png', b'2')
+    assert cache.get('k_v1.png') and cache.get('k_v2.png')
+
+
+def test_least_recently_served_is_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=10)
+    cache.put('a_v.png', b'aaaa')
+    cache.put('b_v.png', b'bbbb')
+    assert cache.get('a_v.png')
+    cache.put('c_v.png', b'cccc')
+    assert cache.get('b_v.png') is None
+    assert cache.get('a_v.png') and cache.get('c_v.png')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_get_or_create_builds_once(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    calls = []
+    for _ in range(3):
+        path = cache.get_or_create('k_v.png', lambda: calls.append(1) or b'data')
+    assert calls == [1]
+    assert open(path, 'rb').read() == b'data'
+    assert cache.stats()['misses'] == 1
+
+
+def test_other_processes_writes_are_picked_up(tmp_path):
+    ArtifactCache(str(tmp_path)).put('k_v.png', b'data')
+    assert ArtifactCache(str(tmp_path)).get('k_v.png')
+
+
+def test_id_numbers_that_look_alike_keep_separate_artifacts(app_module):
+    names = {app_module.artifact_name(id_number, 'png', 'v1') for id_number in ('A', 'A_png', 'a/b', 'a_b')}
+    assert len(names) == 4
+    assert len({app_module.artifact_cache._key(name) for name in names}) == 4
+
+
+def test_new_version_replaces_the_old_file(app_module, client, template_id):
+    response = client.post('/generate', data=dict(CARD, id_number='ART-1', template_id=str(template_id)))
+    card_id = response.get_json()['card_id']
+    neighbour = client.post('/generate', data=dict(CARD, id_number='ART-1_png', template_id=str(template_id)))
+    assert client.get(f"/card/{card_id}/png").status_code == 200
+
+    with app_module.app.app_context():
+        card = app_module.db.session.get(app_module.IDCard, card_id)
+        old_etag = client.get(f"/card/{card_id}/png").headers['ETag']
+        card.full_name = 'Jane Roe'
+        app_module.db.session.commit()
+    response = client.get(f"/card/{card_id}/png")
+    assert response.status_code == 200 and response.headers['ETag'] != old_etag
+
+    cache_dir = app_module.app.config['ARTIFACT_CACHE_DIR']
+    own = [n for n in os.listdir(cache_dir) if n.startswith(app_module.artifact_key('ART-1', 'png') + '_')]
+    assert len(own) == 1
+    # Caching ART-1's new version must not touch the card whose id starts the same way
+    other = app_module.artifact_key('ART-1_png', 'png')
+    assert neighbour.status_code == 200 and any(n.startswith(other + '_') for n in os.listdir(cache_dir))
+
+
+def test_last_modified_follows_the_artifact_not_the_card(app_module, client, template_id):
+    card_id = client.post('/generate', data=dict(CARD, id_number='ART-LM', template_id=str(template_id))).get_json()['card_id']
+    first = client.get(f"/card/{card_id}/png")
+    assert client.get(f"/card/{card_id}/png", headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Backdate the cached file so the re-render lands in a later second
+    cache_dir = app_module.app.config['ARTIFACT_CACHE_DIR']
+    key = app_module.artifact_key('ART-LM', 'png')
+    for name in os.listdir(cache_dir):
+        if name.startswith(key + '_'):
+            os.utime(os.path.join(cache_dir, name), (0, 1_000_000_000))
+    stale = client.get(f"/card/{card_id}/png")
+    since = stale.headers['Last-Modified']
+
+    assert client.post('/api/watermark', json={'text': 'CHANGED'}).status_code == 200
+    response = client.get(f"/card/{card_id}/png", headers={'If-Modified-Since': since})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != stale.headers['ETag']
+    assert response.headers['Last-Modified'] != since
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+from conftest import CARD
+from utils.audit import AuditSink
+
+
+def logged(app_module, action):
+    with app_module.app.app_context():
+        return app_module.AuditLog.query.filter_by(action=action).count()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_a_full_batch_triggers_a_write_and_stop_writes_the_rest(app_module):
+    sink = AuditSink(app_module.app, batch_size=3, flush_interval=60)
+    sink.record_many([sink.entry('Audit Size', details=str(i)) for i in range(2)])
+    time.sleep(0.1)
+    assert sink.stats()['queue_depth'] == 2 and sink.stats()['written'] == 0
+    sink.record_many([sink.entry('Audit Size', details=str(i)) for i in range(2, 7)])
+    wait_for(lambda: sink.stats()['written'] == 7)
+    stats = sink.stats()
+    assert (stats['batches'], stats['queue_depth']) == (3, 0)
+    assert stats['last_flush_ms'] is not None
+
+    sink.record('Audit Size', details='last')
+    sink.stop()
+    assert sink.stats()['written'] == 8
+    assert logged(app_module, 'Audit Size') == 8
+
+
+def test_partial_batch_is_written_after_the_interval(app_module):
+    sink = AuditSink(app_module.app, batch_size=100, flush_interval=0.05)
+    sink.record('Audit Interval')
+    wait_for(lambda: sink.stats()['written'] == 1)
+    sink.stop()
+    assert logged(app_module, 'Audit Interval') == 1
+
+
+def test_attached_entry_commits_or_rolls_back_with_the_caller(app_module):
+    sink = AuditSink(app_module.app)
+    with app_module.app.app_context():
+        sink.attach('Audit Attached Rollback')
+        app_module.db.session.rollback()
+        sink.attach('Audit Attached Commit')
+        app_module.db.session.commit()
+    assert logged(app_module, 'Audit Attached Rollback') == 0
+    assert logged(app_module, 'Audit Attached Commit') == 1
+    assert sink.stats()['written'] == 0
+
+
+def test_batch_revoke_commits_once(app_module, client, template_id):
+    with app_module.app.app_context():
+        app_module.db.session.add_all([app_module.build_id_card(dict(CARD, id_number=f"AUD-{i}"), template_id)
+                                       for i in range(20)])
+        app_module.db.session.commit()
+
+    commits = []
+    request_thread = threading.get_ident()
+
+    def count(connection):
+        if threading.get_ident() == request_thread:
+            commits.append(1)
+
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    event.listen(engine, 'commit', count)
+    try:
+        response = client.post('/api/cards/revoke', json={'id_numbers': [f"AUD-{i}" for i in range(20)]})
+    finally:
+        event.remove(engine, 'commit', count)
+    assert response.get_json()['updated'] == 20
+    assert len(commits) == 1
+
+    app_module.audit_sink.flush()
+    with app_module.app.app_context():
+        assert app_module.AuditLog.query.filter(app_module.AuditLog.details.like('ID: AUD-% (batch)')).count() == 20
@@ -0,0 +1,89 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from utils.background_removal import BackgroundRemover
+
+
+class FakeInput:
+    name = 'input.1'
+
+    def __init__(self, shape):
+        self.shape = shape
+
+
+class FakeOnnxSession:
+    def __init__(self, shape):
+        self.shape = shape
+        self.runs = []
+
+    def get_inputs(self):
+        return [FakeInput(self.shape)]
+
+    def run(self, outputs, feed):
+        batch = feed['input.1']
+        self.runs.append(batch.shape)
+        return [np.ones((batch.shape[0], 1) + batch.shape[2:], dtype=np.float32)]
+
+
+class FakeSession:
+    def __init__(self, name='u2net', shape=('batch', 3, 320, 320), inner=True):
+        self._name = name
+        if inner:
+            self.inner_session = FakeOnnxSession(shape)
+
+    def name(self):
+        return self._name
+
+
+def png(colour):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), colour).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def remover(session):
+    remover = BackgroundRemover(batch_size=4)
+    remover._new_session = lambda: session
+    remover._infer = lambda image_bytes: b'single'
+    return remover
+
+
+def test_batch_runs_once_for_several_photos():
+    session = FakeSession()
+    background = remover(session)
+    results = background.remove_many([png('red'), png('blue'), png('green')])
+    assert session.inner_session.runs == [(3, 3, 320, 320)]
+    assert all(Image.open(BytesIO(result)).size == (40, 30) for result in results)
+    stats = background.stats()
+    assert (stats['batching'], stats['batches'], stats['unbatched_photos']) == (True, 1, 0)
+
+
+def test_model_without_batch_axis_falls_back_visibly():
+    background = remover(FakeSession(shape=(1, 3, 320, 320)))
+    assert background.remove_many([png('red'), png('blue')]) == [b'single', b'single']
+    stats = background.stats()
+    assert stats['batching'] is False
+    assert 'no batch axis' in stats['batch_unavailable']
+    assert stats['unbatched_photos'] == 2
+
+
+def test_missing_rembg_internal_is_reported():
+    background = remover(FakeSession(inner=False))
+    assert background.remove_many([png('red'), png('blue')]) == [b'single', b'single']
+    stats = background.stats()
+    assert 'inner_session' in stats['missing_internals']
+    assert stats['unbatched_photos'] == 2
+
+
+def test_failed_batch_only_falls_back_for_that_batch():
+    session = FakeSession()
+    background = remover(session)
+    run = session.inner_session.run
+    session.inner_session.run = lambda outputs, feed: (_ for _ in ()).throw(RuntimeError('boom'))
+    assert background.remove_many([png('red'), png('blue')]) == [b'single', b'single']
+    session.inner_session.run = run
+    background.remove_many([png('green'), png('white')])
+    stats = background.stats()
+    assert (stats['batching'], stats['batches'], stats['unbatched_photos']) == (True, 1, 2)
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import CARD
+
+
+@pytest.fixture(scope='module')
+def offboarded(app_module, template_id):
+    with app_module.app.app_context():
+        cards = []
+        for i, (organization, created) in enumerate([('Leaving Org', datetime(2023, 1, 10)),
+                                                     ('Leaving Org', datetime(2023, 2, 10)),
+                                                     ('Leaving Org', datetime(2023, 6, 10)),
+                                                     ('Staying Org', datetime(2023, 1, 10))]):
+            card = app_module.build_id_card(dict(CARD, id_number=f"BATCH-{i}", organization=organization), template_id)
+            card.created_at = created
+            cards.append(card)
+        app_module.db.session.add_all(cards)
+        app_module.db.session.commit()
+        return [card.id for card in cards]
+
+
+def statuses(app_module, ids):
+    with app_module.app.app_context():
+        return [app_module.db.session.get(app_module.IDCard, card_id).status for card_id in ids]
+
+
+def test_filter_selects_organisation_and_date_range(app_module, client, offboarded):
+    response = client.post('/api/cards/revoke', json={'filter': {
+        'organization': 'Leaving Org', 'created_from': '2023-01-01', 'created_to': '2023-03-31'}})
+    body = response.get_json()
+    assert response.status_code == 200 and body['updated'] == 2
+    assert sorted(body['id_numbers']) == ['BATCH-0', 'BATCH-1']
+    assert statuses(app_module, offboarded) == ['REVOKED', 'REVOKED', 'VALID', 'VALID']
+
+    # Cards already in the target status are left alone
+    response = client.post('/api/cards/revoke', json={'ids': offboarded[:3]})
+    assert response.get_json()['id_numbers'] == ['BATCH-2']
+
+    response = client.post('/api/cards/enable', json={'ids': [offboarded[0]], 'id_numbers': ['BATCH-1']})
+    assert response.get_json()['updated'] == 2
+    assert statuses(app_module, offboarded) == ['VALID', 'VALID', 'REVOKED', 'VALID']
+
+
+def test_ids_and_filter_combine_as_and(app_module, client, offboarded):
+    response = client.post('/api/cards/revoke', json={'ids': [offboarded[3]], 'filter': {'organization': 'Leaving Org'}})
+    assert response.get_json()['updated'] == 0
+
+
+@pytest.mark.parametrize('body, error', [
+    ([1, 2], 'Request body must be a JSON object'),
+    ({}, 'Provide ids, id_numbers or a non-empty filter'),
+    ({'ids': 'BATCH-0'}, 'ids must be a list of integers or strings'),
+    ({'ids': [True]}, 'ids must be a list of integers or strings'),
+    ({'ids': ['x']}, 'ids must be integers'),
+    ({'id_numbers': [{'a': 1}]}, 'id_numbers must be a list of integers or strings'),
+    ({'filter': ['Leaving Org']}, 'filter must be an object'),
+    ({'filter': {'organization': ['a']}}, 'filter.organization must be a string'),
+    ({'filter': {'status': 'LOST'}}, 'filter.status must be VALID, REVOKED or EXPIRED'),
+    ({'filter': {'template_id': 'one'}}, 'filter.template_id must be an integer'),
+    ({'filter': {'created_from': 'yesterday'}}, 'created_from must be YYYY-MM-DD'),
+])
+def test_bad_selections_are_rejected(client, body, error):
+    response = client.post('/api/cards/revoke', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': error}
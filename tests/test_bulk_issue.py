@@ -0,0 +1,37 @@
+from io import BytesIO
+
+from PIL import Image
+
+from conftest import CARD
+
+
+def run_batch(app_module, rows, template_id, **kwargs):
+    with app_module.app.app_context():
+        return list(app_module.run_bulk_issue(rows, {}, template_id, max_workers=1, **kwargs))
+
+
+def test_rows_render_with_their_own_theme(app_module, client, template_id):
+    rows = [dict(CARD, id_number='BULK-RED', theme='red'), dict(CARD, id_number='BULK-DEFAULT')]
+    events = run_batch(app_module, rows, str(template_id), theme='green')
+    complete = events[-1]
+    assert complete['event'] == 'complete' and complete['created'] == 2
+
+    with app_module.app.app_context():
+        red = app_module.IDCard.query.filter_by(id_number='BULK-RED').one()
+        default = app_module.IDCard.query.filter_by(id_number='BULK-DEFAULT').one()
+        assert (red.theme, default.theme) == ('red', 'green')
+        assert red.template_id == template_id
+
+    # The PNG seeded by the batch must be the one a re-render of the stored card would produce
+    for card, colour in ((red, (204, 0, 0)), (default, (0, 102, 51))):
+        response = client.get(f"/card/{card.id}/png")
+        assert response.status_code == 200
+        image = Image.open(BytesIO(response.data)).convert('RGB')
+        assert image.getpixel((image.width - 5, 5)) == colour
+
+
+def test_row_background_is_stored(app_module, template_id):
+    rows = [dict(CARD, id_number='BULK-BG', background_image='bg2.png')]
+    run_batch(app_module, rows, template_id, background_filename='bg1.png')
+    with app_module.app.app_context():
+        assert app_module.IDCard.query.filter_by(id_number='BULK-BG').one().background_filename == 'bg2.png'
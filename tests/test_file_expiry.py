@@ -0,0 +1,113 @@
+import os
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from conftest import CARD
+from models import ManagedFile
+from utils.file_expiry import FileExpiryManager
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return str(tmp_path)
+
+
+def write(folder, name, size=100):
+    with open(os.path.join(folder, name), 'wb') as f:
+        f.write(b'x' * size)
+
+
+def make_due(app_module, folder, *names):
+    with app_module.app.app_context():
+        ManagedFile.query.filter(ManagedFile.folder == folder, ManagedFile.filename.in_(names)) \
+            .update({'expires_at': datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False)
+        app_module.db.session.commit()
+
+
+def indexed(app_module, folder):
+    with app_module.app.app_context():
+        return {row.filename: row.expires_at for row in ManagedFile.query.filter_by(folder=folder)}
+
+
+def test_sweep_deletes_exactly_the_due_files(app_module, folder):
+    manager = FileExpiryManager(app_module.app, ttl=60, interval=0)
+    for name in ('a.png', 'b.png', 'c.png'):
+        write(folder, name)
+    with app_module.app.app_context():
+        manager.track_many(folder, ['a.png', 'b.png', 'c.png'])
+    make_due(app_module, folder, 'a.png', 'b.png')
+    with app_module.app.app_context():
+        result = manager.sweep()
+    assert result['expired'] >= 2 and result['bytes_freed'] >= 200
+    assert os.listdir(folder) == ['c.png']
+    assert list(indexed(app_module, folder)) == ['c.png']
+
+
+def test_retained_and_in_use_files_survive(app_module, folder):
+    manager = FileExpiryManager(app_module.app, ttl=60, interval=0,
+                                in_use=lambda f, names: {'used.png'} if f == folder else set())
+    for name in ('kept.png', 'used.png', 'gone.png'):
+        write(folder, name)
+    with app_module.app.app_context():
+        manager.track_many(folder, ['kept.png', 'used.png', 'gone.png'])
+        manager.retain(folder, ['kept.png'])
+        app_module.db.session.commit()
+    make_due(app_module, folder, 'used.png', 'gone.png')
+    with app_module.app.app_context():
+        manager.sweep()
+    assert sorted(os.listdir(folder)) == ['kept.png', 'used.png']
+    rows = indexed(app_module, folder)
+    assert rows['kept.png'] is None
+    assert rows['used.png'] > datetime.utcnow() + timedelta(seconds=30)
+
+
+def test_quota_trims_oldest_expiring_files(app_module, folder):
+    manager = FileExpiryManager(app_module.app, ttl=3600, interval=0, quotas={folder: 250})
+    with app_module.app.app_context():
+        for name in ('1.png', '2.png', '3.png', '4.png', 'retained.png'):
+            write(folder, name)
+            manager.track(folder, name)
+        manager.retain(folder, ['retained.png'])
+        app_module.db.session.commit()
+        result = manager.sweep()
+    assert result['over_quota'] == 2
+    assert sorted(os.listdir(folder)) == ['3.png', '4.png', 'retained.png']
+
+
+def test_never_expiring_and_missing_files(app_module, folder):
+    manager = FileExpiryManager(app_module.app, ttl=60, interval=0)
+    with app_module.app.app_context():
+        manager.track(folder, 'forever.png', ttl=0)
+        manager.track(folder, 'missing.png')
+        manager.track(folder, None)
+    rows = indexed(app_module, folder)
+    assert rows['forever.png'] is None and set(rows) == {'forever.png', 'missing.png'}
+    make_due(app_module, folder, 'missing.png')
+    with app_module.app.app_context():
+        manager.sweep()
+    assert set(indexed(app_module, folder)) == {'forever.png'}
+
+
+def test_only_the_lease_holder_sweeps(app_module):
+    first = FileExpiryManager(app_module.app, ttl=60, interval=60)
+    second = FileExpiryManager(app_module.app, ttl=60, interval=60)
+    assert first.run_once(force=True) is not None
+    assert second.run_once() is None
+    assert second.run_once(force=True) is not None
+    with app_module.app.app_context():
+        assert first.stats()['last_result'] is not None
+
+
+def test_photos_of_issued_cards_are_retained(app_module, client, template_id):
+    buffer = BytesIO()
+    Image.new('RGB', (50, 60), 'white').save(buffer, format='JPEG')
+    response = client.post('/generate', data=dict(CARD, id_number='EXP-1', template_id=str(template_id),
+                                                  photo=(BytesIO(buffer.getvalue()), 'p.jpg')))
+    with app_module.app.app_context():
+        card = app_module.db.session.get(app_module.IDCard, response.get_json()['card_id'])
+        row = ManagedFile.query.filter_by(folder=app_module.app.config['UPLOAD_FOLDER'],
+                                          filename=card.photo_filename).one()
+        assert row.expires_at is None
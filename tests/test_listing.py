@@ -0,0 +1,86 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import CARD
+
+ORG = 'Listing Org'
+BASE_TIME = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture(scope='module')
+def listed_cards(app_module, template_id):
+    """Twelve cards of one organisation; pairs share a created_at so the id tie-break is exercised"""
+    with app_module.app.app_context():
+        cards = []
+        for i in range(12):
+            card = app_module.build_id_card(dict(CARD, id_number=f"LIST-{i:02d}", organization=ORG), template_id)
+            card.created_at = BASE_TIME + timedelta(hours=i // 2)
+            if i == 3:
+                card.status = 'REVOKED'
+            if i == 4:
+                card.expiry_date = date.today() - timedelta(days=1)
+            cards.append(card)
+        app_module.db.session.add_all(cards)
+        app_module.db.session.commit()
+        return [(card.created_at, card.id, card.id_number) for card in cards]
+
+
+def pages(client, url, key, **params):
+    seen, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = client.get(url, query_string=query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert len(body[key]) <= int(params.get('limit', 50))
+        seen.extend(body[key])
+        cursor = body['next_cursor']
+        if not cursor:
+            return seen
+
+
+def test_pages_cover_every_card_once_in_keyset_order(client, listed_cards):
+    cards = pages(client, '/api/cards', 'cards', organization=ORG, limit=5)
+    expected = [id_number for _, _, id_number in sorted(listed_cards, reverse=True)]
+    assert [card['id_number'] for card in cards] == expected
+
+
+def test_filters(client, listed_cards, template_id):
+    revoked = pages(client, '/api/cards', 'cards', organization=ORG, status='revoked')
+    assert [card['id_number'] for card in revoked] == ['LIST-03']
+    expired = pages(client, '/api/cards', 'cards', organization=ORG, status='EXPIRED')
+    assert [card['id_number'] for card in expired] == ['LIST-04']
+    valid = pages(client, '/api/cards', 'cards', organization=ORG, status='VALID', template_id=template_id)
+    assert len(valid) == 10
+    first_day = pages(client, '/api/cards', 'cards', organization=ORG, created_from='2024-05-01',
+                      created_to='2024-05-01')
+    assert len(first_day) == 12
+    assert pages(client, '/api/cards', 'cards', organization=ORG, created_from='2024-05-02') == []
+
+
+@pytest.mark.parametrize('params', [{'cursor': 'not-a-cursor'}, {'template_id': 'x'}, {'created_from': '01/05/2024'}])
+def test_bad_parameters_are_rejected(client, params):
+    response = client.get('/api/cards', query_string=params)
+    assert response.status_code == 400 and response.get_json()['error']
+
+
+def test_audit_log_pages(app_module, client, listed_cards):
+    with app_module.app.app_context():
+        entries = [app_module.AuditLog(action='Listing Test', card_id=card_id, details=str(i),
+                                       timestamp=BASE_TIME + timedelta(minutes=i // 3))
+                   for i, (_, card_id, _) in enumerate(listed_cards)]
+        app_module.db.session.add_all(entries)
+        app_module.db.session.commit()
+        expected = sorted(((e.timestamp, e.id) for e in entries), reverse=True)
+    logs = pages(client, '/api/audit-log', 'logs', action='Listing Test', limit=4)
+    assert [log['id'] for log in logs] == [row_id for _, row_id in expected]
+
+
+def test_listing_is_served_from_the_created_at_index(app_module, listed_cards):
+    with app_module.app.app_context():
+        query = app_module.filtered_cards_query({}).order_by(app_module.IDCard.created_at.desc(),
+                                                            app_module.IDCard.id.desc()).limit(51)
+        sql = str(query.statement.compile(app_module.db.engine, compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(str(row[-1]) for row in app_module.db.session.execute(app_module.db.text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert 'ix_id_cards_created_at' in plan and 'TEMP B-TREE' not in plan
@@ -0,0 +1,58 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from conftest import CARD
+from utils.card_generator import CardGenerator, PHOTO_RENDER_EDGE, PHOTO_SIZE, IMAGE_SCALE
+from utils.photo_ingest import default_max_edge, inference_bytes, ingest_photo, open_normalized, ORIENTATION_TAG
+
+
+def jpeg(size, orientation=None):
+    image = Image.new('RGB', size, (200, 120, 80))
+    exif = image.getexif()
+    if orientation:
+        exif[ORIENTATION_TAG] = orientation
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def test_default_edge_covers_the_largest_rendered_photo(monkeypatch):
+    monkeypatch.delenv('PHOTO_MAX_EDGE', raising=False)
+    assert PHOTO_RENDER_EDGE == PHOTO_SIZE * IMAGE_SCALE
+    assert default_max_edge('u2net', PHOTO_RENDER_EDGE) == PHOTO_RENDER_EDGE
+    assert default_max_edge('isnet-general-use', PHOTO_RENDER_EDGE) == 1024
+    monkeypatch.setenv('PHOTO_MAX_EDGE', '500')
+    assert default_max_edge('u2net', PHOTO_RENDER_EDGE) == 500
+
+
+def test_open_normalized_shrinks_and_rotates():
+    image = open_normalized(jpeg((3000, 2000), orientation=6), 360)
+    assert image.size == (240, 360)
+    assert open_normalized(jpeg((100, 50)), 360).size == (100, 50)
+
+
+def test_ingested_photo_is_passed_to_the_model_as_stored(tmp_path):
+    filename = ingest_photo(jpeg((2000, 1500), orientation=6), str(tmp_path), 'p.jpeg', 360)
+    path = os.path.join(tmp_path, filename)
+    with Image.open(path) as stored:
+        assert stored.size == (270, 360)
+    with open(path, 'rb') as f:
+        assert inference_bytes(path, 360) == f.read()
+
+
+def test_uploaded_photo_is_kept_at_print_resolution(app_module, client, template_id):
+    assert app_module.app.config['PHOTO_MAX_EDGE'] == PHOTO_RENDER_EDGE
+    response = client.post('/generate', data=dict(CARD, id_number='PHOTO-1', template_id=str(template_id),
+                                                  photo=(BytesIO(jpeg((1600, 2000))), 'photo.jpg')))
+    card_id = response.get_json()['card_id']
+    with app_module.app.app_context():
+        card = app_module.db.session.get(app_module.IDCard, card_id)
+        path = os.path.join(app_module.app.config['UPLOAD_FOLDER'], card.photo_filename)
+    with Image.open(path) as stored:
+        assert max(stored.size) == PHOTO_RENDER_EDGE
+
+    # The vector renderer's photo comes out at its full size instead of being stretched in the PDF
+    photo = CardGenerator({}).prepare_photo(path, 'none', max_size=PHOTO_SIZE * IMAGE_SCALE)
+    assert max(photo.size) == PHOTO_SIZE * IMAGE_SCALE
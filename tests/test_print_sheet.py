@@ -0,0 +1,116 @@
+import re
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from conftest import CARD
+from utils.print_sheet import CR80, PrintSheetWriter, SheetLayout, split_layers
+
+
+def check_pdf(data):
+    """Structural checks a reader relies on: every xref offset points at its object, startxref at the xref"""
+    assert data.startswith(b'%PDF-1.4') and data.endswith(b'%%EOF\n')
+    xref = int(re.search(rb'startxref\n(\d+)\n%%EOF', data).group(1))
+    assert data[xref:].startswith(b'xref\n')
+    count = int(re.match(rb'xref\n0 (\d+)\n', data[xref:]).group(1))
+    offsets = re.findall(rb'(\d{10}) 00000 n ', data[xref:])
+    assert len(offsets) == count - 1
+    for obj_id, offset in enumerate(offsets, start=1):
+        assert data[int(offset):].startswith(f"{obj_id} 0 obj".encode())
+    return data
+
+
+@pytest.mark.parametrize('page, per_page, landscape', [('a4', 10, False), ('letter', 9, True)])
+def test_layout_picks_the_orientation_that_fits_more(page, per_page, landscape):
+    layout = SheetLayout(page)
+    assert layout.per_page == per_page
+    assert (layout.page_size[0] > layout.page_size[1]) == landscape
+
+
+def test_slots_stay_on_the_page_without_overlapping():
+    layout = SheetLayout('a4', gutter_mm=3)
+    slots = [layout.slot(i) for i in range(layout.per_page)]
+    assert slots[0] == (layout.left, layout.top - CR80[1])
+    for x, y in slots:
+        assert layout.left <= x and x + CR80[0] <= layout.right + 1e-6
+        assert layout.bottom - 1e-6 <= y and y + CR80[1] <= layout.top
+    for i, (x1, y1) in enumerate(slots):
+        for x2, y2 in slots[i + 1:]:
+            assert abs(x1 - x2) >= CR80[0] or abs(y1 - y2) >= CR80[1]
+
+
+def test_crop_marks_sit_in_the_margins():
+    layout = SheetLayout('a4', gutter_mm=2)
+    marks = layout.crop_marks()
+    # Two cut lines per column and row with a gutter, each marked at both ends
+    assert len(marks) == 2 * (2 * layout.columns) + 2 * (2 * layout.rows)
+    for x1, y1, x2, y2 in marks:
+        outside = (max(y1, y2) <= layout.bottom or min(y1, y2) >= layout.top or
+                   max(x1, x2) <= layout.left or min(x1, x2) >= layout.right)
+        assert outside
+
+
+@pytest.mark.parametrize('options', [{'page': 'a3'}, {'margin_mm': 200}])
+def test_layout_rejects_impossible_pages(options):
+    with pytest.raises(ValueError):
+        SheetLayout(**options)
+
+
+def card_layers(text):
+    base = Image.new('RGB', (200, 126), (230, 240, 250))
+    ImageDraw.Draw(base).rectangle((0, 0, 199, 20), fill=(26, 58, 82))
+    card = base.copy()
+    ImageDraw.Draw(card).text((20, 50), text, fill=(0, 0, 0))
+    return base, card
+
+
+def test_split_layers_reassembles_the_card_exactly():
+    base, card = card_layers('Jane Doe')
+    box, overlay = split_layers(card, base)
+    rebuilt = base.convert('RGBA')
+    rebuilt.alpha_composite(overlay, box[:2])
+    assert ImageChops.difference(rebuilt.convert('RGB'), card).getbbox() is None
+    assert split_layers(base, base) == (None, None)
+
+
+def test_pages_are_written_as_they_fill_and_bases_embedded_once():
+    base, _ = card_layers('')
+    consumed = []
+
+    def cards():
+        for i in range(23):
+            consumed.append(i)
+            _, card = card_layers(f"Card {i}")
+            yield ('base', base) + split_layers(card, base)
+
+    writer = PrintSheetWriter(SheetLayout('a4'))
+    chunks = writer.stream(cards())
+    head = next(chunks) + next(chunks)
+    assert len(consumed) == 10  # the first page went out before the rest were rendered
+    data = check_pdf(head + b''.join(chunks))
+    assert (writer.pages, writer.cards) == (3, 23)
+    assert data.count(b'/Type /Page ') == 3
+    assert data.count(b'/Subtype /Image') == 1 + 23 * 2  # one shared base, an overlay and its mask per card
+    assert data.count(b'/B1 ') == 3
+
+
+def test_print_sheet_endpoint(app_module, client, template_id):
+    for i in range(3):
+        client.post('/generate', data=dict(CARD, id_number=f"SHEET-{i}", template_id=str(template_id)))
+    response = client.post('/api/cards/print-sheet', json={'id_numbers': ['SHEET-0', 'SHEET-1', 'SHEET-2'],
+                                                           'page': 'letter'})
+    assert response.status_code == 200 and response.mimetype == 'application/pdf'
+    assert response.is_streamed
+    data = check_pdf(response.get_data())
+    assert data.count(b'/Type /Page ') == 1
+    assert f"/MediaBox [0 0 {11 * 72:.3f} {8.5 * 72:.3f}]".encode() in data
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'id_numbers': ['NO-SUCH-CARD']}, 'No cards selected'),
+    ({'id_numbers': ['SHEET-0'], 'page': 'a3'}, 'page must be one of a4, letter'),
+    ({'id_numbers': ['SHEET-0'], 'gutter_mm': 50}, 'gutter_mm is out of range'),
+])
+def test_print_sheet_rejects(client, body, error):
+    response = client.post('/api/cards/print-sheet', json=body)
+    assert response.status_code == 400 and response.get_json()['error'] == error
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import event
+
+from conftest import CARD
+from utils.template_registry import TemplateRegistry, validate_config
+
+
+def test_validate_config_normalises():
+    config = validate_config({'width': '640', 'qr_size': 80, 'header_color': '#abc', 'logo': None})
+    assert config == {'width': 640, 'qr_size': 80, 'header_color': '#abc'}
+
+
+@pytest.mark.parametrize('config, error', [
+    ([], 'Template config must be an object'),
+    ({'width': 0}, 'width is out of range'),
+    ({'photo_x': 'left'}, 'photo_x must be an integer'),
+    ({'chroma_threshold': 300}, 'chroma_threshold is out of range'),
+    ({'header_color': 'blue'}, 'header_color must be a #rgb or #rrggbb colour'),
+    ({'background_mode': 'magic'}, 'background_mode must be one of ai, chroma, none'),
+])
+def test_validate_config_rejects(config, error):
+    with pytest.raises(ValueError, match=error):
+        validate_config(config)
+
+
+def save(client, **template):
+    response = client.post('/api/template', json=template)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['template_id']
+
+
+def test_other_workers_reload_after_a_save(app_module, client):
+    worker = TemplateRegistry(check_interval=0)
+    with app_module.app.app_context():
+        assert worker.get(1) is not None
+        reloads = worker.reloads
+        template_id = save(client, name='Registry Test', config={'header_color': '#111111'})
+        assert worker.get(template_id).get_config()['header_color'] == '#111111'
+        assert worker.reloads == reloads + 1
+
+        # Unchanged version: checked, not reloaded
+        worker.get(template_id)
+        assert worker.reloads == reloads + 1
+
+        lazy = TemplateRegistry(check_interval=3600)
+        lazy.get(template_id)
+        save(client, id=template_id, name='Registry Test', config={'header_color': '#222222'})
+        assert lazy.get(template_id).get_config()['header_color'] == '#111111'
+        lazy.invalidate()
+        assert lazy.get(template_id).get_config()['header_color'] == '#222222'
+
+
+def test_get_config_is_a_copy(app_module, template_id):
+    with app_module.app.app_context():
+        config = app_module.template_registry.get(template_id).get_config()
+        config['header_color'] = '#000000'
+        assert app_module.template_registry.get(template_id).get_config() != config
+
+
+def test_invalid_stored_template_is_skipped(app_module):
+    worker = TemplateRegistry(check_interval=0)
+    with app_module.app.app_context():
+        broken = app_module.CardTemplate(name='Broken Template', config='{"width": "wide"}')
+        app_module.db.session.add(broken)
+        worker.bump()
+        app_module.db.session.commit()
+        assert worker.get(broken.id) is None
+        assert worker.get(1) is not None
+
+
+def test_invalid_template_is_not_saved(client):
+    response = client.post('/api/template', json={'name': 'Rejected', 'config': {'qr_size': -1}})
+    assert response.status_code == 400 and response.get_json()['error'] == 'qr_size is out of range'
+
+
+def test_generation_makes_no_config_queries(app_module, client, template_id):
+    registry = app_module.template_registry
+    client.post('/generate', data=dict(CARD, id_number='REG-WARM', template_id=str(template_id)))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    interval, registry.check_interval = registry.check_interval, 3600
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.post('/generate', data=dict(CARD, id_number='REG-HOT', template_id=str(template_id)))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+        registry.check_interval = interval
+    assert response.status_code == 200
+    assert statements
+    assert not [s for s in statements if any(table in s for table in ('card_template', 'watermark', 'config_version'))]
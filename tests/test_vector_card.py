@@ -0,0 +1,97 @@
+import base64
+import os
+import re
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from conftest import CARD, ROOT
+from utils.card_generator import CardGenerator, PHOTO_SIZE, IMAGE_SCALE, SIGNATURE_SIZE
+from utils.pdf_export import PDFExporter
+from utils.qr_utils import QRCodeGenerator
+from utils.vector_card import VectorCard
+
+QR_DATA = '/verify/VEC-1'
+
+
+@pytest.fixture
+def card_data():
+    signature = Image.new('RGBA', (300, 100), (0, 0, 0, 0))
+    signature.paste((0, 0, 0, 255), (20, 40, 280, 60))
+    buffer = BytesIO()
+    signature.save(buffer, format='PNG')
+    return dict(CARD, id_number='VEC-1', theme='default',
+                signature='data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'))
+
+
+@pytest.fixture
+def photo_path(tmp_path):
+    path = str(tmp_path / 'photo.png')
+    photo = Image.radial_gradient('L').resize((PHOTO_SIZE * IMAGE_SCALE * 3 // 4, PHOTO_SIZE * IMAGE_SCALE))
+    Image.merge('RGB', (photo, photo.rotate(90), photo.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(path)
+    return path
+
+
+def page_content(vector_card):
+    """Uncompressed PDF of the card alone"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pageCompression=0)
+    vector_card.draw_on(c, 0, 0, 600, 380)
+    c.save()
+    return buffer.getvalue()
+
+
+def image_widths(pdf):
+    return [int(width) for width in re.findall(rb'/Width (\d+)', pdf)]
+
+
+def test_photo_and_signature_are_the_only_images(card_data, photo_path):
+    widths = image_widths(page_content(VectorCard({}, card_data, photo_path, QR_DATA)))
+    # The photo at the renderer's resolution, the signature, and their soft masks; no rasterised card
+    assert PHOTO_SIZE * IMAGE_SCALE * 3 // 4 in widths
+    assert 300 in widths
+    assert max(widths) <= PHOTO_SIZE * IMAGE_SCALE
+
+
+def test_qr_modules_and_security_lines_are_paths(card_data):
+    pdf = page_content(VectorCard({}, card_data, None, QR_DATA))
+    runs = sum(len(re.findall(r'1+', ''.join('1' if cell else '0' for cell in row)))
+               for row in QRCodeGenerator.matrix(QR_DATA))
+    assert len(re.findall(rb' re\b', pdf)) >= runs
+    assert len(re.findall(rb' l\b', pdf)) >= len(CardGenerator({}).security_lines())
+    assert max(image_widths(pdf)) <= SIGNATURE_SIZE[0] * IMAGE_SCALE
+
+
+def test_text_is_real_text_in_embedded_fonts(card_data):
+    pdf = page_content(VectorCard({}, card_data, None, QR_DATA))
+    assert b'/FontFile2' in pdf and b'DejaVuSans' in pdf and b'DejaVuSansMono' in pdf
+    assert pdf.count(b' Tj') >= 10
+
+
+def test_smaller_than_rasterising_at_print_resolution(card_data, photo_path, tmp_path):
+    background = os.path.join(ROOT, 'static', 'backgrounds', 'bg1.png')
+    exporter = PDFExporter(str(tmp_path))
+    vector = exporter.export_bytes(VectorCard({}, card_data, photo_path, QR_DATA, background_path=background),
+                                   card_data)
+    raster_card = CardGenerator({}, profile='print').generate(card_data, photo_path, None, background_path=background)
+    assert len(vector) * 2 < len(exporter.export_bytes(raster_card, card_data))
+
+
+def test_artifact_endpoint_serves_the_configured_backend(app_module, client, template_id):
+    card_id = client.post('/generate', data=dict(CARD, id_number='VEC-API', template_id=str(template_id))) \
+        .get_json()['card_id']
+    backend = app_module.app.config['PDF_BACKEND']
+    try:
+        app_module.app.config['PDF_BACKEND'] = 'vector'
+        vector = client.get(f"/card/{card_id}/pdf")
+        app_module.app.config['PDF_BACKEND'] = 'raster'
+        raster = client.get(f"/card/{card_id}/pdf")
+    finally:
+        app_module.app.config['PDF_BACKEND'] = backend
+    assert vector.status_code == raster.status_code == 200
+    assert vector.data.startswith(b'%PDF') and raster.data.startswith(b'%PDF')
+    assert b'/FontFile2' in vector.data and b'/FontFile2' not in raster.data
+    assert vector.headers['ETag'].strip('"').endswith('-vector')
+    assert vector.headers['ETag'] != raster.headers['ETag']
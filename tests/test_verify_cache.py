@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+from conftest import CARD
+from utils.verify_cache import VerificationCache, VerifiedCard
+
+
+def issue(client, template_id, id_number, **fields):
+    response = client.post('/generate', data=dict(CARD, id_number=id_number, template_id=str(template_id), **fields))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['card_id']
+
+
+def other_worker(app_module, id_number, cache):
+    """Status as seen through a second process's cache"""
+    with app_module.app.app_context():
+        return cache.get(id_number, lambda: app_module.IDCard.query.filter_by(id_number=id_number).first()).status
+
+
+def test_revoke_is_seen_by_this_and_other_workers(app_module, client, template_id):
+    card_id = issue(client, template_id, 'VER-1')
+    worker = VerificationCache(check_interval=0)
+    assert client.get('/api/verify/VER-1').get_json()['status'] == 'VALID'
+    assert other_worker(app_module, 'VER-1', worker) == 'VALID'
+
+    assert client.post(f"/api/card/{card_id}/revoke").status_code == 200
+    assert client.get('/api/verify/VER-1').get_json()['status'] == 'REVOKED'
+    assert other_worker(app_module, 'VER-1', worker) == 'REVOKED'
+
+    assert client.post(f"/api/card/{card_id}/enable").status_code == 200
+    assert other_worker(app_module, 'VER-1', worker) == 'VALID'
+
+
+def test_batch_revoke_invalidates_every_worker(app_module, client, template_id):
+    issue(client, template_id, 'VER-B1')
+    issue(client, template_id, 'VER-B2')
+    worker = VerificationCache(check_interval=0)
+    for id_number in ('VER-B1', 'VER-B2'):
+        assert client.get(f"/api/verify/{id_number}").get_json()['status'] == 'VALID'
+        assert other_worker(app_module, id_number, worker) == 'VALID'
+
+    response = client.post('/api/cards/revoke', json={'id_numbers': ['VER-B1', 'VER-B2']})
+    assert response.get_json()['updated'] == 2
+    for id_number in ('VER-B1', 'VER-B2'):
+        assert client.get(f"/api/verify/{id_number}").get_json()['status'] == 'REVOKED'
+        assert other_worker(app_module, id_number, worker) == 'REVOKED'
+
+    # Nothing changed, so nothing is bumped and cached entries survive
+    clears = worker.stats()['version_clears']
+    assert client.post('/api/cards/revoke', json={'id_numbers': ['VER-B1']}).get_json()['updated'] == 0
+    other_worker(app_module, 'VER-B1', worker)
+    assert worker.stats()['version_clears'] == clears
+
+
+def test_cached_entries_are_served_between_checks(app_module, client, template_id):
+    card_id = issue(client, template_id, 'VER-2')
+    worker = VerificationCache(check_interval=3600)
+    assert other_worker(app_module, 'VER-2', worker) == 'VALID'
+    client.post(f"/api/card/{card_id}/revoke")
+    assert other_worker(app_module, 'VER-2', worker) == 'VALID'
+    assert worker.stats()['hits'] == 1
+
+
+def test_expiry_is_evaluated_on_read():
+    fields = dict.fromkeys(VerifiedCard.FIELDS)
+    fields['expiry_date'] = date.today() - timedelta(days=1)
+    assert VerifiedCard('VALID', **fields).status == 'EXPIRED'
+    fields['expiry_date'] = date.today()
+    assert VerifiedCard('VALID', **fields).status == 'VALID'
@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class ArtifactCache:
+    """Bounded on-disk cache of rendered card artifacts (PNG, PDF, QR).
+
+    Files are named '<key>_<version>.<ext>' with no '_' in the version;
+    storing a version with replace=True drops the other versions of its key,
+    and the least recently served files are evicted once the directory grows
+    past max_bytes.
+    """
+
+    def __init__(self, cache_dir='cache/artifacts', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index = None
+        self._size = 0
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def _key(name):
+        return name.rpartition('_')[0]
+
+    def _load_index(self):
+        # Called with the lock held; scans the directory once per process
+        if self._index is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                st = os.stat(self._path(name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._size = sum(self._index.values())
+
+    def _add(self, name, size):
+        if name in self._index:
+            self._size -= self._index.pop(name)
+        self._index[name] = size
+        self._size += size
+        while self._size > self.max_bytes and len(self._index) > 1:
+            evicted, evicted_size = self._index.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+            try:
+                os.remove(self._path(evicted))
+            except OSError:
+                pass
+
+    def get(self, name):
+        """Path of a cached artifact, or None"""
+        with self._lock:
+            self._load_index()
+            path = self._path(name)
+            if name in self._index and os.path.exists(path):
+                self._index.move_to_end(name)
+                self.hits += 1
+                return path
+            if name not in self._index and os.path.exists(path):
+                # Written by another worker process
+                self._add(name, os.path.getsize(path))
+                self.hits += 1
+                return path
+            self._index.pop(name, None)
+            return None
+
+    def put(self, name, data, replace=False):
+        """Store data under name, removing the other versions of its key if replace is set"""
+        path = self._path(name)
+        with self._lock:
+            self._load_index()
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            if replace:
+                key = self._key(name)
+                for stale in [n for n in self._index if n != name and self._key(n) == key]:
+                    self._size -= self._index.pop(stale)
+                    try:
+                        os.remove(self._path(stale))
+                    except OSError:
+                        pass
+            self._add(name, len(data))
+        return path
+
+    def get_or_create(self, name, builder, replace=False):
+        """Return the artifact path, calling builder() for its bytes on a miss.
+
+        Concurrent requests for the same missing artifact render it once.
+        """
+        path = self.get(name)
+        if path:
+            return path
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            path = self.get(name)
+            if not path:
+                with self._lock:
+                    self.misses += 1
+                path = self.put(name, builder(), replace)
+        with self._lock:
+            self._build_locks.pop(name, None)
+        return path
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(self._index) if self._index is not None else None,
+                'bytes': self._size if self._index is not None else None
+            }
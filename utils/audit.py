@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from models import db, AuditLog
+
+
+class AuditSink:
+    """Buffers audit log entries and writes them in batches from a background thread.
+
+    A batch is written once batch_size entries are queued or flush_interval
+    seconds have passed, as one multi-row INSERT and one commit. Entries are
+    timestamped when recorded, not when written. attach() adds an entry to
+    the caller's session instead, so it commits with the change it describes.
+    """
+
+    def __init__(self, app, batch_size=500, flush_interval=1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._flush_seconds = 0.0
+
+    @staticmethod
+    def entry(action, card_id=None, details='', admin_user='anonymous'):
+        return {
+            'admin_user': admin_user,
+            'action': action,
+            'card_id': card_id,
+            'details': details,
+            'timestamp': datetime.utcnow()
+        }
+
+    def record(self, action, card_id=None, details='', admin_user='anonymous'):
+        self.record_many([self.entry(action, card_id, details, admin_user)])
+
+    def record_many(self, entries):
+        with self._cond:
+            self._queue.extend(entries)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        self.start()
+
+    def attach(self, action, card_id=None, details='', admin_user='anonymous', session=None):
+        """Add the entry to session (db.session by default) without committing"""
+        log = AuditLog(**self.entry(action, card_id, details, admin_user))
+        (session or db.session).add(log)
+        return log
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name='audit-sink', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the writer thread and write whatever is still queued"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._queue) < self.batch_size and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit log flush error: {e}")
+
+    def _take(self):
+        with self._cond:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write every queued entry now, one batch at a time"""
+        with self._flush_lock, self.app.app_context():
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                start = time.perf_counter()
+                try:
+                    db.session.execute(db.insert(AuditLog), batch)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    with self._cond:
+                        self._queue.extendleft(reversed(batch))
+                        self.failures += 1
+                    raise
+                elapsed = time.perf_counter() - start
+                with self._cond:
+                    self.written += len(batch)
+                    self.batches += 1
+                    self._flush_seconds += elapsed
+                    self.last_flush_ms = round(elapsed * 1000, 3)
+                    self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'written': self.written,
+                'batches': self.batches,
+                'failures': self.failures,
+                'last_flush_ms': self.last_flush_ms,
+                'avg_flush_ms': round(self._flush_seconds * 1000 / self.batches, 3) if self.batches else None,
+                'max_flush_ms': self.max_flush_ms
+            }
@@ -0,0 +1,337 @@
+import inspect
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from PIL import Image, ImageChops, ImageOps
+from .photo_cache import PhotoCache
+from .metrics import metrics
+from .photo_ingest import model_input_edge
+
+DEFAULT_MODEL = os.environ.get('REMBG_MODEL', 'u2net_is')  # Faster lightweight model
+
+# Photo background handling: 'ai' runs rembg, 'chroma' keys out near-white
+# pixels without a model, 'none' keeps the photo untouched.
+BACKGROUND_MODES = ('ai', 'chroma', 'none')
+
+# Input normalisation (mean, std) of the single-mask models that can run several photos in one
+# inference, keyed by the name of the session rembg actually built (rembg serves unknown names such
+# as the default 'u2net_is' with its u2net session); other models (cloth segmentation, SAM, ...)
+# always run one photo at a time
+IMAGENET_NORM = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225))
+BATCH_NORMALIZATION = {
+    'u2net': IMAGENET_NORM,
+    'u2netp': IMAGENET_NORM,
+    'u2net_human_seg': IMAGENET_NORM,
+    'silueta': IMAGENET_NORM,
+    'isnet-general-use': ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0)),
+    'isnet-anime': ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0)),
+}
+
+
+def chroma_key(photo, threshold=240, feather=0):
+    """Make near-white pixels transparent using whole-image channel ops.
+
+    A pixel is keyed out when its darkest channel is above threshold; with a
+    feather, alpha ramps linearly over the feather values below threshold.
+    """
+    threshold = max(0, min(255, int(threshold)))
+    feather = max(0, int(feather))
+    lut = []
+    for v in range(256):
+        if v > threshold:
+            lut.append(0)
+        elif feather and v > threshold - feather:
+            lut.append(255 * (threshold - v) // feather)
+        else:
+            lut.append(255)
+
+    if photo.mode != 'RGBA':
+        photo = photo.convert('RGBA')
+    r, g, b, a = photo.split()
+    darkest = ImageChops.darker(ImageChops.darker(r, g), b)
+    photo.putalpha(ImageChops.multiply(a, darkest.point(lut)))
+    return photo
+
+
+class BackgroundRemover:
+    """Process-wide rembg sessions, loaded once and shared by every CardGenerator.
+
+    At most `sessions` inferences run at once in a process, each on its own
+    session with `threads` onnxruntime threads (0 leaves onnxruntime's
+    default of one per core), so concurrent requests queue for a session
+    instead of oversubscribing the CPU. remove_many() cuts out up to
+    batch_size photos per model run. When a PhotoCache is attached, photos
+    that were already cut out are served from it without touching the model.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache=None, threads=0, sessions=1, batch_size=8):
+        self.model_name = model_name
+        self.cache = cache
+        self.threads = threads
+        self.sessions = max(1, sessions)
+        self.batch_size = max(1, batch_size)
+        self._session = None
+        self._sessions = []
+        self._free = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batching = None  # False once the model is known not to accept a batch
+        self.batch_unavailable = None  # why, when it doesn't
+        self.missing_internals = {}
+        self.load_time = None
+        self.load_error = None
+        self.warmed_up = False
+        self.inference_count = 0
+        self.inference_total = 0.0
+        self.last_inference = None
+        self.batch_count = 0
+        self.unbatched_count = 0
+
+    def configure(self, threads=None, sessions=None, batch_size=None):
+        """Change the limits; threads only applies to sessions created afterwards"""
+        if threads is not None:
+            self.threads = threads
+        if sessions is not None:
+            self.sessions = max(1, sessions)
+        if batch_size is not None:
+            self.batch_size = max(1, batch_size)
+
+    @property
+    def loaded(self):
+        return self._session is not None
+
+    def load(self, warm_up=False):
+        if self._session is None:
+            with self._load_lock:
+                if self._session is None:
+                    if self.load_error:
+                        raise RuntimeError(self.load_error)
+                    try:
+                        start = time.perf_counter()
+                        self._session = self._new_session()
+                        self.load_time = time.perf_counter() - start
+                        self._free.put(self._session)
+                    except Exception as e:
+                        self.load_error = f"Background removal unavailable: {e}"
+                        raise RuntimeError(self.load_error)
+        if warm_up and not self.warmed_up:
+            self.warm_up()
+        return self._session
+
+    def _rembg_internal(self, what, lookup):
+        """lookup(), which reaches past rembg's public API, or None when the installed rembg lacks it.
+
+        Each missing internal is printed once and listed in stats() under missing_internals.
+        """
+        try:
+            return lookup()
+        except (ImportError, AttributeError) as e:
+            if what not in self.missing_internals:
+                self.missing_internals[what] = str(e)
+                print(f"rembg {what} unavailable ({e}); falling back to its public API")
+            return None
+
+    def _session_class(self):
+        # Older rembg always builds its own options; pick the session class the way its factory does
+        from rembg.sessions import sessions_class
+        from rembg.sessions.u2net import U2netSession
+        return next((sc for sc in sessions_class if sc.name() == self.model_name), U2netSession)
+
+    def _new_session(self):
+        from rembg import new_session
+        session = None
+        if self.threads:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            if 'sess_opts' in inspect.signature(new_session).parameters:
+                session = new_session(self.model_name, sess_opts=options)
+            else:
+                session_class = self._rembg_internal('session classes', self._session_class)
+                if session_class is not None:
+                    session = session_class(self.model_name, options)
+        if session is None:
+            session = new_session(self.model_name)
+        self._sessions.append(session)
+        return session
+
+    @contextmanager
+    def _checkout(self):
+        """Borrow a session, creating one while fewer than `sessions` exist, otherwise waiting for one"""
+        self.load()
+        try:
+            session = self._free.get_nowait()
+        except queue.Empty:
+            session = None
+            with self._load_lock:
+                if len(self._sessions) < self.sessions:
+                    session = self._new_session()
+            if session is None:
+                session = self._free.get()
+        try:
+            yield session
+        finally:
+            self._free.put(session)
+
+    def warm_up(self):
+        """Run one inference on a dummy image so the first real card doesn't pay for it"""
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (255, 255, 255)).save(buffer, format='PNG')
+        self._infer(buffer.getvalue())
+        self.warmed_up = True
+
+    def remove(self, image_bytes):
+        """Return PNG bytes of the image with its background removed"""
+        if self.cache is None:
+            return self._infer(image_bytes)
+        key = self.cache.key(image_bytes, self.model_name)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._infer(image_bytes)
+            self.cache.put(key, result)
+        return result
+
+    def remove_many(self, images):
+        """PNG bytes for each of several images, running the cache misses through the model in batches"""
+        results = [None] * len(images)
+        keys = [None] * len(images)
+        if self.cache is not None:
+            for i, image_bytes in enumerate(images):
+                keys[i] = self.cache.key(image_bytes, self.model_name)
+                results[i] = self.cache.get(keys[i])
+        misses = [i for i, result in enumerate(results) if result is None]
+        for start in range(0, len(misses), self.batch_size):
+            chunk = misses[start:start + self.batch_size]
+            for i, result in zip(chunk, self._infer_batch([images[i] for i in chunk])):
+                results[i] = result
+                if self.cache is not None:
+                    self.cache.put(keys[i], result)
+        return results
+
+    def _infer(self, image_bytes):
+        from rembg import remove
+        with self._checkout() as session:
+            start = time.perf_counter()
+            result = remove(image_bytes, session=session)
+            elapsed = time.perf_counter() - start
+        self._record(elapsed, 1)
+        return result
+
+    def _infer_batch(self, images):
+        """Cut out several images in a single model run; one run each when the model can't batch"""
+        if len(images) > 1 and self._batching is not False:
+            with self._checkout() as session:
+                model = self._batch_model(session)
+                results = None
+                if model is None:
+                    print(f"{self.model_name} cannot run photos in batches ({self.batch_unavailable}); "
+                          f"running them one at a time")
+                    self._batching = False
+                else:
+                    start = time.perf_counter()
+                    try:
+                        results = self._run_batch(model, images)
+                    except Exception as e:
+                        # Only this batch falls back; the next one tries the model again
+                        print(f"Batched background removal failed, running {len(images)} photos one at a time: {e}")
+                    elapsed = time.perf_counter() - start
+            if results is not None:
+                self._batching = True
+                self._record(elapsed, len(images))
+                return results
+            with self._stats_lock:
+                self.unbatched_count += len(images)
+        return [self._infer(image_bytes) for image_bytes in images]
+
+    def _batch_model(self, session):
+        """(onnxruntime session, input, (mean, std), (width, height)) when session's model takes a batch,
+        else None with the reason in batch_unavailable"""
+        normalization = BATCH_NORMALIZATION.get(session.name())
+        if normalization is None:
+            self.batch_unavailable = f"no batch preprocessing for the {session.name()} session"
+            return None
+        inner = self._rembg_internal('inner_session', lambda: session.inner_session)
+        if inner is None:
+            self.batch_unavailable = 'no access to the onnxruntime session'
+            return None
+        model_input = inner.get_inputs()[0]
+        if len(model_input.shape) != 4 or model_input.shape[0] == 1:
+            self.batch_unavailable = f"model input shape {model_input.shape} has no batch axis"
+            return None
+        size = tuple(model_input.shape[2:4])
+        if not all(isinstance(d, int) for d in size):
+            size = (model_input_edge(session.name()),) * 2
+        return inner, model_input, normalization, size
+
+    def _run_batch(self, model, images):
+        import numpy as np
+        inner, model_input, (mean, std), size = model
+
+        # The same preprocessing rembg applies to a single photo, stacked along the batch axis
+        photos = [ImageOps.exif_transpose(Image.open(BytesIO(image_bytes))).convert('RGB') for image_bytes in images]
+        tensors = []
+        for photo in photos:
+            pixels = np.asarray(photo.resize(size, Image.Resampling.LANCZOS), dtype=np.float64)
+            pixels = (pixels / max(pixels.max(), 1) - mean) / std
+            tensors.append(pixels.transpose((2, 0, 1)))
+        predictions = inner.run(None, {model_input.name: np.stack(tensors).astype(np.float32)})[0]
+        if predictions.shape[0] != len(photos):
+            raise ValueError(f"model returned {predictions.shape[0]} masks for {len(photos)} photos")
+        predictions = predictions[:, 0, :, :]
+
+        results = []
+        for photo, prediction in zip(photos, predictions):
+            low, high = prediction.min(), prediction.max()
+            prediction = (prediction - low) / max(high - low, 1e-6)
+            mask = Image.fromarray((prediction * 255).astype('uint8'), mode='L').resize(photo.size, Image.Resampling.LANCZOS)
+            cutout = Image.composite(photo.convert('RGBA'), Image.new('RGBA', photo.size, 0), mask)
+            buffer = BytesIO()
+            cutout.save(buffer, format='PNG')
+            results.append(buffer.getvalue())
+        return results
+
+    def _record(self, elapsed, count):
+        metrics.record_stage('rembg', elapsed)
+        with self._stats_lock:
+            self.inference_count += count
+            self.inference_total += elapsed
+            self.last_inference = elapsed / count
+            if count > 1:
+                self.batch_count += 1
+
+    def stats(self):
+        with self._stats_lock:
+            count = self.inference_count
+            total = self.inference_total
+            last = self.last_inference
+        return {
+            'model': self.model_name,
+            'loaded': self.loaded,
+            'load_error': self.load_error,
+            'load_time_ms': round(self.load_time * 1000, 2) if self.load_time is not None else None,
+            'warmed_up': self.warmed_up,
+            'sessions': len(self._sessions),
+            'max_sessions': self.sessions,
+            'threads': self.threads or None,
+            'batch_size': self.batch_size,
+            'batching': self._batching,
+            'batch_unavailable': self.batch_unavailable,
+            'batches': self.batch_count,
+            'unbatched_photos': self.unbatched_count,
+            'missing_internals': dict(self.missing_internals),
+            'inference_count': count,
+            'avg_inference_ms': round(total / count * 1000, 2) if count else None,
+            'last_inference_ms': round(last * 1000, 2) if last is not None else None,
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
+
+
+background_remover = BackgroundRemover(cache=PhotoCache(
+    os.environ.get('PHOTO_CACHE_DIR', 'cache/photos'),
+    memory_limit=int(os.environ.get('PHOTO_CACHE_MEMORY_MB', 64)) * 1024 * 1024,
+    disk_limit=int(os.environ.get('PHOTO_CACHE_DISK_MB', 512)) * 1024 * 1024
+))
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import threading
+
+
+class BlobStore:
+    """Content-addressed files under root, named by the sha256 of their bytes.
+
+    Identical content is stored once; blobs are never modified in place, so
+    readers need no locking.
+    """
+
+    def __init__(self, root='instance/blobs'):
+        self.root = root
+
+    @staticmethod
+    def digest(data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data):
+        """Store data (str or bytes) and return its digest"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = self.digest(data)
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest):
+        """Blob bytes, or None if it is missing"""
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_text(self, digest):
+        data = self.get(digest)
+        return data.decode('utf-8') if data is not None else None
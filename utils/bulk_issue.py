@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from werkzeug.utils import secure_filename
+
+from .background_removal import background_remover
+from .card_generator import CardGenerator
+from .qr_utils import QRCodeGenerator
+from .pdf_export import PDFExporter
+from .vector_card import VectorCard
+from .watermark import apply_watermark
+from .photo_ingest import ingest_photo
+
+REQUIRED_FIELDS = ['id_number', 'full_name', 'date_of_birth', 'organization', 'address', 'issue_date', 'expiry_date']
+DATE_FIELDS = ['date_of_birth', 'issue_date', 'expiry_date']
+
+
+def parse_batch(stream, filename):
+    """Parse a CSV or JSON batch upload into a list of row dicts"""
+    raw = stream.read()
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8-sig')
+
+    if filename.lower().endswith('.json'):
+        rows = json.loads(raw)
+        if isinstance(rows, dict):
+            rows = rows.get('cards', [])
+        if not isinstance(rows, list):
+            raise ValueError('JSON batch must be a list of card objects')
+        return [{k: ('' if v is None else str(v)) for k, v in row.items()} for row in rows]
+
+    reader = csv.DictReader(io.StringIO(raw))
+    return [{(k or '').strip(): (v or '').strip() for k, v in row.items()} for row in reader]
+
+
+def extract_photos(zip_stream, upload_folder, max_edge=None):
+    """Extract images from a zip archive, returning {entry basename: saved filename}.
+    With max_edge, each photo is normalised on the way out (see photo_ingest); unreadable ones are skipped."""
+    photos = {}
+    allowed = ('.png', '.jpg', '.jpeg', '.gif')
+    with zipfile.ZipFile(zip_stream) as archive:
+        for entry in archive.infolist():
+            if entry.is_dir():
+                continue
+            name = os.path.basename(entry.filename)
+            if not name or not name.lower().endswith(allowed):
+                continue
+            filename = f"{datetime.now().timestamp()}_photo_{secure_filename(name)}"
+            with archive.open(entry) as src:
+                if max_edge:
+                    try:
+                        filename = ingest_photo(src.read(), upload_folder, filename, max_edge)
+                    except ValueError as e:
+                        print(f"Skipping {name}: {e}")
+                        continue
+                else:
+                    with open(os.path.join(upload_folder, filename), 'wb') as dst:
+                        dst.write(src.read())
+            photos[name] = filename
+    return photos
+
+
+def validate_row(row):
+    """Return an error message for an unusable row, or None"""
+    missing = [f for f in REQUIRED_FIELDS if not row.get(f)]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    for field in DATE_FIELDS:
+        try:
+            datetime.strptime(row[field], '%Y-%m-%d')
+        except ValueError:
+            return f"Invalid date for {field}: {row[field]}"
+    return None
+
+
+def render_card(job, cutout=None):
+    """Render QR, card PNG and PDF for one row. Runs inside a worker process."""
+    data = job['data']
+    id_number = data['id_number']
+
+    persist = job.get('persist', {'png', 'pdf', 'qr'})
+
+    qr_gen = QRCodeGenerator(job['qr_dir'])
+    qr_url = f"/verify/{id_number}"
+    qr_filename = f"qr_{id_number}.png"
+    qr_image = qr_gen.make_image(qr_url)
+    if 'qr' in persist:
+        qr_gen.save(qr_image, qr_url, qr_filename)
+
+    watermark = job.get('watermark')
+    watermark_func = None
+    if watermark:
+        def watermark_func(card):
+            return apply_watermark(card, watermark['text'], watermark['color'], watermark['opacity'], watermark['position'],
+                                   watermark.get('pattern', 'single'))
+
+    card_gen = CardGenerator(job['config'])
+    card_image = card_gen.generate(data, job.get('photo_path'), qr_image, watermark_func,
+                                   job.get('logo_path'), job.get('background_path'), job.get('layer_key'), cutout)
+
+    card_filename = None
+    if 'png' in persist:
+        card_filename = f"card_{id_number}.png"
+        card_image.save(os.path.join(job['card_dir'], card_filename))
+
+    pdf_filename = None
+    if 'pdf' in persist:
+        pdf_filename = f"card_{id_number}.pdf"
+        pdf_source = card_image
+        if job.get('pdf_backend') == 'vector':
+            pdf_source = VectorCard(job['config'], data, job.get('photo_path'), qr_url, watermark, job.get('logo_path'),
+                                    job.get('background_path'), cutout)
+        PDFExporter(job['pdf_dir']).export(pdf_source, data, pdf_filename)
+
+    result = {
+        'card_png': card_filename,
+        'card_pdf': pdf_filename,
+        'qr_code': qr_filename
+    }
+    if job.get('return_png'):
+        # Handed back so the parent can seed its artifact cache
+        buffer = io.BytesIO()
+        card_image.save(buffer, format='PNG')
+        result['png_bytes'] = buffer.getvalue()
+    return result
+
+
+def render_cards(jobs):
+    """Render several rows in one worker, cutting out their AI-mode photos in one batched model run.
+    Returns (result, error) per job."""
+    cutouts = [None] * len(jobs)
+    ai_jobs = [i for i, job in enumerate(jobs)
+               if job.get('photo_path') and CardGenerator(job['config']).photo_mode(job['data'].get('background_mode')) == 'ai']
+    if ai_jobs:
+        removed = CardGenerator(jobs[ai_jobs[0]]['config']).remove_backgrounds([jobs[i]['photo_path'] for i in ai_jobs])
+        for i, cutout in zip(ai_jobs, removed):
+            cutouts[i] = cutout
+
+    results = []
+    for job, cutout in zip(jobs, cutouts):
+        try:
+            results.append((render_card(job, cutout), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def init_worker(rembg_threads, batch_size):
+    # One model session per worker process, sized so the pool together uses each core once
+    background_remover.configure(threads=rembg_threads, sessions=1, batch_size=batch_size)
+
+
+class BulkIssuer:
+    """Fan card rendering out across a process pool, batch_size rows per task.
+
+    rembg_threads is the onnxruntime thread count for each worker; 0 divides
+    the cores evenly between the workers.
+    """
+
+    def __init__(self, max_workers=None, batch_size=1, rembg_threads=0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.rembg_threads = rembg_threads
+
+    def run(self, jobs):
+        """Yield (index, result, error) for every job as its batch completes"""
+        if not jobs:
+            return
+        workers = min(self.max_workers, len(jobs))
+        # Smaller batches when there are too few rows to keep every worker busy
+        size = max(1, min(self.batch_size, -(-len(jobs) // workers)))
+        threads = self.rembg_threads or max(1, (os.cpu_count() or 1) // workers)
+        # Spawned, not forked: the web process has live threads (audit sink, job queue, file expiry)
+        # whose locks a forked child could inherit mid-hold; workers build their state in init_worker
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(threads, self.batch_size)) as executor:
+            futures = {executor.submit(render_cards, jobs[start:start + size]): start
+                       for start in range(0, len(jobs), size)}
+            for future in as_completed(futures):
+                start = futures[future]
+                try:
+                    outcomes = future.result()
+                except Exception as e:
+                    outcomes = [(None, str(e))] * len(jobs[start:start + size])
+                for offset, (result, error) in enumerate(outcomes):
+                    yield start + offset, result, error
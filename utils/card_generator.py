@@ -1,18 +1,72 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import os
 import base64
 from io import BytesIO
 from .mrz_utils import MRZGenerator
+from .background_removal import background_remover as shared_background_remover, chroma_key, BACKGROUND_MODES
+from .template_cache import template_layer_cache
+from .resources import resources
+from .metrics import metrics
+from .photo_ingest import open_normalized, inference_bytes, default_max_edge
+
+# Layout shared with the vector PDF renderer, in card pixels
+PHOTO_SECTION_WIDTH = 160
+PHOTO_SIZE = 120
+INFO_X, INFO_X_RIGHT = 180, 400
+SIGNATURE_SIZE = (120, 40)
+QR_SIZE = 60
+LABEL_COLOR = (26, 58, 82) # Keeping labels professional but could be customized too
+SECURITY_LINE_COLOR = (200, 180, 100)
+# Photo and signature pixels per card pixel in vector PDFs; the rest of the card has no resolution
+IMAGE_SCALE = 3
+# Largest photo any output draws (the vector PDF's; the print profile's is smaller for default-width templates)
+PHOTO_RENDER_EDGE = PHOTO_SIZE * IMAGE_SCALE
+MRZ_BAND_COLOR = (26, 58, 82)
+ACCENT_COLOR = (218, 165, 32) # Gold default
+
+# Output widths a card can be rendered at; None keeps the template's own size
+PRINT_DPI = 300
+RENDER_PROFILES = {
+    'thumbnail': 320,
+    'screen': None,
+    'print': round(85.6 / 25.4 * PRINT_DPI),  # CR80 width at 300 DPI
+}
+
+def profile_scale(profile, width):
+    """Factor from template pixels to the profile's output width"""
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"profile must be one of {', '.join(RENDER_PROFILES)}")
+    target = RENDER_PROFILES[profile]
+    return target / width if target else 1
 
 class CardGenerator:
-    def __init__(self, config):
+    def __init__(self, config, background_remover=None, layer_cache=None, profile='screen'):
         self.config = config
+        self.background_remover = background_remover or shared_background_remover
+        self.layer_cache = layer_cache or template_layer_cache
         self.width = config.get('width', 600)  # Pocket size width
         self.height = config.get('height', 380) # Pocket size height
         self.background_color = config.get('background_color', '#ffffff')
         self.header_height = config.get('header_height', 60)
         self.header_color = config.get('header_color', '#1a3a52')
         self.photo_bg_color = config.get('photo_bg_color', '#003d7a')
+        self.photo_max_edge = config.get('photo_max_edge') or default_max_edge(self.background_remover.model_name,
+                                                                                PHOTO_RENDER_EDGE)
+        # Layout is in template pixels throughout; drawing scales it to the profile's output size
+        self.profile = profile
+        self.scale = profile_scale(profile, self.width)
+        self.size = (self.px(self.width), self.px(self.height))
+
+    def px(self, value):
+        """Template pixels to output pixels (untouched at scale 1)"""
+        return value if self.scale == 1 else round(value * self.scale)
+
+    def pxs(self, values):
+        return tuple(self.px(v) for v in values)
+
+    def size_px(self, size):
+        """A font size or line width in output pixels, never below one"""
+        return max(1, self.px(size))
         
     def hex_to_rgb(self, hex_color):
         hex_color = hex_color.lstrip('#')
@@ -21,230 +75,302 @@ class CardGenerator:
     def create_blank_card(self, background_path=None):
         if background_path and os.path.exists(background_path):
             try:
-                bg = Image.open(background_path)
-                return bg.resize((self.width, self.height), Image.Resampling.LANCZOS).convert('RGB')
+                return resources.background(background_path, self.size).copy()
             except Exception as e:
                 print(f"Error loading background image: {e}")
         
         bg_rgb = self.hex_to_rgb(self.background_color)
-        return Image.new('RGB', (self.width, self.height), bg_rgb)
+        return Image.new('RGB', self.size, bg_rgb)
     
     def add_header(self, card, org_name='', logo_path=None):
+        text_x_offset = self.draw_header_bar(card, logo_path)
+        return self.add_header_text(card, org_name, text_x_offset)
+    
+    def draw_header_bar(self, card, logo_path=None):
+        """Draw the header bar, accent line and logo; returns the x offset for header text"""
         draw = ImageDraw.Draw(card)
         header_rgb = self.hex_to_rgb(self.header_color)
         
         # Override header color based on theme if set in config/data
         # This is a bit of a hack since we don't have a clean theme-to-color mapping in CardGenerator yet
         # But for MVP it works
-        draw.rectangle((0, 0, self.width, self.header_height), fill=header_rgb)
+        draw.rectangle(self.pxs((0, 0, self.width, self.header_height)), fill=header_rgb)
         
         # Accent line color
-        accent_color = (218, 165, 32) # Gold default
-        draw.rectangle((0, self.header_height - 2, self.width, self.header_height), fill=accent_color)
+        draw.rectangle(self.pxs((0, self.header_height - 2, self.width, self.header_height)), fill=ACCENT_COLOR)
         
         text_x_offset = 15
         if logo_path and os.path.exists(logo_path):
             try:
                 logo = Image.open(logo_path)
                 logo_size = self.header_height - 15
-                logo.thumbnail((logo_size, logo_size), Image.Resampling.LANCZOS)
+                logo.thumbnail((self.px(logo_size), self.px(logo_size)), Image.Resampling.LANCZOS)
                 if logo.mode != 'RGBA': logo = logo.convert('RGBA')
                 logo_bg = Image.new('RGBA', logo.size, (255, 255, 255, 255))
                 logo_bg.paste(logo, (0, 0), logo)
                 logo = logo_bg.convert('RGB')
-                card.paste(logo, (15, 7))
+                card.paste(logo, self.pxs((15, 7)))
                 text_x_offset = 15 + logo_size + 10
             except Exception as e:
                 print(f'Error adding logo: {e}')
-
-        try:
-            header_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-            small_header_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 10)
-        except:
-            header_font = small_header_font = ImageFont.load_default()
+        return text_x_offset
+    
+    def add_header_text(self, card, org_name, text_x_offset=15):
+        draw = ImageDraw.Draw(card)
+        header_font = resources.font('DejaVuSans', self.size_px(20), 'Bold')
+        small_header_font = resources.font('DejaVuSans', self.size_px(10))
         
-        draw.text((text_x_offset, 10), org_name.upper() or "ID CARD", fill=(255, 255, 255), font=header_font)
-        draw.text((text_x_offset, 35), "OFFICIAL IDENTIFICATION DOCUMENT", fill=(200, 200, 200), font=small_header_font)
+        draw.text(self.pxs((text_x_offset, 10)), org_name.upper() or "ID CARD", fill=(255, 255, 255), font=header_font)
+        draw.text(self.pxs((text_x_offset, 35)), "OFFICIAL IDENTIFICATION DOCUMENT", fill=(200, 200, 200), font=small_header_font)
         return card
     
-    def add_photo_section(self, card, photo_path):
-        photo_section_width = 160
-        photo_section_height = self.height - self.header_height - 60
+    def photo_mode(self, background_mode=None):
+        mode = background_mode or self.config.get('background_mode', 'ai')
+        return mode if mode in BACKGROUND_MODES else 'ai'
+
+    def remove_backgrounds(self, photo_paths):
+        """Background-removed PNG bytes for several photos from batched model runs, aligned with photo_paths.
+        Entries are None for missing photos, or all of them if removal fails; add_photo_section then works as usual."""
+        paths = [p if p and os.path.exists(p) else None for p in photo_paths]
+        try:
+            results = iter(self.background_remover.remove_many(
+                [inference_bytes(p, self.photo_max_edge) for p in paths if p]))
+        except Exception as e:
+            print(f'Error removing backgrounds: {e}')
+            return [None] * len(paths)
+        return [next(results) if p else None for p in paths]
+
+    def prepare_photo(self, photo_path, background_mode=None, cutout=None, max_size=PHOTO_SIZE):
+        """The holder photo as RGBA with its background handled per mode, fitted within max_size, or None"""
+        if not photo_path or not os.path.exists(photo_path):
+            return None
         
-        # We don't draw a solid rectangle background anymore to allow blending with card background
+        mode = self.photo_mode(background_mode)
         
-        if photo_path and os.path.exists(photo_path):
+        photo = None
+        if mode == 'ai':
             try:
-                # Optimized background removal
-                from rembg import remove, new_session
-                if not hasattr(self, '_rembg_session'):
-                    self._rembg_session = new_session("u2net_is") # Faster lightweight model
-                
-                with open(photo_path, 'rb') as i:
-                    photo = remove(i.read(), session=self._rembg_session)
-                    photo = Image.open(BytesIO(photo))
-                
-                photo_size = 120
-                photo.thumbnail((photo_size, photo_size), Image.Resampling.LANCZOS)
-                
-                # Convert to RGBA to ensure transparency is preserved
-                if photo.mode != 'RGBA':
-                    photo = photo.convert('RGBA')
-                
-                photo_x = (photo_section_width - photo_size) // 2
-                photo_y = self.header_height + 20
-                
-                # Draw a subtle border instead of a background rectangle
-                draw = ImageDraw.Draw(card)
-                draw.rectangle((photo_x - 2, photo_y - 2, photo_x + photo_size + 2, photo_y + photo_size + 2), outline=(255, 255, 255), width=2)
-                
-                # Paste with alpha mask to preserve transparency
-                card.paste(photo, (photo_x, photo_y), photo)
+                # Background removal through the shared, preloaded session, at the model's input size,
+                # unless the caller already cut it out in a batch (remove_backgrounds)
+                if cutout is None:
+                    cutout = self.background_remover.remove(inference_bytes(photo_path, self.photo_max_edge))
+                photo = Image.open(BytesIO(cutout))
             except Exception as e:
                 print(f'Error adding photo: {e}')
                 # Fallback to simple chroma keying if rembg fails
-                try:
-                    photo = Image.open(photo_path)
-                    photo.thumbnail((120, 120), Image.Resampling.LANCZOS)
-                    if photo.mode != 'RGBA': photo = photo.convert('RGBA')
-                    data = photo.getdata()
-                    new_data = []
-                    for item in data:
-                        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-                            new_data.append((255, 255, 255, 0))
-                        else:
-                            new_data.append(item)
-                    photo.putdata(new_data)
-                    photo_x = (photo_section_width - 120) // 2
-                    photo_y = self.header_height + 20
-                    card.paste(photo, (photo_x, photo_y), photo)
-                except:
-                    pass
+                mode = 'chroma'
+        
+        if photo is None:
+            # Draft-decoded and upright, even for photos stored before ingestion normalised them
+            photo = open_normalized(photo_path, max_size)
+        photo.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        
+        # Convert to RGBA to ensure transparency is preserved
+        if photo.mode != 'RGBA':
+            photo = photo.convert('RGBA')
+        if mode == 'chroma':
+            photo = chroma_key(photo, self.config.get('chroma_threshold', 240), self.config.get('chroma_feather', 0))
+        return photo
+    
+    def photo_position(self):
+        return (PHOTO_SECTION_WIDTH - PHOTO_SIZE) // 2, self.header_height + 20
+    
+    def add_photo_section(self, card, photo_path, background_mode=None, cutout=None):
+        # We don't draw a solid rectangle background anymore to allow blending with card background
+        try:
+            photo = self.prepare_photo(photo_path, background_mode, cutout, self.px(PHOTO_SIZE))
+            if photo is None:
+                return card
+            
+            photo_x, photo_y = self.photo_position()
+            
+            # Draw a subtle border instead of a background rectangle
+            draw = ImageDraw.Draw(card)
+            draw.rectangle(self.pxs((photo_x - 2, photo_y - 2, photo_x + PHOTO_SIZE + 2, photo_y + PHOTO_SIZE + 2)),
+                           outline=(255, 255, 255), width=self.size_px(2))
+            
+            # Paste with alpha mask to preserve transparency
+            card.paste(photo, self.pxs((photo_x, photo_y)), photo)
+        except Exception as e:
+            print(f'Error adding photo: {e}')
         return card
     
-    def add_info_section(self, card, data):
-        draw = ImageDraw.Draw(card)
+    def info_font(self, data):
+        """(font path, value size, label size) from the holder's font settings"""
         font_family = data.get('font_family', 'DejaVuSans')
         font_size = int(data.get('font_size', 10))
-        font_color_hex = data.get('font_color', '#000000')
         font_bold = data.get('font_bold') in ['on', True, 'true']
         font_italic = data.get('font_italic') in ['on', True, 'true']
         
-        value_color = self.hex_to_rgb(font_color_hex)
-        label_color = (26, 58, 82) # Keeping labels professional but could be customized too
-        
-        font_dir = "/usr/share/fonts/truetype/liberation/" if "Liberation" in font_family else "/usr/share/fonts/truetype/dejavu/"
-        
-        # Determine font path based on bold/italic
+        # Determine font variant based on bold/italic
         suffix = ""
         if font_bold and font_italic: suffix = "BoldItalic"
         elif font_bold: suffix = "Bold"
         elif font_italic: suffix = "Italic"
         
-        # Try to find the specific font variant, fallback to base font
-        if suffix:
-            font_filename = f"{font_family}-{suffix}.ttf"
-        else:
-            font_filename = f"{font_family}.ttf"
-        font_path = os.path.join(font_dir, font_filename)
-        
-        if not os.path.exists(font_path):
-            font_path = os.path.join(font_dir, f"{font_family}.ttf")
-
-        try:
-            # For labels, we prefer Bold if available, otherwise fallback to our main font_path
-            label_bold_path = os.path.join(font_dir, f"{font_family}-Bold.ttf")
-            label_font_path = label_bold_path if os.path.exists(label_bold_path) else font_path
-            
-            label_font = ImageFont.truetype(label_font_path, max(7, font_size - 2))
-            value_font = ImageFont.truetype(font_path, font_size)
-            label_small_font = ImageFont.truetype(font_path, max(6, font_size - 4))
-        except:
-            label_font = value_font = label_small_font = ImageFont.load_default()
+        # The registry falls back to the base font when the variant is missing
+        return resources.font_path(font_family, suffix), font_size, max(6, font_size - 4)
+    
+    def info_text(self, data):
+        """(x, y, text, font path, font size, colour) of every label and value in the info section"""
+        font_path, font_size, label_size = self.info_font(data)
+        value_color = self.hex_to_rgb(data.get('font_color', '#000000'))
         
         info_start_y = self.header_height + 10
         info_end_y = self.height - 80 
         available_height = info_end_y - info_start_y
-        info_x, info_x_right = 180, 400
         item_spacing = available_height / 4
         
-        y1 = info_start_y
-        draw.text((info_x, y1), "SURNAME / NOM", fill=label_color, font=label_small_font)
-        draw.text((info_x, y1 + 10), data.get('full_name', '').upper().split()[0] if data.get('full_name') else '', fill=value_color, font=value_font)
-        draw.text((info_x_right, y1), "GIVEN NAMES / PRENOM", fill=label_color, font=label_small_font)
-        draw.text((info_x_right, y1 + 10), ' '.join(data.get('full_name', '').upper().split()[1:]) if len(data.get('full_name', '').split()) > 1 else '', fill=value_color, font=value_font)
-        
-        y2 = y1 + item_spacing
-        draw.text((info_x, y2), "NATIONALITY", fill=label_color, font=label_small_font)
-        draw.text((info_x, y2 + 10), data.get('nationality', '')[:15].upper() or 'UNKNOWN', fill=value_color, font=value_font)
-        draw.text((info_x_right, y2), "DATE OF BIRTH", fill=label_color, font=label_small_font)
-        draw.text((info_x_right, y2 + 10), data.get('date_of_birth', ''), fill=value_color, font=value_font)
-        
-        y3 = y2 + item_spacing
-        draw.text((info_x, y3), "PLACE OF BIRTH", fill=label_color, font=label_small_font)
-        draw.text((info_x, y3 + 10), data.get('address', '')[:20], fill=value_color, font=value_font)
-        draw.text((info_x_right, y3), "ID NUMBER", fill=label_color, font=label_small_font)
-        draw.text((info_x_right, y3 + 10), data.get('id_number', ''), fill=value_color, font=value_font)
-        
-        y4 = y3 + item_spacing
-        draw.text((info_x, y4), "ISSUED", fill=label_color, font=label_small_font)
-        draw.text((info_x, y4 + 10), data.get('issue_date', ''), fill=value_color, font=value_font)
-        draw.text((info_x_right, y4), "EXPIRES", fill=label_color, font=label_small_font)
-        draw.text((info_x_right, y4 + 10), data.get('expiry_date', ''), fill=value_color, font=value_font)
-
+        full_name = data.get('full_name', '')
+        rows = [
+            ("SURNAME / NOM", full_name.upper().split()[0] if full_name else '',
+             "GIVEN NAMES / PRENOM", ' '.join(full_name.upper().split()[1:]) if len(full_name.split()) > 1 else ''),
+            ("NATIONALITY", data.get('nationality', '')[:15].upper() or 'UNKNOWN',
+             "DATE OF BIRTH", data.get('date_of_birth', '')),
+            ("PLACE OF BIRTH", data.get('address', '')[:20],
+             "ID NUMBER", data.get('id_number', '')),
+            ("ISSUED", data.get('issue_date', ''),
+             "EXPIRES", data.get('expiry_date', '')),
+        ]
+        items = []
+        for i, (left_label, left_value, right_label, right_value) in enumerate(rows):
+            y = info_start_y + i * item_spacing
+            for x, label, value in ((INFO_X, left_label, left_value), (INFO_X_RIGHT, right_label, right_value)):
+                items.append((x, y, label, font_path, label_size, LABEL_COLOR))
+                items.append((x, y + 10, value, font_path, font_size, value_color))
+        return items
+    
+    def signature_image(self, data, max_size=SIGNATURE_SIZE):
+        """The holder signature fitted within max_size, or None"""
         sig_data = data.get('signature')
-        if sig_data and sig_data.startswith('data:image/png;base64,'):
-            try:
-                sig_content = base64.b64decode(sig_data.split(',')[1])
-                sig_img = Image.open(BytesIO(sig_content))
-                sig_img.thumbnail((120, 40), Image.Resampling.LANCZOS)
-                sig_x, sig_y = info_x, self.height - 110
-                if sig_img.mode == 'RGBA': card.paste(sig_img, (sig_x, sig_y), sig_img)
-                else: card.paste(sig_img, (sig_x, sig_y))
-                draw.text((sig_x, sig_y + 45), "HOLDER SIGNATURE", fill=label_color, font=label_small_font)
-            except Exception as e:
-                print(f'Error adding signature: {e}')
+        if not sig_data or not sig_data.startswith('data:image/png;base64,'):
+            return None
+        sig_img = Image.open(BytesIO(base64.b64decode(sig_data.split(',')[1])))
+        sig_img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return sig_img
+    
+    def signature_position(self):
+        return INFO_X, self.height - 110
+    
+    def add_info_section(self, card, data):
+        draw = ImageDraw.Draw(card)
+        for x, y, text, font_path, font_size, color in self.info_text(data):
+            draw.text(self.pxs((x, y)), text, fill=color, font=resources.font_file(font_path, self.size_px(font_size)))
+
+        try:
+            sig_img = self.signature_image(data, self.pxs(SIGNATURE_SIZE))
+            if sig_img is not None:
+                sig_x, sig_y = self.signature_position()
+                if sig_img.mode == 'RGBA': card.paste(sig_img, self.pxs((sig_x, sig_y)), sig_img)
+                else: card.paste(sig_img, self.pxs((sig_x, sig_y)))
+                font_path, _, label_size = self.info_font(data)
+                draw.text(self.pxs((sig_x, sig_y + 45)), "HOLDER SIGNATURE", fill=LABEL_COLOR,
+                          font=resources.font_file(font_path, self.size_px(label_size)))
+        except Exception as e:
+            print(f'Error adding signature: {e}')
         return card
 
     def add_mrz(self, card, data):
+        card = self.draw_mrz_band(card)
+        return self.add_mrz_text(card, data)
+
+    def mrz_top(self):
+        return self.height - 35 # Adjusted for single line
+
+    def mrz_text(self, data):
+        return MRZGenerator.format_mrz(data.get('full_name', 'UNKNOWN'), data.get('id_number', ''), data.get('date_of_birth', ''), data.get('expiry_date', ''))
+
+    def draw_mrz_band(self, card):
         draw = ImageDraw.Draw(card)
-        try: mrz_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", 10)
-        except: mrz_font = ImageFont.load_default()
-        mrz_text = MRZGenerator.format_mrz(data.get('full_name', 'UNKNOWN'), data.get('id_number', ''), data.get('date_of_birth', ''), data.get('expiry_date', ''))
+        mrz_y_start = self.mrz_top()
+        draw.rectangle(self.pxs((0, mrz_y_start - 3, self.width, self.height)), fill=MRZ_BAND_COLOR)
+        return card
+
+    def add_mrz_text(self, card, data):
+        draw = ImageDraw.Draw(card)
+        mrz_font = resources.font('DejaVuSansMono', self.size_px(10))
+        mrz_text = self.mrz_text(data)
         
-        mrz_y_start = self.height - 35 # Adjusted for single line
-        draw.rectangle((0, mrz_y_start - 3, self.width, self.height), fill=(26, 58, 82))
+        mrz_y_start = self.mrz_top()
         mrz_x = 10
-        draw.text((mrz_x, mrz_y_start + 5), mrz_text, fill=(255, 255, 255), font=mrz_font)
+        draw.text(self.pxs((mrz_x, mrz_y_start + 5)), mrz_text, fill=(255, 255, 255), font=mrz_font)
         return card
 
+    def security_lines(self):
+        pattern_x, pattern_y = self.width - 120, self.header_height + 20
+        return [(pattern_x + i, pattern_y, pattern_x + i + 3, pattern_y + 80) for i in range(0, 80, 5)]
+
     def add_security_features(self, card):
         draw = ImageDraw.Draw(card)
-        pattern_x, pattern_y = self.width - 120, self.header_height + 20
-        for i in range(0, 80, 5):
-            draw.line((pattern_x + i, pattern_y, pattern_x + i + 3, pattern_y + 80), fill=(200, 180, 100), width=1)
+        for line in self.security_lines():
+            draw.line(self.pxs(line), fill=SECURITY_LINE_COLOR, width=self.size_px(1))
         return card
 
-    def add_qr_code(self, card, qr_image_path):
-        if not qr_image_path or not os.path.exists(qr_image_path): return card
+    def add_qr_code(self, card, qr_image):
+        """Paste the QR code; qr_image is a PIL image or a path to one"""
+        if qr_image is None: return card
+        if isinstance(qr_image, str):
+            if not os.path.exists(qr_image): return card
         try:
-            qr = Image.open(qr_image_path)
-            qr_size = 60
-            qr.thumbnail((qr_size, qr_size), Image.Resampling.LANCZOS)
+            qr = Image.open(qr_image) if isinstance(qr_image, str) else qr_image.copy()
+            qr.thumbnail((self.px(QR_SIZE), self.px(QR_SIZE)), Image.Resampling.LANCZOS)
             if qr.mode != 'RGB': qr = qr.convert('RGB')
-            qr_x, qr_y = self.width - qr_size - 15, self.height - qr_size - 60
-            card.paste(qr, (qr_x, qr_y))
+            qr_x, qr_y = self.qr_position()
+            card.paste(qr, self.pxs((qr_x, qr_y)))
         except Exception as e:
             print(f'Error adding QR: {e}')
         return card
 
-    def generate(self, data, photo_path=None, qr_path=None, watermark_func=None, logo_path=None, background_path=None):
-        card = self.create_blank_card(background_path)
-        card = self.add_header(card, data.get('organization', ''), logo_path)
-        card = self.add_photo_section(card, photo_path)
-        card = self.add_info_section(card, data)
-        card = self.add_security_features(card)
-        card = self.add_mrz(card, data)
-        card = self.add_qr_code(card, qr_path)
-        if watermark_func: card = watermark_func(card)
+    def qr_position(self):
+        return self.width - QR_SIZE - 15, self.height - QR_SIZE - 60
+
+    def build_base_layer(self, logo_path=None, background_path=None):
+        """Render everything that doesn't depend on the holder: background,
+        header bar and logo, plus the security pattern and MRZ band.
+
+        The pattern and band sit on top of the holder's photo and text, so they
+        are kept apart as meta['decorations'], an (offset, RGBA image) pair that
+        generate() pastes after the holder content.
+        """
+        with metrics.timed('create_blank_card'):
+            card = self.create_blank_card(background_path)
+        with metrics.timed('draw_header_bar'):
+            text_x_offset = self.draw_header_bar(card, logo_path)
+        decorations = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        with metrics.timed('add_security_features'):
+            self.add_security_features(decorations)
+        with metrics.timed('draw_mrz_band'):
+            self.draw_mrz_band(decorations)
+        box = decorations.getbbox()
+        return card, {'text_x_offset': text_x_offset, 'decorations': (box[:2], decorations.crop(box))}
+
+    @staticmethod
+    def add_decorations(card, meta):
+        """Paste the base layer's security pattern and MRZ band (opaque, so the pixels match drawing them directly)"""
+        offset, decorations = meta['decorations']
+        card.paste(decorations, offset, decorations)
+        return card
+
+    def generate(self, data, photo_path=None, qr_image=None, watermark_func=None, logo_path=None, background_path=None, layer_key=None,
+                 cutout=None):
+        with metrics.timed('base_layer'):
+            if layer_key is not None:
+                card, meta = self.layer_cache.get(layer_key, lambda: self.build_base_layer(logo_path, background_path))
+            else:
+                card, meta = self.build_base_layer(logo_path, background_path)
+        with metrics.timed('add_header'):
+            card = self.add_header_text(card, data.get('organization', ''), meta['text_x_offset'])
+        with metrics.timed('add_photo_section'):
+            card = self.add_photo_section(card, photo_path, data.get('background_mode'), cutout)
+        with metrics.timed('add_info_section'):
+            card = self.add_info_section(card, data)
+        with metrics.timed('add_decorations'):
+            card = self.add_decorations(card, meta)
+        with metrics.timed('add_mrz'):
+            card = self.add_mrz_text(card, data)
+        with metrics.timed('add_qr_code'):
+            card = self.add_qr_code(card, qr_image)
+        if watermark_func:
+            with metrics.timed('watermark'):
+                card = watermark_func(card)
         return card
@@ -0,0 +1,105 @@
+import sqlite3
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+SQLITE_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URI.
+
+    SQLite gets a busy timeout on the driver; server databases get a
+    sized connection pool with pre-ping so dropped connections are replaced.
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_sqlite(uri):
+        return {
+            'connect_args': {
+                'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+                'check_same_thread': False
+            }
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True
+    }
+
+
+def install_sqlite_pragmas(config):
+    """Apply WAL journaling, synchronous, busy_timeout and mmap to every new SQLite connection.
+
+    WAL lets verification reads run while /generate commits; in-memory
+    databases keep their default journal since they cannot use WAL.
+    """
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if synchronous not in SQLITE_SYNCHRONOUS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(SQLITE_SYNCHRONOUS)}")
+    busy_timeout = int(config['SQLITE_BUSY_TIMEOUT_MS'])
+    mmap_size = int(config['SQLITE_MMAP_MB']) * 1024 * 1024
+    journal_mode = 'WAL' if config['SQLITE_WAL'] else 'DELETE'
+
+    @event.listens_for(Engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            in_memory = cursor.execute('PRAGMA database_list').fetchone()[2] == ''
+            if not in_memory:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+            cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+            cursor.execute(f'PRAGMA mmap_size={mmap_size}')
+        finally:
+            cursor.close()
+
+    return set_sqlite_pragmas
+
+
+def sqlite_settings(engine):
+    """Current pragma values on one pooled connection, for /api/stats"""
+    if engine.dialect.name != 'sqlite':
+        return None
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')}
+
+
+def install_query_timing(metrics):
+    """Record statement time as the db_query stage and commit time (flush included) as db_commit"""
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        metrics.record_stage('db_query', time.perf_counter() - conn.info['query_started'].pop())
+
+    @event.listens_for(Engine, 'handle_error')
+    def failed_query(context):
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+    @event.listens_for(Session, 'before_commit')
+    def start_commit(session):
+        session.info['commit_started'] = time.perf_counter()
+
+    @event.listens_for(Session, 'after_commit')
+    def end_commit(session):
+        started = session.info.pop('commit_started', None)
+        if started is not None:
+            metrics.record_stage('db_commit', time.perf_counter() - started)
+
+    @event.listens_for(Session, 'after_rollback')
+    def clear_commit(session):
+        session.info.pop('commit_started', None)
@@ -0,0 +1,125 @@
+# Modern, professional ID card templates seeded by init_db
+
+DEFAULT_TEMPLATES = [
+    {
+        'name': 'Executive Elite',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#ffffff',
+            'header_height': 80,
+            'header_color': '#1a1f3a',
+            'photo_bg_color': '#f5f5f5',
+            'accent_color': '#0066cc',
+            'photo_x': 25,
+            'photo_y': 85,
+            'text_x': 200,
+            'text_y': 85,
+            'qr_x': 550,
+            'qr_y': 310,
+            'qr_size': 70,
+            'corner_radius': 8
+        }
+    },
+    {
+        'name': 'Minimalist Clean',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#f8f9fa',
+            'header_height': 60,
+            'header_color': '#ffffff',
+            'photo_bg_color': '#e9ecef',
+            'accent_color': '#495057',
+            'photo_x': 25,
+            'photo_y': 70,
+            'text_x': 200,
+            'text_y': 70,
+            'qr_x': 550,
+            'qr_y': 315,
+            'qr_size': 65,
+            'border_color': '#dee2e6',
+            'border_width': 2
+        }
+    },
+    {
+        'name': 'Corporate Blue',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#ffffff',
+            'header_height': 70,
+            'header_color': '#003d7a',
+            'photo_bg_color': '#e3f2fd',
+            'accent_color': '#0066cc',
+            'photo_x': 25,
+            'photo_y': 80,
+            'text_x': 200,
+            'text_y': 80,
+            'qr_x': 550,
+            'qr_y': 310,
+            'qr_size': 70,
+            'shadow': True
+        }
+    },
+    {
+        'name': 'Modern Gradient',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#ffffff',
+            'header_height': 75,
+            'header_color': '#667eea',
+            'photo_bg_color': '#f0f4ff',
+            'accent_color': '#667eea',
+            'secondary_accent': '#764ba2',
+            'photo_x': 25,
+            'photo_y': 85,
+            'text_x': 200,
+            'text_y': 85,
+            'qr_x': 550,
+            'qr_y': 310,
+            'qr_size': 70,
+            'gradient': True
+        }
+    },
+    {
+        'name': 'Professional Dark',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#ffffff',
+            'header_height': 70,
+            'header_color': '#2c3e50',
+            'photo_bg_color': '#ecf0f1',
+            'accent_color': '#34495e',
+            'photo_x': 25,
+            'photo_y': 80,
+            'text_x': 200,
+            'text_y': 80,
+            'qr_x': 550,
+            'qr_y': 310,
+            'qr_size': 70
+        }
+    },
+    {
+        'name': 'Tech Modern',
+        'config': {
+            'width': 640,
+            'height': 400,
+            'background_color': '#0f1419',
+            'header_height': 70,
+            'header_color': '#1a1f3a',
+            'photo_bg_color': '#1e2536',
+            'accent_color': '#00d9ff',
+            'text_color': '#ffffff',
+            'photo_x': 25,
+            'photo_y': 80,
+            'text_x': 200,
+            'text_y': 80,
+            'qr_x': 550,
+            'qr_y': 310,
+            'qr_size': 70
+        }
+    }
+]
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ManagedFile, ScheduledTask
+
+TASK_NAME = 'file_expiry'
+
+
+class FileExpiryManager:
+    """Deletes generated and uploaded files when they expire, from an index
+    instead of scanning directories.
+
+    Every file is recorded in managed_file with its expiry when it is
+    written (track()). A sweep deletes exactly the rows that are due, then
+    trims the still-expiring files of any folder over its byte quota,
+    oldest first; retained files are neither counted nor deleted. in_use(folder,
+    filenames) may return names that must survive; their expiry is pushed
+    back by ttl. Each process runs a timer, but a sweep only happens in the
+    process that claims the scheduled_task lease, so a deployment with
+    several workers sweeps once per interval.
+    """
+
+    def __init__(self, app, ttl=120, interval=60, quotas=None, in_use=None, batch_size=500):
+        self.app = app
+        self.ttl = ttl
+        self.interval = interval
+        self.quotas = quotas or {}
+        self.in_use = in_use
+        self.batch_size = batch_size
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.deleted = 0
+        self.bytes_freed = 0
+
+    def track(self, folder, filename, ttl=None):
+        self.track_many(folder, [filename], ttl)
+
+    def track_many(self, folder, filenames, ttl=None):
+        """Record files just written to folder; ttl=0 never expires them"""
+        filenames = [f for f in filenames if f]
+        if not filenames:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        now = datetime.utcnow()
+        rows = []
+        for filename in filenames:
+            try:
+                size = os.path.getsize(os.path.join(folder, filename))
+            except OSError:
+                size = 0
+            rows.append({'folder': folder, 'filename': filename, 'size': size, 'created_at': now,
+                         'expires_at': now + timedelta(seconds=ttl) if ttl else None})
+        # Own connection, so tracking is durable even if the caller's transaction rolls back
+        with db.engine.begin() as conn:
+            existing = {name for (name,) in conn.execute(
+                db.select(ManagedFile.filename).where(ManagedFile.folder == folder, ManagedFile.filename.in_(filenames)))}
+            for row in rows:
+                if row['filename'] in existing:
+                    conn.execute(db.update(ManagedFile).where(ManagedFile.folder == folder,
+                                                              ManagedFile.filename == row['filename'])
+                                 .values(size=row['size'], expires_at=row['expires_at']))
+            new_rows = [row for row in rows if row['filename'] not in existing]
+            if new_rows:
+                conn.execute(db.insert(ManagedFile), new_rows)
+
+    def retain(self, folder, filenames):
+        """Keep files indefinitely (e.g. uploads a card now references); joins the caller's transaction"""
+        filenames = [f for f in filenames if f]
+        if filenames:
+            db.session.query(ManagedFile).filter(ManagedFile.folder == folder, ManagedFile.filename.in_(filenames)) \
+                .update({'expires_at': None}, synchronize_session=False)
+
+    def _delete(self, rows):
+        freed = 0
+        for row in rows:
+            try:
+                os.remove(os.path.join(row.folder, row.filename))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error deleting {row.folder}/{row.filename}: {e}")
+                continue
+            freed += row.size or 0
+        db.session.query(ManagedFile).filter(ManagedFile.id.in_([row.id for row in rows])) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return freed
+
+    def _split_in_use(self, rows, now):
+        """Postpone rows still in use; return the rest"""
+        if not self.in_use or not rows:
+            return rows
+        by_folder = {}
+        for row in rows:
+            by_folder.setdefault(row.folder, []).append(row)
+        free = []
+        postponed = []
+        for folder, folder_rows in by_folder.items():
+            used = self.in_use(folder, [row.filename for row in folder_rows]) or set()
+            for row in folder_rows:
+                (postponed if row.filename in used else free).append(row)
+        if postponed:
+            db.session.query(ManagedFile).filter(ManagedFile.id.in_([row.id for row in postponed])) \
+                .update({'expires_at': now + timedelta(seconds=self.ttl)}, synchronize_session=False)
+            db.session.commit()
+        return free
+
+    def sweep(self):
+        """Delete every due file, then enforce folder quotas. Returns a summary dict."""
+        now = datetime.utcnow()
+        deleted, freed = 0, 0
+        last_id = 0
+        while True:
+            # Rows that stay (postponed) have a later expiry now, so paging on id is enough
+            due = ManagedFile.query.filter(ManagedFile.expires_at <= now, ManagedFile.id > last_id) \
+                .order_by(ManagedFile.id).limit(self.batch_size).all()
+            if not due:
+                break
+            last_id = due[-1].id
+            free = self._split_in_use(due, now)
+            if free:
+                freed += self._delete(free)
+                deleted += len(free)
+
+        quota_deleted = 0
+        for folder, max_bytes in self.quotas.items():
+            total = db.session.query(db.func.coalesce(db.func.sum(ManagedFile.size), 0)) \
+                .filter(ManagedFile.folder == folder, ManagedFile.expires_at.isnot(None)).scalar()
+            last_id = 0
+            while total > max_bytes:
+                oldest = ManagedFile.query.filter(ManagedFile.folder == folder, ManagedFile.expires_at.isnot(None),
+                                                  ManagedFile.id > last_id) \
+                    .order_by(ManagedFile.id).limit(self.batch_size).all()
+                if not oldest:
+                    break
+                last_id = oldest[-1].id
+                victims = []
+                for row in self._split_in_use(oldest, now):
+                    if total <= max_bytes:
+                        break
+                    victims.append(row)
+                    total -= row.size or 0
+                if victims:
+                    freed += self._delete(victims)
+                    quota_deleted += len(victims)
+
+        with self._lock:
+            self.sweeps += 1
+            self.deleted += deleted + quota_deleted
+            self.bytes_freed += freed
+        return {'expired': deleted, 'over_quota': quota_deleted, 'bytes_freed': freed}
+
+    def _claim(self):
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=max(1, self.interval * 0.9))
+        claimed = db.session.query(ScheduledTask).filter(
+            ScheduledTask.name == TASK_NAME,
+            db.or_(ScheduledTask.lease_until.is_(None), ScheduledTask.lease_until <= now)
+        ).update({'lease_until': lease}, synchronize_session=False)
+        if not claimed:
+            if db.session.get(ScheduledTask, TASK_NAME) is not None:
+                db.session.rollback()
+                return False
+            db.session.add(ScheduledTask(name=TASK_NAME, lease_until=lease))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+    def run_once(self, force=False):
+        """Sweep if no other process has swept within the interval (force: take the lease anyway).
+        Returns the summary, or None when another process holds the lease."""
+        with self.app.app_context():
+            if force:
+                db.session.query(ScheduledTask).filter_by(name=TASK_NAME).update({'lease_until': None})
+                db.session.commit()
+            if not self._claim():
+                return None
+            result = self.sweep()
+            task = db.session.get(ScheduledTask, TASK_NAME)
+            task.last_run = datetime.utcnow()
+            task.last_result = json.dumps(result)
+            db.session.commit()
+            if result['expired'] or result['over_quota']:
+                print(f"File expiry: deleted {result['expired']} expired and {result['over_quota']} over-quota files "
+                      f"({result['bytes_freed']} bytes)")
+            return result
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running or self.interval <= 0:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name='file-expiry', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _worker(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"File expiry error: {e}")
+
+    def stats(self):
+        tracked = db.session.query(ManagedFile.folder, db.func.count(ManagedFile.id),
+                                   db.func.coalesce(db.func.sum(ManagedFile.size), 0)) \
+            .group_by(ManagedFile.folder).all()
+        task = db.session.get(ScheduledTask, TASK_NAME)
+        return {
+            'running': self.running,
+            'sweeps': self.sweeps,
+            'deleted': self.deleted,
+            'bytes_freed': self.bytes_freed,
+            'folders': {folder: {'files': count, 'bytes': size, 'quota': self.quotas.get(folder)}
+                        for folder, count, size in tracked},
+            'last_run': task.last_run.isoformat() if task and task.last_run else None,
+            'last_result': json.loads(task.last_result) if task and task.last_result else None
+        }
@@ -0,0 +1,218 @@
+import ipaddress
+import json
+import socket
+import threading
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+from models import db, GenerationJob
+
+
+def check_callback_url(url, allowed_hosts=()):
+    """Raise ValueError unless url is an http(s) URL the server may POST to.
+
+    With allowed_hosts, the host must be one of them; otherwise every address
+    it resolves to must be public, so callbacks can't reach loopback, private
+    or link-local services.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise ValueError('callback_url must be an http(s) URL')
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('callback_url must be an http(s) URL')
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError('callback_url host is not allowed')
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError('callback_url host does not resolve')
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError('callback_url must not point to a private or local address')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects, which would otherwise send the callback past check_callback_url"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class JobQueue:
+    """Card generation jobs stored in the generation_job table and worked off
+    by a pool of threads in each app process.
+
+    Jobs are claimed with a conditional UPDATE and held under a lease, so
+    several processes can share the table and a crashed worker's job is
+    picked up again once its lease runs out. The handler raises ValueError
+    for input problems (not retried); any other exception is retried with
+    backoff until max_attempts is reached. Callback URLs are checked with
+    check_callback_url against callback_hosts when queued and again before
+    each POST.
+    """
+
+    def __init__(self, app, handler, workers=2, max_attempts=3, lease_seconds=300, poll_interval=1.0, retry_delay=5,
+                 callback_hosts=()):
+        self.app = app
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.callback_hosts = frozenset(h.lower() for h in callback_hosts)
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        with self._lock:
+            if self.running or self.workers <= 0:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"card-job-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def enqueue(self, payload, callback_url=None):
+        if callback_url:
+            check_callback_url(callback_url, self.callback_hosts)
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            status='QUEUED',
+            payload=json.dumps(payload),
+            callback_url=callback_url,
+            max_attempts=self.max_attempts,
+            run_after=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.start()
+        self._wake.set()
+        return job
+
+    def _claim(self):
+        now = datetime.utcnow()
+        candidates = db.session.query(GenerationJob.id).filter(
+            db.or_(
+                db.and_(GenerationJob.status == 'QUEUED', GenerationJob.run_after <= now),
+                db.and_(GenerationJob.status == 'RUNNING', GenerationJob.lease_expires < now)
+            )
+        ).order_by(GenerationJob.created_at).limit(self.workers * 2).all()
+
+        for (job_id,) in candidates:
+            claimed = db.session.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                db.or_(GenerationJob.status == 'QUEUED',
+                       db.and_(GenerationJob.status == 'RUNNING', GenerationJob.lease_expires < now))
+            ).update({
+                'status': 'RUNNING',
+                'attempts': GenerationJob.attempts + 1,
+                'started_at': now,
+                'lease_expires': now + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(GenerationJob, job_id)
+        return None
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job = self._claim()
+                    if job is not None:
+                        self._run(job)
+                        continue
+            except Exception as e:
+                print(f"Job worker error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _run(self, job):
+        try:
+            result = self.handler(job.get_payload())
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(GenerationJob, job.id)
+            job.error = str(e)
+            if isinstance(e, ValueError) or job.attempts >= job.max_attempts:
+                job.status = 'FAILED'
+                job.finished_at = datetime.utcnow()
+                with self._lock:
+                    self.failed += 1
+            else:
+                job.status = 'QUEUED'
+                job.run_after = datetime.utcnow() + timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+                with self._lock:
+                    self.retried += 1
+            db.session.commit()
+        else:
+            job.status = 'DONE'
+            job.result = json.dumps(result)
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            with self._lock:
+                self.processed += 1
+
+        if job.status in ('DONE', 'FAILED') and job.callback_url:
+            self._notify(job)
+
+    def _notify(self, job):
+        body = json.dumps({
+            'job_id': job.id,
+            'status': job.status,
+            'result': job.get_result(),
+            'error': job.error
+        }).encode('utf-8')
+        req = urllib.request.Request(job.callback_url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            # Checked again here: the host may resolve differently than when the job was queued
+            check_callback_url(job.callback_url, self.callback_hosts)
+            urllib.request.build_opener(_NoRedirect).open(req, timeout=10).close()
+        except Exception as e:
+            print(f"Job callback to {job.callback_url} failed: {e}")
+
+    def metrics(self):
+        counts = dict(db.session.query(GenerationJob.status, db.func.count(GenerationJob.id)).group_by(GenerationJob.status).all())
+        return {
+            'queue_depth': counts.get('QUEUED', 0),
+            'running': counts.get('RUNNING', 0),
+            'done': counts.get('DONE', 0),
+            'failed': counts.get('FAILED', 0),
+            'workers': self.workers,
+            'workers_alive': sum(1 for t in self._threads if t.is_alive()),
+            'processed': self.processed,
+            'retried': self.retried,
+            'failed_here': self.failed
+        }
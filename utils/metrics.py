@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}'
+        yield f'{name}_bucket{_labels(labels, le="+Inf")} {self.count}'
+        yield f'{name}_sum{_labels(labels)} {self.sum:.6f}'
+        yield f'{name}_count{_labels(labels)} {self.count}'
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+
+class Metrics:
+    """Process-wide timing histograms plus a per-thread trace of the current request.
+
+    timed(stage) records into the card_stage_seconds histogram and, when a
+    trace is active on the thread (begin_trace()), into that trace so the
+    request can report its own stages in a Server-Timing header.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def record_stage(self, stage, seconds):
+        self.observe('card_stage_seconds', seconds, stage=stage)
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start)
+
+    def begin_trace(self):
+        self._local.trace = OrderedDict()
+
+    def end_trace(self):
+        """Stage totals recorded on this thread since begin_trace(), as {stage: seconds}"""
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        return trace or {}
+
+    def render(self, caches=None):
+        """Prometheus text exposition of every histogram, plus hit/miss counters from cache stats() dicts"""
+        lines = []
+        with self._lock:
+            by_name = OrderedDict()
+            for (name, labels), histogram in self._histograms.items():
+                by_name.setdefault(name, []).append((labels, histogram))
+            for name, series in by_name.items():
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in series:
+                    lines.extend(histogram.lines(name, labels))
+
+        if caches:
+            for metric, key in (('cache_hits_total', 'hits'), ('cache_misses_total', 'misses')):
+                lines.append(f'# TYPE {metric} counter')
+                for cache, stats in caches.items():
+                    if stats and stats.get(key) is not None:
+                        lines.append(f'{metric}{_labels([("cache", cache)])} {stats[key]}')
+            lines.append('# TYPE cache_hit_ratio gauge')
+            for cache, stats in caches.items():
+                if stats and stats.get('hit_rate') is not None:
+                    lines.append(f'cache_hit_ratio{_labels([("cache", cache)])} {stats["hit_rate"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing(trace, total=None):
+    """Server-Timing header value for a trace from Metrics.end_trace()"""
+    parts = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in trace.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+metrics = Metrics()
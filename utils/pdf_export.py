@@ -2,29 +2,53 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from datetime import datetime
+from io import BytesIO
 import os
+from .metrics import metrics
 
 class PDFExporter:
     def __init__(self, output_dir='static/pdfs'):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def export(self, card_image_path, data, filename=None):
+    def export(self, card_image, data, filename=None):
+        """Write the PDF to output_dir. card_image is a PIL image, a path to one, or a VectorCard."""
         if filename is None:
             filename = f"card_{data.get('id_number', 'unknown')}.pdf"
         
         filepath = os.path.join(self.output_dir, filename)
-        
-        c = canvas.Canvas(filepath, pagesize=letter)
+        self.render(card_image, data, filepath)
+        return filepath
+    
+    def export_bytes(self, card_image, data):
+        """Render the PDF into memory and return its bytes"""
+        buffer = BytesIO()
+        self.render(card_image, data, buffer)
+        return buffer.getvalue()
+    
+    def render(self, card_image, data, output):
+        # Separate stages so Server-Timing and the Prometheus totals count each backend once
+        with metrics.timed('pdf_vector' if hasattr(card_image, 'draw_on') else 'pdf'):
+            self._render(card_image, data, output)
+    
+    def _render(self, card_image, data, output):
+        c = canvas.Canvas(output, pagesize=letter)
         width, height = letter
         
         # Add title
         c.setFont("Helvetica-Bold", 16)
         c.drawString(50, height - 50, f"ID Card: {data.get('full_name', '')}")
         
-        # Add image
-        if os.path.exists(card_image_path):
-            img = ImageReader(card_image_path)
+        # Add image, embedding an already-rendered card directly when given one;
+        # a VectorCard draws itself into the same box
+        if hasattr(card_image, 'draw_on'):
+            card_image.draw_on(c, 50, height - 400, 500, 300)
+            img = None
+        elif isinstance(card_image, str):
+            img = ImageReader(card_image) if os.path.exists(card_image) else None
+        else:
+            img = ImageReader(card_image)
+        if img is not None:
             c.drawImage(img, 50, height - 400, width=500, height=300, preserveAspectRatio=True)
         
         # Add info
@@ -46,4 +70,3 @@ class PDFExporter:
             y -= 15
         
         c.save()
-        return filepath
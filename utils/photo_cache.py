@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class PhotoCache:
+    """Two-tier cache of background-removed photos keyed by content hash.
+
+    The memory tier is an LRU bounded by total bytes; the disk tier keeps PNG
+    files under cache_dir and evicts the least recently used ones once the
+    directory grows past disk_limit.
+    """
+
+    def __init__(self, cache_dir='cache/photos', memory_limit=64 * 1024 * 1024, disk_limit=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(image_bytes, model_name):
+        digest = hashlib.sha256()
+        digest.update(model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _load_disk_index(self):
+        # Called with the lock held; scans the directory once per process
+        if self._disk is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.png'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, filename))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, filename[:-4], st.st_size))
+        entries.sort()
+        self._disk = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_size = sum(self._disk.values())
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_limit:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+            self._load_disk_index()
+            if key in self._disk:
+                try:
+                    with open(self._path(key), 'rb') as f:
+                        data = f.read()
+                    os.utime(self._path(key))
+                    self._disk.move_to_end(key)
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                    return data
+                except OSError:
+                    self._disk_size -= self._disk.pop(key)
+
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+            self._load_disk_index()
+            if key in self._disk or len(data) > self.disk_limit:
+                return
+            try:
+                tmp_path = self._path(key) + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                print(f"Error writing photo cache entry: {e}")
+                return
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            while self._disk_size > self.disk_limit:
+                evicted, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self._load_disk_index()
+            for key in list(self._disk):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._disk.clear()
+            self._disk_size = 0
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk) if self._disk is not None else None,
+                'disk_bytes': self._disk_size if self._disk is not None else None
+            }
@@ -0,0 +1,90 @@
+import os
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Longest edge each rembg model resizes its input to; anything larger is wasted decode and transfer
+MODEL_INPUT_EDGE = {
+    'u2net': 320,
+    'u2netp': 320,
+    'u2net_is': 320,
+    'u2net_human_seg': 320,
+    'u2net_cloth_seg': 768,
+    'silueta': 320,
+    'isnet-general-use': 1024,
+    'isnet-anime': 1024,
+}
+ORIENTATION_TAG = 0x0112
+
+
+def model_input_edge(model_name):
+    return MODEL_INPUT_EDGE.get(model_name, 320)
+
+
+def default_max_edge(model_name, render_edge=0):
+    """PHOTO_MAX_EDGE from the environment, else the larger of the model's input resolution and render_edge,
+    the largest size a photo is drawn at (so no output has to upsample it)"""
+    return int(os.environ.get('PHOTO_MAX_EDGE') or max(model_input_edge(model_name), render_edge))
+
+
+def open_normalized(source, max_edge):
+    """Decode a photo (path, file object or bytes) at no more than max_edge on its longest side,
+    upright according to its EXIF orientation.
+
+    JPEGs are decoded in draft mode, so the DCT scaler does most of the
+    shrinking; other formats are reduced by an integer factor before the
+    final high-quality resize.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    try:
+        image = Image.open(source)
+        if image.format == 'JPEG':
+            image.draft('RGB', (max_edge, max_edge))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Photo is not a readable image: {e}")
+
+    image = ImageOps.exif_transpose(image)
+    factor = max(image.size) // (max_edge * 2)
+    if factor >= 2:
+        image = image.reduce(factor)
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def encode_photo(image):
+    """(bytes, extension) for a normalised photo: JPEG unless it has transparency"""
+    buffer = BytesIO()
+    if image.mode == 'RGBA':
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), 'png'
+    image.save(buffer, format='JPEG', quality=90, optimize=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def ingest_photo(source, folder, basename, max_edge):
+    """Normalise an uploaded photo and write it to folder, returning the stored filename"""
+    data, ext = encode_photo(open_normalized(source, max_edge))
+    filename = f"{os.path.splitext(basename)[0]}.{ext}"
+    with open(os.path.join(folder, filename), 'wb') as f:
+        f.write(data)
+    return filename
+
+
+def inference_bytes(path, max_edge):
+    """Photo bytes to hand to the model: the stored file when it is already small and upright
+    (ingested photos), otherwise a normalised copy (photos stored before ingestion existed)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        with Image.open(BytesIO(raw)) as image:
+            orientation = image.getexif().get(ORIENTATION_TAG, 1)
+            if max(image.size) <= max_edge and orientation in (0, 1):
+                return raw
+    except Exception:
+        return raw
+    return encode_photo(open_normalized(raw, max_edge))[0]
@@ -0,0 +1,212 @@
+import zlib
+
+from PIL import Image, ImageChops
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.units import mm
+
+from .metrics import metrics
+
+CR80 = (85.60 * mm, 53.98 * mm)
+PAGE_SIZES = {'a4': A4, 'letter': letter}
+CROP_MARK_OFFSET = 2 * mm
+CROP_MARK_LENGTH = 5 * mm
+
+
+def split_layers(card_image, base_image):
+    """(box, overlay) such that pasting overlay at box on base_image gives card_image exactly.
+
+    The overlay keeps only the pixels the card changed (text, photo, QR,
+    watermark), cropped to their bounding box, with everything else fully
+    transparent. Returns (None, None) when the card is identical to its base.
+    """
+    card_image = card_image.convert('RGB')
+    base_image = base_image.convert('RGB')
+    if base_image.size != card_image.size:
+        base_image = base_image.resize(card_image.size)
+    red, green, blue = ImageChops.difference(card_image, base_image).split()
+    diff = ImageChops.lighter(ImageChops.lighter(red, green), blue).point(lambda v: 255 if v else 0)
+    box = diff.getbbox()
+    if box is None:
+        return None, None
+    overlay = Image.new('RGBA', (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+    overlay.paste(card_image.crop(box), (0, 0), diff.crop(box))
+    return box, overlay
+
+
+class SheetLayout:
+    """Grid of CR80 cards on a page, in whichever orientation fits more of them"""
+
+    def __init__(self, page='a4', margin_mm=10, gutter_mm=0, card_size=CR80):
+        if page not in PAGE_SIZES:
+            raise ValueError(f"page must be one of {', '.join(PAGE_SIZES)}")
+        self.card_width, self.card_height = card_size
+        margin = margin_mm * mm
+        self.gutter = gutter = gutter_mm * mm
+        short, long_ = sorted(PAGE_SIZES[page])
+        best = None
+        for page_size in ((short, long_), (long_, short)):
+            columns = max(0, int((page_size[0] - 2 * margin + gutter) // (self.card_width + gutter)))
+            rows = max(0, int((page_size[1] - 2 * margin + gutter) // (self.card_height + gutter)))
+            if best is None or columns * rows > best[1] * best[2]:
+                best = (page_size, columns, rows)
+        self.page_size, self.columns, self.rows = best
+        if not self.columns or not self.rows:
+            raise ValueError('Margin too large for a single card on this page')
+
+        grid_width = self.columns * self.card_width + (self.columns - 1) * gutter
+        grid_height = self.rows * self.card_height + (self.rows - 1) * gutter
+        self.left = (self.page_size[0] - grid_width) / 2
+        self.bottom = (self.page_size[1] - grid_height) / 2
+        self.right = self.left + grid_width
+        self.top = self.bottom + grid_height
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    def slot(self, index):
+        """Bottom-left corner of the index-th card on a page, filled left to right, top to bottom"""
+        row, column = divmod(index, self.columns)
+        x = self.left + column * (self.card_width + self.gutter)
+        y = self.top - (row + 1) * self.card_height - row * self.gutter
+        return x, y
+
+    def crop_marks(self):
+        """Line segments (x1, y1, x2, y2) in the margins, continuing every cut line"""
+        xs = sorted({round(self.left + c * (self.card_width + self.gutter) + edge, 3)
+                     for c in range(self.columns) for edge in (0, self.card_width)})
+        ys = sorted({round(self.bottom + r * (self.card_height + self.gutter) + edge, 3)
+                     for r in range(self.rows) for edge in (0, self.card_height)})
+        near, far = CROP_MARK_OFFSET, CROP_MARK_OFFSET + CROP_MARK_LENGTH
+        marks = []
+        for x in xs:
+            marks.append((x, self.top + near, x, self.top + far))
+            marks.append((x, self.bottom - near, x, self.bottom - far))
+        for y in ys:
+            marks.append((self.left - near, y, self.left - far, y))
+            marks.append((self.right + near, y, self.right + far, y))
+        return marks
+
+
+class PrintSheetWriter:
+    """Imposes cards onto print sheets, writing the PDF as it goes.
+
+    stream() yields the file in chunks: each page is written as soon as it
+    is full, so memory holds one page of cards regardless of how many are
+    printed. Cards come as (base key, base image, overlay box, overlay);
+    every distinct base layer (background, logo, header bar) is embedded
+    once and referenced from each card that uses it.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self._offset = 0
+        self._offsets = {}
+        self._next_id = 3  # 1 = catalog, 2 = page tree, both written last
+        self._bases = {}
+        self._pages = []
+        self.cards = 0
+
+    @property
+    def pages(self):
+        return len(self._pages)
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _object(self, obj_id, body, stream=None):
+        data = f"{obj_id} 0 obj\n".encode('ascii') + body.encode('ascii')
+        if stream is not None:
+            data += b"\nstream\n" + stream + b"\nendstream"
+        data += b"\nendobj\n"
+        self._offsets[obj_id] = self._offset
+        self._offset += len(data)
+        return data
+
+    def _image(self, image):
+        """Image XObject (plus soft mask for RGBA) as (object id, bytes)"""
+        chunks = []
+        smask = ''
+        if image.mode == 'RGBA':
+            mask_id = self._allocate()
+            alpha = zlib.compress(image.getchannel('A').tobytes())
+            chunks.append(self._object(mask_id, f"<< /Type /XObject /Subtype /Image /Width {image.width} "
+                                                f"/Height {image.height} /ColorSpace /DeviceGray /BitsPerComponent 8 "
+                                                f"/Filter /FlateDecode /Length {len(alpha)} >>", alpha))
+            smask = f" /SMask {mask_id} 0 R"
+        image_id = self._allocate()
+        pixels = zlib.compress(image.convert('RGB').tobytes())
+        chunks.append(self._object(image_id, f"<< /Type /XObject /Subtype /Image /Width {image.width} "
+                                             f"/Height {image.height} /ColorSpace /DeviceRGB /BitsPerComponent 8 "
+                                             f"/Filter /FlateDecode /Length {len(pixels)}{smask} >>", pixels))
+        return image_id, b''.join(chunks)
+
+    def _page(self, placed):
+        layout = self.layout
+        chunks = []
+        resources = {}
+        content = []
+        for index, (base_key, base_image, box, overlay) in enumerate(placed):
+            x, y = layout.slot(index)
+            base_name = self._bases.get(base_key)
+            if base_name is None:
+                base_id, data = self._image(base_image)
+                chunks.append(data)
+                base_name = self._bases[base_key] = (f"B{len(self._bases) + 1}", base_id)
+            resources[base_name[0]] = base_name[1]
+            content.append(f"q {layout.card_width:.3f} 0 0 {layout.card_height:.3f} {x:.3f} {y:.3f} cm /{base_name[0]} Do Q")
+            if overlay is not None:
+                overlay_id, data = self._image(overlay)
+                chunks.append(data)
+                name = f"C{self.cards + index}"
+                resources[name] = overlay_id
+                # box is in card pixels from the top-left; PDF space grows upwards
+                scale_x = layout.card_width / base_image.width
+                scale_y = layout.card_height / base_image.height
+                left = x + box[0] * scale_x
+                bottom = y + (base_image.height - box[3]) * scale_y
+                content.append(f"q {overlay.width * scale_x:.3f} 0 0 {overlay.height * scale_y:.3f} "
+                               f"{left:.3f} {bottom:.3f} cm /{name} Do Q")
+        content.append("0.25 w 0 G")
+        for x1, y1, x2, y2 in layout.crop_marks():
+            content.append(f"{x1:.3f} {y1:.3f} m {x2:.3f} {y2:.3f} l S")
+
+        content_stream = zlib.compress("\n".join(content).encode('ascii'))
+        content_id = self._allocate()
+        chunks.append(self._object(content_id, f"<< /Length {len(content_stream)} /Filter /FlateDecode >>", content_stream))
+        page_id = self._allocate()
+        xobjects = ' '.join(f"/{name} {obj_id} 0 R" for name, obj_id in resources.items())
+        chunks.append(self._object(page_id, f"<< /Type /Page /Parent 2 0 R "
+                                            f"/MediaBox [0 0 {layout.page_size[0]:.3f} {layout.page_size[1]:.3f}] "
+                                            f"/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>"))
+        self._pages.append(page_id)
+        self.cards += len(placed)
+        return b''.join(chunks)
+
+    def stream(self, cards):
+        """Yield the PDF for an iterable of (base key, base image, overlay box, overlay)"""
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._offset = len(header)
+        yield header
+
+        placed = []
+        for card in cards:
+            placed.append(card)
+            if len(placed) == self.layout.per_page:
+                with metrics.timed('print_sheet_page'):
+                    yield self._page(placed)
+                placed = []
+        if placed or not self._pages:
+            with metrics.timed('print_sheet_page'):
+                yield self._page(placed)
+
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._pages)
+        tail = self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>")
+        tail += self._object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self._offset
+        entries = [f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self._next_id)]
+        tail += (f"xref\n0 {self._next_id}\n0000000000 65535 f \n" + ''.join(entries) +
+                 f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n").encode('ascii')
+        yield tail
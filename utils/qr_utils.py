@@ -1,12 +1,19 @@
 import qrcode
 import os
+from .metrics import metrics
 
 class QRCodeGenerator:
     def __init__(self, output_dir='static/qrcodes'):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def generate(self, data, filename=None):
+    def make_image(self, data):
+        """Build the QR code as an in-memory RGB PIL image"""
+        with metrics.timed('qr'):
+            return self._make_image(data)
+    
+    @staticmethod
+    def _build(data):
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -15,9 +22,18 @@ class QRCodeGenerator:
         )
         qr.add_data(data)
         qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
+        return qr
+    
+    def _make_image(self, data):
+        img = self._build(data).make_image(fill_color="black", back_color="white")
+        return img.get_image().convert('RGB')
+    
+    @staticmethod
+    def matrix(data):
+        """Module grid of the same QR code, border included, as rows of booleans (True = dark)"""
+        return QRCodeGenerator._build(data).get_matrix()
+    
+    def save(self, img, data, filename=None):
         if filename is None:
             filename = f"qr_{data.replace('/', '_')}.png"
         
@@ -25,3 +41,6 @@ class QRCodeGenerator:
         img.save(filepath)
         
         return filepath
+    
+    def generate(self, data, filename=None):
+        return self.save(self.make_image(data), data, filename)
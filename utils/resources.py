@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageFont
+
+DEJAVU_DIR = "/usr/share/fonts/truetype/dejavu/"
+LIBERATION_DIR = "/usr/share/fonts/truetype/liberation/"
+
+
+class ResourceRegistry:
+    """Shared cache of loaded fonts and decoded, pre-resized background images.
+
+    Fonts are resolved from (family, variant, size) once; backgrounds are
+    kept per (path, card size) in an LRU bounded by decoded bytes.
+    """
+
+    def __init__(self, max_fonts=256, max_background_bytes=64 * 1024 * 1024):
+        self.max_fonts = max_fonts
+        self.max_background_bytes = max_background_bytes
+        self._paths = {}
+        self._fonts = OrderedDict()
+        self._backgrounds = OrderedDict()
+        self._background_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def font_path(self, family, variant=''):
+        """Path of family-variant.ttf, falling back to the base family, or None"""
+        key = (family, variant)
+        if key in self._paths:
+            return self._paths[key]
+        font_dir = LIBERATION_DIR if "Liberation" in family else DEJAVU_DIR
+        candidates = [f"{family}-{variant}.ttf"] if variant else []
+        candidates.append(f"{family}.ttf")
+        path = None
+        for filename in candidates:
+            candidate = os.path.join(font_dir, filename)
+            if os.path.exists(candidate):
+                path = candidate
+                break
+        self._paths[key] = path
+        return path
+
+    def font(self, family, size, variant=''):
+        return self.font_file(self.font_path(family, variant), size)
+
+    def font_file(self, path, size):
+        key = (path, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+        try:
+            font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+        except Exception:
+            font = ImageFont.load_default()
+        with self._lock:
+            self._fonts[key] = font
+            while len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+        return font
+
+    def background(self, path, size):
+        """Decoded RGB background resized to size. Shared: callers must copy before drawing."""
+        key = (os.path.abspath(path), tuple(size))
+        with self._lock:
+            image = self._backgrounds.get(key)
+            if image is not None:
+                self._backgrounds.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        with Image.open(path) as bg:
+            image = bg.resize(tuple(size), Image.Resampling.LANCZOS).convert('RGB')
+        nbytes = image.width * image.height * 3
+        with self._lock:
+            if key not in self._backgrounds and nbytes <= self.max_background_bytes:
+                self._backgrounds[key] = image
+                self._background_bytes += nbytes
+                while self._background_bytes > self.max_background_bytes:
+                    _, evicted = self._backgrounds.popitem(last=False)
+                    self._background_bytes -= evicted.width * evicted.height * 3
+        return image
+
+    def preload(self, sizes=((640, 400),), background_dir='static/backgrounds'):
+        """Load the fonts every card uses and the stock backgrounds at each card size"""
+        self.font('DejaVuSans', 20, 'Bold')
+        self.font('DejaVuSans', 10)
+        self.font('DejaVuSans', 80, 'Bold')
+        self.font('DejaVuSansMono', 10)
+        self.font('DejaVuSans', 8, 'Bold')
+        self.font('DejaVuSans', 6)
+        if os.path.isdir(background_dir):
+            for filename in sorted(os.listdir(background_dir)):
+                if not filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                    continue
+                for size in sizes:
+                    try:
+                        self.background(os.path.join(background_dir, filename), size)
+                    except Exception as e:
+                        print(f"Error preloading background {filename}: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'fonts': len(self._fonts),
+                'backgrounds': len(self._backgrounds),
+                'background_bytes': self._background_bytes
+            }
+
+
+resources = ResourceRegistry(max_background_bytes=int(os.environ.get('BACKGROUND_CACHE_MB', 64)) * 1024 * 1024)
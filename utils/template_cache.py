@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def file_digest(path):
+    """SHA-1 of a file, re-read only when its modification time or size changes"""
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def layer_key(template_id, theme, config, background_path=None, logo_path=None, profile='screen'):
+    """Cache key for the invariant base layer of a card at a render profile.
+
+    The config fingerprint means an edited template misses the cache in every
+    process, even ones that never saw the save_template call.
+    """
+    config_digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+    logo_digest = None
+    if logo_path and os.path.exists(logo_path):
+        logo_digest = file_digest(logo_path)
+    background = os.path.basename(background_path) if background_path else None
+    return (str(template_id), theme, background, logo_digest, config_digest, profile)
+
+
+class TemplateLayerCache:
+    """LRU of pre-rendered base layers (background, header bar, logo,
+    security pattern and MRZ band) for each template/theme combination."""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._layers = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        """Return (image copy, meta) for key, building it with builder() on a miss"""
+        with self._lock:
+            entry = self._layers.get(key)
+            if entry is not None:
+                self._layers.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            entry = builder()
+            with self._lock:
+                self.misses += 1
+                self._layers[key] = entry
+                while len(self._layers) > self.max_entries:
+                    self._layers.popitem(last=False)
+        image, meta = entry
+        return image.copy(), meta
+
+    def invalidate(self, template_id=None):
+        with self._lock:
+            if template_id is None:
+                self._layers.clear()
+                return
+            for key in [k for k in self._layers if k[0] == str(template_id)]:
+                del self._layers[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'entries': len(self._layers)
+            }
+
+
+template_layer_cache = TemplateLayerCache(int(os.environ.get('TEMPLATE_LAYER_CACHE_SIZE', 32)))
@@ -0,0 +1,158 @@
+import copy
+import json
+import threading
+import time
+
+from models import db, CardTemplate, Watermark, ConfigVersion
+from .background_removal import BACKGROUND_MODES
+
+VERSION_KEY = 'settings'
+INT_FIELDS = ('header_height', 'photo_x', 'photo_y', 'text_x', 'text_y', 'qr_x', 'qr_y', 'qr_size', 'chroma_feather')
+
+
+def validate_config(config):
+    """Normalised copy of a template config. Raises ValueError for values the renderer cannot use."""
+    if not isinstance(config, dict):
+        raise ValueError('Template config must be an object')
+    config = {k: v for k, v in config.items() if v is not None}
+    for field in ('width', 'height'):
+        if field in config:
+            config[field] = _int(config, field, minimum=1)
+    for field in INT_FIELDS:
+        if field in config:
+            config[field] = _int(config, field, minimum=0)
+    if 'chroma_threshold' in config:
+        config['chroma_threshold'] = _int(config, 'chroma_threshold', minimum=0, maximum=255)
+    for field, value in config.items():
+        if field.endswith(('_color', '_accent')):
+            if not isinstance(value, str) or not value.startswith('#') or len(value) not in (4, 7):
+                raise ValueError(f"{field} must be a #rgb or #rrggbb colour")
+    if 'background_mode' in config and config['background_mode'] not in BACKGROUND_MODES:
+        raise ValueError(f"background_mode must be one of {', '.join(BACKGROUND_MODES)}")
+    return config
+
+
+def _int(config, field, minimum=None, maximum=None):
+    try:
+        value = int(config[field])
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"{field} is out of range")
+    return value
+
+
+class TemplateEntry:
+    """Parsed template held by the registry. get_config() returns a copy callers may modify."""
+
+    def __init__(self, id, name, is_active, config):
+        self.id = id
+        self.name = name
+        self.is_active = is_active
+        self.config = config
+
+    def get_config(self):
+        return copy.deepcopy(self.config)
+
+
+class TemplateRegistry:
+    """Process-local copy of every card template and the current watermark.
+
+    Saving a template or the watermark bumps the version row in the same
+    transaction (bump()); each process compares that single integer at most
+    every check_interval seconds and reloads only when it has changed, so
+    the generation path normally makes no config queries at all.
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._templates = {}
+        self._watermark = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.checks = 0
+
+    @staticmethod
+    def bump():
+        """Increment the shared version in the current session; commit with the change it covers"""
+        updated = db.session.query(ConfigVersion).filter_by(name=VERSION_KEY).update(
+            {'version': ConfigVersion.version + 1}, synchronize_session=False)
+        if not updated:
+            db.session.add(ConfigVersion(name=VERSION_KEY, version=1))
+
+    def invalidate(self):
+        """Check the version on the next access (call after committing a bump in this process)"""
+        self._checked_at = 0.0
+
+    def _stored_version(self):
+        return db.session.query(ConfigVersion.version).filter_by(name=VERSION_KEY).scalar() or 0
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return
+            self.checks += 1
+            version = self._stored_version()
+            if version != self._version:
+                self._load(version)
+            self._checked_at = time.monotonic()
+
+    def _load(self, version):
+        # Version is read before the rows, so a save landing in between triggers another reload
+        templates = {}
+        for template in CardTemplate.query.order_by(CardTemplate.id).all():
+            try:
+                config = validate_config(json.loads(template.config))
+            except ValueError as e:
+                print(f"Skipping template {template.id} ({template.name}): {e}")
+                continue
+            templates[template.id] = TemplateEntry(template.id, template.name, template.is_active, config)
+
+        watermark = None
+        watermark_obj = Watermark.query.first()
+        if watermark_obj and watermark_obj.enabled:
+            watermark = {
+                'text': watermark_obj.text,
+                'color': watermark_obj.color,
+                'opacity': watermark_obj.opacity,
+                'position': watermark_obj.position,
+                'pattern': watermark_obj.pattern or 'single'
+            }
+
+        self._templates = templates
+        self._watermark = watermark
+        self._version = version
+        self.reloads += 1
+
+    def get(self, template_id):
+        self._ensure_current()
+        try:
+            return self._templates.get(int(template_id))
+        except (TypeError, ValueError):
+            return None
+
+    def first(self):
+        self._ensure_current()
+        return next(iter(self._templates.values()), None)
+
+    def active(self):
+        self._ensure_current()
+        return [t for t in self._templates.values() if t.is_active]
+
+    def watermark(self):
+        """Current watermark parameters as a dict, or None when disabled"""
+        self._ensure_current()
+        return dict(self._watermark) if self._watermark else None
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'templates': len(self._templates),
+            'reloads': self.reloads,
+            'version_checks': self.checks
+        }
@@ -0,0 +1,270 @@
+import os
+import threading
+from PIL import Image, ImageColor
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from .card_generator import (CardGenerator, PHOTO_SIZE, SIGNATURE_SIZE, QR_SIZE, LABEL_COLOR, SECURITY_LINE_COLOR,
+                             MRZ_BAND_COLOR, ACCENT_COLOR, IMAGE_SCALE)
+from .qr_utils import QRCodeGenerator
+from .resources import resources
+from .watermark import WATERMARK_FONT_SIZE
+
+_registered_fonts = {}
+_font_lock = threading.Lock()
+
+
+def pdf_font(path, fallback='Helvetica'):
+    """reportlab font name for a TrueType file, registering it on first use"""
+    if not path:
+        return fallback
+    with _font_lock:
+        name = _registered_fonts.get(path)
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                pdfmetrics.registerFont(TTFont(name, path))
+            except Exception as e:
+                print(f"Error registering font {path}: {e}")
+                name = fallback
+            _registered_fonts[path] = name
+    return name
+
+
+def _rgb(color):
+    return tuple(v / 255 for v in color[:3])
+
+
+def _fitted(image, box):
+    """Size image would have after Image.thumbnail(box) at card resolution"""
+    scale = min(1.0, box[0] / image.width, box[1] / image.height)
+    return image.width * scale, image.height * scale
+
+
+class VectorCard:
+    """A card drawn with PDF operators instead of embedded as a raster.
+
+    Follows CardGenerator's layout in card pixels: the bars, security lines,
+    text and QR modules are vector graphics; only the photo, the signature
+    and any uploaded background or logo are images. Pass one to
+    PDFExporter in place of the rendered card image.
+    """
+
+    def __init__(self, config, data, photo_path=None, qr_data=None, watermark=None, logo_path=None, background_path=None,
+                 cutout=None):
+        self.generator = CardGenerator(config)
+        self.data = data
+        self.photo_path = photo_path
+        self.qr_data = qr_data
+        self.watermark = watermark
+        self.logo_path = logo_path
+        self.background_path = background_path
+        self.cutout = cutout
+
+    def draw_on(self, c, x, y, width, height):
+        """Draw the card centred in the box (x, y, width, height) of canvas c, keeping its aspect ratio"""
+        gen = self.generator
+        scale = min(width / gen.width, height / gen.height)
+        c.saveState()
+        c.translate(x + (width - gen.width * scale) / 2, y + (height + gen.height * scale) / 2)
+        c.scale(scale, scale)
+        # From here one unit is one card pixel; a card-space top coordinate t is at y = -t
+        clip = c.beginPath()
+        clip.rect(0, -gen.height, gen.width, gen.height)
+        c.clipPath(clip, stroke=0, fill=0)
+
+        self._background(c)
+        text_x_offset = self._header_bar(c)
+        self._header_text(c, text_x_offset)
+        self._photo(c)
+        self._info(c)
+        # Over the holder content, as on the raster card
+        self._security_features(c)
+        self._fill_box(c, (0, gen.mrz_top() - 3, gen.width, gen.height), MRZ_BAND_COLOR)
+        self._text(c, 10, gen.mrz_top() + 5, gen.mrz_text(self.data), resources.font_path('DejaVuSansMono'), 10,
+                   (255, 255, 255))
+        self._qr(c)
+        if self.watermark and self.watermark.get('text'):
+            self._watermark(c)
+        c.restoreState()
+
+    def _fill_box(self, c, box, color):
+        """Fill the pixels PIL's rectangle(box) would, corners inclusive"""
+        left, top, right, bottom = box
+        c.setFillColorRGB(*_rgb(color))
+        c.rect(left, -(bottom + 1), right - left + 1, bottom - top + 1, stroke=0, fill=1)
+
+    def _text(self, c, x, top, text, font_path, size, color):
+        """Text placed like ImageDraw.text((x, top)): top is the ascender line"""
+        if not text:
+            return
+        ascent = resources.font_file(font_path, size).getmetrics()[0] if font_path else size * 0.8
+        c.setFont(pdf_font(font_path), size)
+        c.setFillColorRGB(*_rgb(color))
+        c.drawString(x, -(top + ascent), text)
+
+    def _image(self, c, image, left, top, width, height):
+        c.drawImage(ImageReader(image), left, -(top + height), width, height, mask='auto')
+
+    def _background(self, c):
+        gen = self.generator
+        if self.background_path and os.path.exists(self.background_path):
+            try:
+                c.drawImage(self.background_path, 0, -gen.height, gen.width, gen.height)
+                return
+            except Exception as e:
+                print(f"Error loading background image: {e}")
+        self._fill_box(c, (0, 0, gen.width, gen.height), gen.hex_to_rgb(gen.background_color))
+
+    def _header_bar(self, c):
+        gen = self.generator
+        self._fill_box(c, (0, 0, gen.width, gen.header_height), gen.hex_to_rgb(gen.header_color))
+        self._fill_box(c, (0, gen.header_height - 2, gen.width, gen.header_height), ACCENT_COLOR)
+
+        text_x_offset = 15
+        if self.logo_path and os.path.exists(self.logo_path):
+            try:
+                logo_size = gen.header_height - 15
+                with Image.open(self.logo_path) as logo:
+                    logo.thumbnail((logo_size * IMAGE_SCALE, logo_size * IMAGE_SCALE), Image.Resampling.LANCZOS)
+                    logo = logo.convert('RGBA')
+                flattened = Image.new('RGBA', logo.size, (255, 255, 255, 255))
+                flattened.alpha_composite(logo)
+                self._image(c, flattened.convert('RGB'), 15, 7, *_fitted(logo, (logo_size, logo_size)))
+                text_x_offset = 15 + logo_size + 10
+            except Exception as e:
+                print(f'Error adding logo: {e}')
+        return text_x_offset
+
+    def _header_text(self, c, text_x_offset):
+        org_name = self.data.get('organization', '')
+        self._text(c, text_x_offset, 10, org_name.upper() or "ID CARD", resources.font_path('DejaVuSans', 'Bold'), 20,
+                   (255, 255, 255))
+        self._text(c, text_x_offset, 35, "OFFICIAL IDENTIFICATION DOCUMENT", resources.font_path('DejaVuSans'), 10,
+                   (200, 200, 200))
+
+    def _security_features(self, c):
+        c.setStrokeColorRGB(*_rgb(SECURITY_LINE_COLOR))
+        c.setLineWidth(1)
+        path = c.beginPath()
+        # PIL draws through pixel centres
+        for x1, y1, x2, y2 in self.generator.security_lines():
+            path.moveTo(x1 + 0.5, -(y1 + 0.5))
+            path.lineTo(x2 + 0.5, -(y2 + 0.5))
+        c.drawPath(path, stroke=1, fill=0)
+
+    def _photo(self, c):
+        gen = self.generator
+        try:
+            photo = gen.prepare_photo(self.photo_path, self.data.get('background_mode'), self.cutout,
+                                      PHOTO_SIZE * IMAGE_SCALE)
+            if photo is None:
+                return
+            photo_x, photo_y = gen.photo_position()
+            c.setStrokeColorRGB(1, 1, 1)
+            c.setLineWidth(2)
+            c.rect(photo_x - 1, -(photo_y + PHOTO_SIZE + 2), PHOTO_SIZE + 3, PHOTO_SIZE + 3, stroke=1, fill=0)
+            self._image(c, photo, photo_x, photo_y, *_fitted(photo, (PHOTO_SIZE, PHOTO_SIZE)))
+        except Exception as e:
+            print(f'Error adding photo: {e}')
+
+    def _info(self, c):
+        gen = self.generator
+        for x, top, text, font_path, size, color in gen.info_text(self.data):
+            self._text(c, x, top, text, font_path, size, color)
+        try:
+            signature = gen.signature_image(self.data, (SIGNATURE_SIZE[0] * IMAGE_SCALE, SIGNATURE_SIZE[1] * IMAGE_SCALE))
+            if signature is not None:
+                sig_x, sig_y = gen.signature_position()
+                self._image(c, signature, sig_x, sig_y, *_fitted(signature, SIGNATURE_SIZE))
+                font_path, _, label_size = gen.info_font(self.data)
+                self._text(c, sig_x, sig_y + 45, "HOLDER SIGNATURE", font_path, label_size, LABEL_COLOR)
+        except Exception as e:
+            print(f'Error adding signature: {e}')
+
+    def _qr(self, c):
+        if not self.qr_data:
+            return
+        matrix = QRCodeGenerator.matrix(self.qr_data)
+        qr_x, qr_y = self.generator.qr_position()
+        module = QR_SIZE / len(matrix)
+        c.setFillColorRGB(1, 1, 1)
+        c.rect(qr_x, -(qr_y + QR_SIZE), QR_SIZE, QR_SIZE, stroke=0, fill=1)
+        path = c.beginPath()
+        for row, cells in enumerate(matrix):
+            column = 0
+            while column < len(cells):
+                if not cells[column]:
+                    column += 1
+                    continue
+                start = column
+                while column < len(cells) and cells[column]:
+                    column += 1
+                # One rectangle per horizontal run of dark modules
+                path.rect(qr_x + start * module, -(qr_y + (row + 1) * module), (column - start) * module, module)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawPath(path, stroke=0, fill=1)
+
+    def _stamp(self, text, max_width, size):
+        """(font path, size, bbox) of the watermark text, shrunk like WatermarkRenderer._text_stamp"""
+        font_path = resources.font_path('DejaVuSans', 'Bold')
+        left, top, right, bottom = resources.font_file(font_path, size).getbbox(text)
+        if right - left > max_width and size > 8:
+            size = max(8, int(size * max_width / (right - left)))
+            left, top, right, bottom = resources.font_file(font_path, size).getbbox(text)
+        return font_path, size, (left, top, right, bottom)
+
+    def _draw_stamp(self, c, text, stamp, color, center, rotate=0, scale=1.0):
+        """Draw the stamp's text centred on center (card coordinates), rotated anticlockwise by rotate degrees"""
+        font_path, size, (left, top, right, bottom) = stamp
+        c.saveState()
+        c.translate(center[0], -center[1])
+        c.rotate(rotate)
+        c.scale(scale, scale)
+        self._text(c, -(right - left) / 2 - left, -(bottom - top) / 2 - top, text, font_path, size, color)
+        c.restoreState()
+
+    def _watermark(self, c):
+        gen = self.generator
+        width, height = gen.width, gen.height
+        text = self.watermark['text']
+        color = ImageColor.getrgb(self.watermark.get('color') or '#888888')
+        c.saveState()
+        c.setFillAlpha(max(0, min(255, int(self.watermark.get('opacity', 128)))) / 255)
+        pattern = self.watermark.get('pattern', 'single')
+
+        if pattern == 'tiled':
+            stamp = self._stamp(text, width // 3, max(12, height // 10))
+            bbox = stamp[2]
+            stamp_w, stamp_h = Image.new('L', (max(1, bbox[2] - bbox[0]), max(1, bbox[3] - bbox[1]))).rotate(30, expand=True).size
+            step_x, step_y = stamp_w + width // 16, stamp_h + height // 16
+            canvas_w, canvas_h = width + 2 * stamp_w, height + 2 * stamp_h
+            for row, y in enumerate(range(stamp_h // 2, canvas_h - stamp_h, step_y)):
+                offset = (step_x // 2) * (row % 2)
+                for x in range(offset, canvas_w - stamp_w, step_x):
+                    center = (x - stamp_w + stamp_w / 2, y - stamp_h + stamp_h / 2)
+                    self._draw_stamp(c, text, stamp, color, center, 30)
+            c.restoreState()
+            return
+
+        stamp = self._stamp(text, int(width * 0.9), WATERMARK_FONT_SIZE)
+        bbox = stamp[2]
+        stamp_w, stamp_h = max(1, bbox[2] - bbox[0]), max(1, bbox[3] - bbox[1])
+        rotate, scale = 0, 1.0
+        if pattern == 'diagonal':
+            rotate = 30
+            stamp_w, stamp_h = Image.new('L', (stamp_w, stamp_h)).rotate(30, expand=True).size
+            if stamp_w > width or stamp_h > height:
+                scale = min(width / stamp_w, height / stamp_h)
+                stamp_w, stamp_h = stamp_w * scale, stamp_h * scale
+
+        if self.watermark.get('position') == 'top':
+            y = height // 8
+        elif self.watermark.get('position') == 'bottom':
+            y = height - height // 8 - stamp_h
+        else:  # center
+            y = (height - stamp_h) // 2
+        self._draw_stamp(c, text, stamp, color, ((width - stamp_w) // 2 + stamp_w / 2, max(0, y) + stamp_h / 2),
+                         rotate, scale)
+        c.restoreState()
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from models import db, ConfigVersion
+
+VERSION_KEY = 'card_status'
+
+
+class VerifiedCard:
+    """Read-only snapshot of the card fields the verification views need.
+
+    status is evaluated on every read, so an expired card reports EXPIRED
+    without anything being written back to the database.
+    """
+
+    FIELDS = ('id', 'id_number', 'full_name', 'organization', 'nationality', 'theme',
+              'issue_date', 'expiry_date', 'created_at', 'card_png', 'qr_code')
+
+    def __init__(self, stored_status, **fields):
+        self.stored_status = stored_status
+        for name in self.FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_card(cls, card):
+        return cls(card.status, **{name: getattr(card, name) for name in cls.FIELDS})
+
+    @property
+    def is_expired(self):
+        return self.expiry_date < date.today()
+
+    @property
+    def status(self):
+        return 'EXPIRED' if self.is_expired else self.stored_status
+
+
+class VerificationCache:
+    """In-process LRU of VerifiedCard snapshots keyed by id_number.
+
+    Entries live for at most ttl seconds and never past the end of the
+    card's expiry date. Every status change bumps a shared version row in
+    its own transaction (bump()); each process compares it at most every
+    check_interval seconds and drops its entries when it has moved, so
+    another worker serves a revoked card as VALID for at most check_interval.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60, check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.version_clears = 0
+
+    @staticmethod
+    def bump():
+        """Increment the shared status version in the current session; commit with the change it covers"""
+        updated = db.session.query(ConfigVersion).filter_by(name=VERSION_KEY).update(
+            {'version': ConfigVersion.version + 1}, synchronize_session=False)
+        if not updated:
+            db.session.add(ConfigVersion(name=VERSION_KEY, version=1))
+
+    def _ensure_current(self, now):
+        if now - self._checked_at < self.check_interval:
+            return
+        version = db.session.query(ConfigVersion.version).filter_by(name=VERSION_KEY).scalar() or 0
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.version_clears += 1
+                self._entries.clear()
+                self._version = version
+            self._checked_at = now
+
+    def _ttl_for(self, snapshot):
+        if snapshot.is_expired:
+            return self.ttl
+        end_of_expiry = datetime.combine(snapshot.expiry_date + timedelta(days=1), datetime.min.time())
+        return max(0, min(self.ttl, (end_of_expiry - datetime.now()).total_seconds()))
+
+    def get(self, id_number, loader):
+        """Return the snapshot for id_number, calling loader() on a miss (None if not found)"""
+        now = time.monotonic()
+        self._ensure_current(now)
+        with self._lock:
+            entry = self._entries.get(id_number)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(id_number)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        card = loader()
+        if card is None:
+            return None
+        snapshot = VerifiedCard.from_card(card)
+        with self._lock:
+            self._entries[id_number] = (snapshot, now + self._ttl_for(snapshot))
+            self._entries.move_to_end(id_number)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, *id_numbers):
+        with self._lock:
+            for id_number in id_numbers:
+                self._entries.pop(id_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'version_clears': self.version_clears
+            }
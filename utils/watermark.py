@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageColor, ImageDraw
+from .resources import resources
+
+WATERMARK_PATTERNS = ('single', 'diagonal', 'tiled')
+WATERMARK_FONT_SIZE = 80
+
+
+class WatermarkRenderer:
+    """Pre-renders watermark overlays and composites them onto cards.
+
+    An overlay is a transparent RGBA layer with the text drawn at the stored
+    opacity. It is built once per (card size, text, color, opacity, position,
+    pattern, scale) and kept in a small LRU, so watermarking a card is one
+    paste. scale enlarges the text along with cards rendered above template size.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._overlays = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def overlay(self, size, text, color, opacity, position='center', pattern='single', scale=1):
+        """Cached RGBA overlay for a card of size. Shared: do not draw on it."""
+        key = (tuple(size), text, color, int(opacity), position, pattern, scale)
+        with self._lock:
+            overlay = self._overlays.get(key)
+            if overlay is not None:
+                self._overlays.move_to_end(key)
+                self.hits += 1
+                return overlay
+            self.misses += 1
+        overlay = self._render(tuple(size), text, color, max(0, min(255, int(opacity))), position, pattern, scale)
+        with self._lock:
+            self._overlays[key] = overlay
+            while len(self._overlays) > self.max_entries:
+                self._overlays.popitem(last=False)
+        return overlay
+
+    def apply(self, card_image, text, color, opacity, position='center', pattern='single', scale=1):
+        if not text:
+            return card_image
+        overlay = self.overlay(card_image.size, text, color, opacity, position, pattern, scale)
+        if card_image.mode == 'RGBA':
+            card_image.alpha_composite(overlay)
+        else:
+            card_image.paste(overlay, (0, 0), overlay)
+        return card_image
+
+    def clear(self):
+        with self._lock:
+            self._overlays.clear()
+
+    def _text_stamp(self, text, rgba, max_width, size):
+        """Text drawn on its own transparent image, shrunk until it fits max_width"""
+        font = resources.font('DejaVuSans', size, 'Bold')
+        left, top, right, bottom = font.getbbox(text)
+        if right - left > max_width and size > 8:
+            size = max(8, int(size * max_width / (right - left)))
+            font = resources.font('DejaVuSans', size, 'Bold')
+            left, top, right, bottom = font.getbbox(text)
+        stamp = Image.new('RGBA', (max(1, right - left), max(1, bottom - top)), rgba[:3] + (0,))
+        ImageDraw.Draw(stamp).text((-left, -top), text, fill=rgba, font=font)
+        return stamp
+
+    @staticmethod
+    def _rotate(stamp, rgba):
+        return stamp.rotate(30, expand=True, resample=Image.Resampling.BILINEAR, fillcolor=rgba[:3] + (0,))
+
+    def _render(self, size, text, color, opacity, position, pattern, scale=1):
+        width, height = size
+        rgba = ImageColor.getrgb(color or '#888888')[:3] + (opacity,)
+        overlay = Image.new('RGBA', size, rgba[:3] + (0,))
+
+        if pattern == 'tiled':
+            stamp = self._rotate(self._text_stamp(text, rgba, width // 3, max(12, height // 10)), rgba)
+            step_x, step_y = stamp.width + width // 16, stamp.height + height // 16
+            # Tile onto a canvas padded by one stamp on each side so partial tiles reach the edges
+            canvas = Image.new('RGBA', (width + 2 * stamp.width, height + 2 * stamp.height), rgba[:3] + (0,))
+            for row, y in enumerate(range(stamp.height // 2, canvas.height - stamp.height, step_y)):
+                offset = (step_x // 2) * (row % 2)
+                for x in range(offset, canvas.width - stamp.width, step_x):
+                    canvas.alpha_composite(stamp, (x, y))
+            return canvas.crop((stamp.width, stamp.height, stamp.width + width, stamp.height + height))
+
+        stamp = self._text_stamp(text, rgba, int(width * 0.9), max(8, round(WATERMARK_FONT_SIZE * scale)))
+        if pattern == 'diagonal':
+            stamp = self._rotate(stamp, rgba)
+            if stamp.width > width or stamp.height > height:
+                stamp.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        if position == 'top':
+            y = height // 8
+        elif position == 'bottom':
+            y = height - height // 8 - stamp.height
+        else:  # center
+            y = (height - stamp.height) // 2
+        overlay.paste(stamp, ((width - stamp.width) // 2, max(0, y)))
+        return overlay
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'overlays': len(self._overlays)
+            }
+
+
+watermark_renderer = WatermarkRenderer()
+
+
+def apply_watermark(card_image, watermark_text, color, opacity, position, pattern='single', scale=1):
+    """Apply watermark to card image"""
+    return watermark_renderer.apply(card_image, watermark_text, color, opacity, position, pattern, scale)